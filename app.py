@@ -20,15 +20,21 @@ from event_bus import event_bus
 # --- Local imports ---
 from ui.app_ui import AppUI
 from media_window import MediaWindow
-from core.profile_manager import ProfileManager, ProfileKey
+from core.profile_manager import ProfileManager, ProfileKey, ProfileRow
+from core.add_checkpoint import AddCheckpoint
+from core.disk_inventory import DiskInventory
 from media_utils import clean_profile_folder
 from core.log import log_info, log_error, log_debug, log_warning
 from settings import load_settings, save_settings
 from utils.format_utils import format_bytes
-from utils.file_utils import sha256_file
 from utils.media_utils import enrich_media_status
 from utils.profile_utils import extract_profile_info, get_fansly_username_from_id
-from utils.api_utils import fetch_medias_from_api
+from core.api_client import fetch_medias_pipelined
+from core.http_cache import set_offline
+from core import segmented_download
+from core.executor import submit_unique
+from core.bulk_refresh import BulkRefreshJob, DEFAULT_WORKERS as BULK_REFRESH_WORKERS
+from core.endpoints import site_url
 
 SETTINGS_PATH = "settings.json"
 
@@ -44,6 +50,9 @@ else:
 
 DEFAULT_DOWNLOAD_DIR = SETTINGS.get("download_dir", "downloads")
 
+# rafraîchissement max de la ligne "chargement" pendant un ajout de profil
+ADD_UI_INTERVAL = float(os.getenv("CU_ADD_UI_INTERVAL", "0.25"))
+
 
 class App:
     def __init__(self, root):
@@ -112,7 +121,15 @@ class App:
             data_dir=self.data_dir,
             default_download_dir=self.download_dir,
             profile_dirs=self.profile_download_dirs,
+            storage_backend=self.settings.get("storage_backend", "json"),
+            compact_medias=bool(self.settings.get("compact_medias", False)),
         )
+        # pages API servies depuis data/http_cache.sqlite3 uniquement (aucune requête coomer)
+        if self.settings.get("api_offline"):
+            set_offline(True)
+        # gros fichiers en plusieurs connexions Range (core.segmented_download)
+        if "segmented_downloads" in self.settings:
+            segmented_download.configure(enabled=bool(self.settings["segmented_downloads"]))
 
         self.load_profiles()
 
@@ -156,11 +173,15 @@ class App:
         def update_profile():
             self.refresh_profile(item_id)
 
+        def full_resync():
+            self.refresh_profile(item_id, full=True)
+
         # ⬅️ IMPORTANT: call the class method via the threaded wrapper WITH item_id
         self.ui.popup_menu(
             event.x_root, event.y_root,
             [
                 ("Update", update_profile),
+                ("Full resync", full_resync),
                 ("Open Folder", open_dir),
                 ("Copier URL profil", lambda: self.copy_profile_url(item_id)),
                 ("Changer dossier", lambda: self.change_profile_dir_threaded(item_id)),
@@ -398,14 +419,16 @@ class App:
         threading.Thread(target=worker, daemon=True).start()
 
     # ---------- refresh/update ----------
-    def refresh_profile(self, item_id):
-        threading.Thread(target=self._refresh_profile_worker, args=(item_id,), daemon=True).start()
+    def refresh_profile(self, item_id, full=False):
+        threading.Thread(target=self._refresh_profile_worker, args=(item_id, full), daemon=True).start()
 
-    def _refresh_profile_worker(self, item_id):
+    def _refresh_profile_worker(self, item_id, full=False):
         vals = self.ui.tree.item(item_id)["values"]
         key = ProfileKey(service=vals[0], username=str(vals[1]).replace("📁 ", ""))
         try:
-            new_cnt, total_before, total_after = self.pm.refresh_profile(key)
+            new_cnt, total_before, total_after = self.pm.refresh_profile(key, full=full)
+            if new_cnt:
+                self._fill_sizes_background(key)
 
             # ⬇️ au lieu de self.root.after(0, self.load_profiles)
             self.root.after(0, lambda: event_bus.publish("profile:update", {
@@ -419,6 +442,57 @@ class App:
             log_error(f"[Refresh] {key.as_str()} → {e}")
             self.root.after(0, lambda: messagebox.showerror("Erreur", str(e)))
 
+    def _fill_sizes_background(self, key):
+        """size_http renseignée en tâche de fond après listing (HEAD concurrents + cache par hash)."""
+        if not self.settings.get("probe_sizes_after_listing", True):
+            return
+        submit_unique(f"sizes:{key.as_str()}", self.pm.fill_remote_sizes, key)
+
+    # ---------- Update all ----------
+    def update_all_profiles(self):
+        """Refresh de tous les profils (plus anciens d'abord) sur un pool borné ; un seul rechargement à la fin."""
+        job = getattr(self, "_bulk_job", None)
+        if job is not None and job.running:
+            if messagebox.askyesno("Update all", "Un Update all est en cours. L'annuler ?"):
+                job.cancel()
+            return
+
+        def set_row_status(key, text):
+            item_id = self.profile_ids.get(key.as_str())
+            if item_id and self.ui.tree.exists(item_id):
+                self.ui.tree.set(item_id, "status", text)
+
+        def on_start(key):
+            self.root.after(0, lambda: set_row_status(key, "🔁 update…"))
+
+        new_total = 0
+
+        def on_progress(done, total, res):
+            nonlocal new_total
+            if res.new:
+                self._fill_sizes_background(res.key)
+            new_total += res.new
+            text = "⚠️ erreur" if res.error else f"+{res.new}"
+
+            def ui(count=new_total):
+                set_row_status(res.key, text)
+                self.ui.stats_label.config(text=f"🔁 Update all : {done}/{total} profils, +{count} médias")
+            self.root.after(0, ui)
+
+        def on_done(results):
+            new_total = sum(r.new for r in results)
+            errors = sum(1 for r in results if r.error)
+            msg = f"📥 Update all terminé\n{len(results)} profils, {new_total} nouveaux médias"
+            if errors:
+                msg += f"\n{errors} erreur(s) (voir app.log)"
+            self.root.after(0, self.load_profiles)
+            self.root.after(100, lambda: messagebox.showinfo("Update all", msg))
+
+        workers = int(self.settings.get("bulk_refresh_workers", BULK_REFRESH_WORKERS))
+        self._bulk_job = BulkRefreshJob(
+            self.pm, workers=workers, on_start=on_start, on_progress=on_progress, on_done=on_done
+        ).start()
+
     # ---------- Handlers déclenchés par l’UI ----------
     def handle_update_selected(self):
         selected = self.ui.tree.selection()
@@ -479,7 +553,7 @@ class App:
                 return
             service = values[0]
             username = str(values[1]).replace("📁 ", "")
-            url = f"https://coomer.st/{service}/user/{username}"
+            url = site_url(f"/{service}/user/{username}")
             self.root.clipboard_clear()
             self.root.clipboard_append(url)
             self.root.update()
@@ -505,32 +579,11 @@ class App:
         total_profiles = 0
         total_medias = 0
 
-        for row in self.pm.list_profiles():
-            medias = row.medias or []
-            videos = [m for m in medias if m.get("type") == "video"]
-            photos = [m for m in medias if m.get("type") == "image"]
-
-            videos_rel = [m for m in videos if m.get("status") != "Ignored"]
-            photos_rel = [m for m in photos if m.get("status") != "Ignored"]
-
-            def is_completed(m):
-                st = (m.get("status") or "").strip()
-                if st == "Completed":
-                    return True
-                try:
-                    p = float(str(m.get("percent", 0)).replace("%", ""))
-                    return p >= 100
-                except Exception:
-                    return False
-
-            videos_completed = sum(1 for m in videos_rel if is_completed(m))
-            photos_completed = sum(1 for m in photos_rel if is_completed(m))
-            videos_total = len(videos_rel)
-            photos_total = len(photos_rel)
-
-            effective_total = videos_total + photos_total
-            completed_all = videos_completed + photos_completed
-            percent = 100.0 if effective_total == 0 else round((completed_all / effective_total) * 100.0, 1)
+        # data/index.json : pas de parse des JSON complets (sauf profils modifiés hors index)
+        for summary in self.pm.profile_summaries():
+            videos_completed, videos_total = summary.videos_completed, summary.videos_total
+            photos_completed, photos_total = summary.photos_completed, summary.photos_total
+            percent = summary.percent
 
             if percent >= 100.0:
                 status_text = "✓ 100%";
@@ -542,35 +595,30 @@ class App:
                 status_text = f"⏳ {percent}%";
                 status_tag = "status.progress"
 
-            default_path = os.path.abspath(os.path.join(self.download_dir, row.key.service, row.key.username))
-            display_name = f"📁 {row.key.username}" if os.path.abspath(
-                row.download_path) != default_path else row.key.username
+            default_path = os.path.abspath(os.path.join(self.download_dir, summary.service, summary.username))
+            display_name = f"📁 {summary.username}" if os.path.abspath(
+                summary.download_path) != default_path else summary.username
 
             item_id = tree.insert(
                 "", "end",
                 values=(
-                    row.key.service,
+                    summary.service,
                     display_name,
                     status_text,
                     f"{videos_completed}/{videos_total}",
                     f"{photos_completed}/{photos_total}",
-                    "0 MB",
-                    "0 MB",
+                    format_bytes(summary.video_bytes) if summary.video_bytes else "0 MB",
+                    format_bytes(summary.photo_bytes) if summary.photo_bytes else "0 MB",
                     f"{percent:.1f}%",
-                    row.last_update.split(".")[0].replace("T", " "),
-                    row.download_path,
+                    summary.last_update.split(".")[0].replace("T", " "),
+                    summary.download_path,
                 ),
                 tags=(status_tag,),
             )
-            self.profile_ids[row.key.as_str()] = item_id
-
-            v_dir = os.path.join(row.download_path, "v")
-            p_dir = os.path.join(row.download_path, "p")
-            self.get_size_thread(v_dir, lambda v, item_id=item_id: self._update_sizes(item_id, v, 0))
-            self.get_size_thread(p_dir, lambda p, item_id=item_id: self._update_sizes(item_id, 0, p))
+            self.profile_ids[summary.key_str] = item_id
 
             total_profiles += 1
-            total_medias += len(medias)
+            total_medias += summary.medias_count
 
         # ---- Tri optionnel ----
         if sort:
@@ -584,6 +632,19 @@ class App:
                 tree.move(iid, "", idx)
 
         self.ui.set_stats(f"Stats globales: {total_profiles} profils, {total_medias} médias")
+        log_debug(f"[App] Cache profils : {self.pm.cache_stats()}")
+
+    def rebuild_profile_index(self):
+        """Reconstruit data/index.json en tâche de fond (si l'index a dérivé) puis recharge."""
+        def worker():
+            try:
+                n = self.pm.rebuild_index()
+                log_info(f"[App] Index reconstruit ({n} profils)")
+            except Exception as e:
+                log_error(f"[App] Reconstruction de l'index échouée : {e}")
+            self.root.after(0, self.load_profiles)
+
+        threading.Thread(target=worker, daemon=True).start()
 
     def _update_sizes(self, item_id, v_bytes, p_bytes):
         tree = self.ui.tree
@@ -654,7 +715,7 @@ class App:
         service = profile_values[0]
         username = str(profile_values[1]).replace("📁 ", "")
         json_path = f"data/{service}/{username}.json"
-        if not os.path.exists(json_path):
+        if self.pm.store is None and not os.path.exists(json_path):
             messagebox.showerror("Erreur", f"Fichier JSON introuvable pour {username}")
             log_error(f"[DoubleClick] Aucun JSON trouvé pour {username} ({json_path})")
             return
@@ -664,15 +725,30 @@ class App:
         local_dir = os.path.join(base_dir, service, username)
 
         log_info(f"[DoubleClick] Ouverture de {username} (fichier: {json_path})")
-        try:
-            with open(json_path, 'r') as f:
-                medias_data = json.load(f)
-        except json.JSONDecodeError as e:
-            log_error(f"[JSON] JSON corrompu : {json_path} ({e})")
-            messagebox.showerror("Erreur JSON", f"Le fichier {json_path} est corrompu ou incomplet.\n\nDétail :\n{e}")
-            return
+        opened_at = time.perf_counter()
+        stream_load = False
+        if self.pm.store is not None:
+            row = self.pm.load_profile(ProfileKey(service, username))
+            if row is None:
+                messagebox.showerror("Erreur", f"Profil introuvable pour {username}")
+                log_error(f"[DoubleClick] Profil absent de la base pour {username}")
+                return
+            medias_data = {"medias": row.medias, "last_update": row.last_update, "profile_name": username}
+        elif self.settings.get("stream_profile_load", True):
+            # parse progressif dans la fenêtre (thread de fond) : rien de bloquant sur le thread Tk
+            medias_data = {"medias": []}
+            stream_load = True
+        else:
+            try:
+                with open(json_path, 'r') as f:
+                    medias_data = json.load(f)
+            except json.JSONDecodeError as e:
+                log_error(f"[JSON] JSON corrompu : {json_path} ({e})")
+                messagebox.showerror("Erreur JSON", f"Le fichier {json_path} est corrompu ou incomplet.\n\nDétail :\n{e}")
+                return
 
-        MediaWindow(tk.Toplevel(self.root), service, username, local_dir, json_path, medias_data)
+        MediaWindow(tk.Toplevel(self.root), service, username, local_dir, json_path, medias_data,
+                    profile_manager=self.pm, stream_load=stream_load, opened_at=opened_at)
 
     def handle_add_already_downloaded(self):
         self.root.after(0, self.prompt_profile_import)
@@ -755,6 +831,8 @@ class App:
         self.root.after(0, insert_loading_row)
 
         medias = []
+        # compteurs tenus à jour page par page (update_row ne reparcourt plus toute la liste)
+        counts = {"video": 0, "image": 0, "video_done": 0, "image_done": 0}
 
         def is_completed(m):
             try:
@@ -762,17 +840,21 @@ class App:
             except:
                 return False
 
+        def count_page(page):
+            for m in page:
+                mtype = m.get("type")
+                if mtype in ("video", "image"):
+                    counts[mtype] += 1
+                    if m.get("percent") == "100":
+                        counts[f"{mtype}_done"] += 1
+
         def update_row():
             tree = self.ui.tree
             real_id = self.profile_ids.get(profile_key)
             if not real_id or not tree.exists(real_id):
                 return
-            videos = [m for m in medias if m.get("type") == "video"]
-            photos = [m for m in medias if m.get("type") == "image"]
-            video_completed = sum(1 for m in videos if m.get("percent") == "100")
-            photo_completed = sum(1 for m in photos if m.get("percent") == "100")
-            total_videos = len(videos)
-            total_photos = len(photos)
+            video_completed, photo_completed = counts["video_done"], counts["image_done"]
+            total_videos, total_photos = counts["video"], counts["image"]
             percent = round((video_completed + photo_completed) / (total_videos + total_photos) * 100) if (total_videos + total_photos) else 0
             last_update_str = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
             tree.item(real_id, values=(
@@ -807,8 +889,37 @@ class App:
             tree.item(real_id, tags=("green" if percent == 100 else "yellow" if percent > 0 else "gray",))
             log_info(f"[FINALIZE] Profil {username} terminé : {len(medias)} médias")
 
+        key = ProfileKey(service, username)
+        base_dir = self.profile_download_dirs.get(profile_key, self.download_dir)
+        download_path = os.path.join(base_dir, service, username)
+        # un seul scandir de v/ et p/ pour tout l'ajout (enrich le met à jour après un rename .tmp)
+        inventory = DiskInventory(download_path).scan()
+
+        # point de reprise append-only, une écriture par page
+        checkpoint = AddCheckpoint.for_json(save_path)
+        known_ids = set()
+        if checkpoint.exists():
+            resumed = checkpoint.resume()
+            medias.extend(resumed)
+            known_ids.update(str(m.get("id")) for m in resumed)
+            count_page(resumed)
+
+        ui_interval = float(self.settings.get("add_ui_interval_seconds", ADD_UI_INTERVAL))
+        last_ui = 0.0
+
+        def save_snapshot():
+            # une seule écriture du profil complet (JSON ou base selon le backend)
+            self.pm.save_profile(ProfileRow(
+                key=key,
+                medias=medias,
+                last_update=datetime.now(timezone.utc).isoformat(),
+                custom_base_dir=os.path.abspath(base_dir),
+                download_path=download_path,
+            ))
+
         try:
-            for page in fetch_medias_from_api(service, raw_username):
+            for page in fetch_medias_pipelined(service, raw_username):
+                page = [m for m in page if str(m.get("id")) not in known_ids]
                 for media in page:
                     ext = os.path.splitext(media["name"])[1].lower()
                     if ext in [".mp4", ".m4v", ".mov", ".webm", ".avi", ".mkv", ".flv"]:
@@ -817,26 +928,41 @@ class App:
                         media["type"] = "image"
                     else:
                         media["type"] = "autre"
-                    medias.append(media)
-
-                    try:
-                        base_dir = self.profile_download_dirs.get(profile_key, self.download_dir)
-                        download_path = os.path.join(base_dir, service, username)
-                        enrich_media_status(medias, download_path)
-                        with open(save_path, "w") as f:
-                            json.dump({
-                                "medias": medias,
-                                "last_update": datetime.now(timezone.utc).isoformat(),
-                                "profile_name": username,
-                                "custom_dir": os.path.abspath(os.path.join(self.download_dir, service, username))
-                            }, f, indent=2)
-                        self.root.after(0, update_row)
-                    except Exception as e:
-                        log_error(f"[JSON Write Error] {e}")
+                if not page:
+                    continue
+
+                try:
+                    # seule la page reçue est enrichie (stat via l'inventaire, SHA via le cache)
+                    enrich_media_status(page, download_path, inventory)
+                    checkpoint.append_page(page)
+                except Exception as e:
+                    log_error(f"[JSON Write Error] {e}")
+                medias.extend(page)
+                count_page(page)
+
+                now = time.monotonic()
+                if now - last_ui >= ui_interval:
+                    last_ui = now
+                    self.root.after(0, update_row)
         except Exception as e:
             log_error(f"[API Fetch Error] {e}")
+            if medias:
+                # on garde ce qui a déjà été récupéré ; le point de reprise reste valable
+                try:
+                    save_snapshot()
+                except Exception as e2:
+                    log_error(f"[JSON Write Error] {e2}")
             return
 
+        try:
+            save_snapshot()
+            checkpoint.discard()
+            self.pm.reset_sync_cursor(key, medias)
+            self._fill_sizes_background(key)
+        except Exception as e:
+            log_error(f"[JSON Write Error] {e}")
+        log_info(f"[ADD] {username} : {len(medias)} médias, {checkpoint.pages} page(s) en point de reprise")
+
         self.root.after(0, finalize)
 
 
@@ -0,0 +1,137 @@
+# bench/bench_download_cpu.py
+"""
+CPU par Gio du chemin d'écriture des téléchargements : boucle 8 Kio d'avant vs
+chunks adaptatifs + tampon d'écriture + préallocation de DownloadManager.
+
+    python -m bench.bench_download_cpu [--size-mb 256] [--files 3] [--kbps 0]
+
+Les deux variantes téléchargent les mêmes blobs depuis le serveur local
+(bench/standin_server.py) avec les mêmes sessions keep-alive et le même
+SHA-256 au fil de l'eau ; seule la boucle de réception / écriture change.
+L'ancienne boucle est reproduite ici telle quelle (iter_content(8192),
+time.time(), stop et watchdog à chaque chunk, open() sans tampon dédié).
+
+CPU : time.thread_time() du thread qui télécharge (le serveur tourne dans
+d'autres threads du même process et n'est pas compté). Appels write() :
+syscw de /proc/self/io. --kbps bride le serveur pour vérifier que le chunk
+adaptatif redescend sans déclencher le watchdog.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+import hashlib
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bench.standin_server import parse_args as standin_args, start as standin_start  # noqa: E402
+
+MIB = 1024 * 1024
+GIB = 1024 * MIB
+
+
+def _syscw() -> int:
+    try:
+        with open("/proc/self/io", "r") as f:
+            return next(int(line.split(":")[1]) for line in f if line.startswith("syscw"))
+    except (OSError, StopIteration):
+        return 0
+
+
+def _legacy_download(url: str, dest: str) -> str:
+    """Boucle de réception d'avant (mono-flux, sans reprise), pour comparaison."""
+    from core.http_pool import get_http_pool
+
+    should_stop = lambda: False  # noqa: E731 — même coût d'appel que le vrai callback
+    r = get_http_pool().session(url).get(url, stream=True, timeout=(10, 30))
+    r.raise_for_status()
+    hasher = hashlib.sha256()
+    downloaded = 0
+    last_chunk_time = time.time()
+    with open(dest, "wb") as f:
+        for chunk in r.iter_content(chunk_size=8192):
+            if should_stop and should_stop():
+                break
+            now = time.time()
+            if now - last_chunk_time > 30:
+                raise TimeoutError("watchdog")
+            if not chunk:
+                continue
+            f.write(chunk)
+            hasher.update(chunk)
+            downloaded += len(chunk)
+            last_chunk_time = now
+    r.close()
+    return hasher.hexdigest()
+
+
+def _new_download(url: str, dest: str) -> None:
+    from core.download_manager import DownloadManager
+
+    ok, err = DownloadManager.download_file(url, dest, retry_delay=0.1, should_stop=lambda: False)
+    if not ok:
+        raise RuntimeError(err)
+
+
+def _run(label: str, fn, urls, workdir, size) -> tuple:
+    cpu = wall = 0.0
+    writes = 0
+    for i, url in enumerate(urls):
+        dest = os.path.join(workdir, f"{label}_{i}.bin")
+        w0, c0, t0 = _syscw(), time.thread_time(), time.perf_counter()
+        fn(url, dest)
+        cpu += time.thread_time() - c0
+        wall += time.perf_counter() - t0
+        writes += _syscw() - w0
+        assert os.path.getsize(dest) == size
+        os.remove(dest)
+    total = size * len(urls)
+    return cpu / (total / GIB), total / MIB / wall, writes
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--size-mb", type=int, default=256)
+    ap.add_argument("--files", type=int, default=3)
+    ap.add_argument("--kbps", type=int, default=0, help="débit max du serveur (0 = illimité)")
+    args = ap.parse_args(argv)
+
+    size = args.size_mb * MIB
+    server_args = ["--port", "0", "--nodes", "1", "--blob-lru", str(args.files + 1),
+                   "--max-blob-kb", str(size // 1024)]
+    if args.kbps:
+        server_args += ["--bandwidth-kbps", str(args.kbps)]
+    servers, env = standin_start(standin_args(server_args))
+    os.environ.update(env)
+    os.environ["CU_HASH_CACHE"] = "0"
+    os.environ["CU_SEGMENTED"] = "0"  # mono-flux : c'est cette boucle qu'on mesure
+    from core.endpoints import media_url
+
+    blobs = servers[0].RequestHandlerClass.blobs
+    urls = [media_url(blobs.publish(f"/bench/cpu/{i:064x}.mp4", size)) for i in range(args.files)]
+    for url in urls:  # blobs générés et connexions ouvertes avant la mesure
+        blobs.get(os.path.splitext(os.path.basename(url))[0])
+    workdir = tempfile.mkdtemp(prefix="bench_cpu_")
+
+    print(f"{args.files} fichier(s) de {args.size_mb} Mio"
+          + (f", serveur bridé à {args.kbps} Kio/s" if args.kbps else ""))
+    print(f"{'':10} {'CPU s/Gio':>10} {'Mio/s':>8} {'write()':>9}")
+    results = {}
+    for label, fn in (("avant", _legacy_download), ("après", _new_download)):
+        results[label] = _run(label, fn, urls, workdir, size)
+        cpu, rate, writes = results[label]
+        print(f"{label:10} {cpu:10.3f} {rate:8.1f} {writes:9d}")
+
+    (cpu_a, _, w_a), (cpu_b, _, w_b) = results["avant"], results["après"]
+    print(f"CPU par Gio : -{(1 - cpu_b / cpu_a) * 100:.0f}%, write() : {w_a} → {w_b}")
+    os.rmdir(workdir)
+    for srv in servers:
+        srv.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+# bench/bench_media_memory.py
+"""
+Mémoire des listes de médias : dicts JSON vs MediaRecord (core.media_record).
+
+    python -m bench.bench_media_memory [data_dir]
+
+Mesure (tracemalloc) la mémoire retenue par tous les profils de data/ chargés
+en dicts, puis convertis en MediaRecord, et vérifie l'aller-retour to_dict().
+"""
+from __future__ import annotations
+
+import os
+import sys
+import gc
+import json
+import glob
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.media_record import to_records, to_dicts  # noqa: E402
+
+
+def _read_texts(data_dir):
+    texts = []
+    for path in sorted(glob.glob(os.path.join(data_dir, "*", "*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            texts.append(f.read())
+    return texts
+
+
+def _measure(build):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    obj = build()
+    elapsed = time.perf_counter() - t0
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current, peak, elapsed
+
+
+def main(argv):
+    data_dir = argv[0] if argv else "data"
+    texts = _read_texts(data_dir)
+    if not texts:
+        print(f"Aucun profil dans {data_dir}")
+        return 1
+
+    def as_dicts():
+        return [json.loads(t).get("medias") or [] for t in texts]
+
+    def as_records():
+        return [to_records(json.loads(t).get("medias") or []) for t in texts]
+
+    dicts, d_cur, d_peak, d_t = _measure(as_dicts)
+    records, r_cur, r_peak, r_t = _measure(as_records)
+
+    n = sum(len(m) for m in dicts)
+    assert all(to_dicts(r) == d for r, d in zip(records, dicts)), "aller-retour to_dict() différent"
+
+    mib = 1024 * 1024
+    print(f"{len(texts)} profils, {n} médias")
+    print(f"{'':10} {'retenu':>10} {'pic':>10} {'octets/média':>14} {'temps':>8}")
+    print(f"{'dict':10} {d_cur / mib:9.1f}M {d_peak / mib:9.1f}M {d_cur / n:14.0f} {d_t:7.2f}s")
+    print(f"{'record':10} {r_cur / mib:9.1f}M {r_peak / mib:9.1f}M {r_cur / n:14.0f} {r_t:7.2f}s")
+    print(f"gain retenu : {(1 - r_cur / d_cur) * 100:.1f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,131 @@
+# bench/bench_readinto.py
+"""
+Allocations par chunk : r.raw.read (un bytes neuf par chunk) vs readinto dans
+le tampon réutilisé du thread (DownloadManager._chunk_reader).
+
+    python -m bench.bench_readinto [--size-mb 64] [--files 3] [--chunk-kb 1024]
+
+1. boucle de réception seule, sous tracemalloc : pour chaque chunk,
+   reset_peak() puis lecture + write + hash ; pic - courant avant = octets
+   alloués (et rendus) pendant ce chunk. On compte les chunks qui allouent
+   plus de 1 Kio et le total alloué.
+2. DownloadManager.download_file complet, sous tracemalloc : pic de mémoire
+   tracée au-dessus de la base et CPU du thread (time.thread_time()).
+
+Serveur local : bench/standin_server.py, mêmes blobs pour les deux voies.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+import hashlib
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bench.standin_server import parse_args as standin_args, start as standin_start  # noqa: E402
+
+KIB = 1024
+MIB = 1024 * KIB
+
+
+def _receive_loop(url: str, dest: str, chunk: int) -> tuple:
+    """Boucle de réception seule ; retourne (chunks, chunks qui allouent, octets alloués)."""
+    from core.download_manager import DownloadManager
+    from core.http_pool import get_http_pool
+
+    r = get_http_pool().session(url).get(url, stream=True, timeout=(10, 30))
+    r.raise_for_status()
+    read_chunk = DownloadManager._chunk_reader(r)
+    hasher = hashlib.sha256()
+    chunks = allocating = allocated = 0
+    with open(dest, "wb", buffering=0) as f:  # sans tampon : on ne mesure que la réception
+        while True:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            buf, _ = read_chunk(chunk)
+            if not buf:
+                break
+            f.write(buf)
+            hasher.update(buf)
+            del buf
+            _, peak = tracemalloc.get_traced_memory()
+            chunks += 1
+            if peak - before > KIB:
+                allocating += 1
+            allocated += peak - before
+    DownloadManager._release_conn(r)
+    r.close()
+    assert hasher.hexdigest() in url
+    return chunks, allocating, allocated
+
+
+def _full_download(url: str, dest: str) -> tuple:
+    from core.download_manager import DownloadManager
+
+    base, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    c0, t0 = time.thread_time(), time.perf_counter()
+    ok, err = DownloadManager.download_file(url, dest, retry_delay=0.1)
+    cpu, wall = time.thread_time() - c0, time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    if not ok:
+        raise RuntimeError(err)
+    return peak - base, cpu, wall
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--size-mb", type=int, default=64)
+    ap.add_argument("--files", type=int, default=3)
+    ap.add_argument("--chunk-kb", type=int, default=1024, help="taille de chunk de la boucle seule (puissance de 2)")
+    args = ap.parse_args(argv)
+
+    size = args.size_mb * MIB
+    servers, env = standin_start(standin_args(["--port", "0", "--nodes", "1", "--blob-lru", str(args.files + 1),
+                                               "--max-blob-kb", str(size // KIB)]))
+    os.environ.update(env)
+    os.environ["CU_HASH_CACHE"] = "0"
+    os.environ["CU_SEGMENTED"] = "0"
+    from core import download_manager as dm
+    from core.endpoints import media_url
+
+    blobs = servers[0].RequestHandlerClass.blobs
+    urls = [media_url(blobs.publish(f"/bench/ri/{i:064x}.mp4", size)) for i in range(args.files)]
+    for url in urls:
+        blobs.get(os.path.splitext(os.path.basename(url))[0])
+    dm._recv_views()  # tampon du thread alloué une fois, hors mesure
+    workdir = tempfile.mkdtemp(prefix="bench_ri_")
+    dest = os.path.join(workdir, "out.bin")
+
+    tracemalloc.start()
+    print(f"{args.files} fichier(s) de {args.size_mb} Mio, chunks de {args.chunk_kb} Kio (boucle seule)")
+    print(f"{'':10} {'chunks':>7} {'allouants':>10} {'Mio alloués':>12}   "
+          f"{'pic DL complet':>15} {'CPU s/Gio':>10} {'Mio/s':>7}")
+    for label, readinto in (("raw.read", False), ("readinto", True)):
+        dm.READINTO = readinto
+        chunks = allocating = allocated = 0
+        peak = cpu = wall = 0.0
+        for url in urls:
+            c, a, b = _receive_loop(url, dest, args.chunk_kb * KIB)
+            chunks += c; allocating += a; allocated += b
+            os.remove(dest)
+            p, c_s, w_s = _full_download(url, dest)
+            peak = max(peak, p); cpu += c_s; wall += w_s
+            os.remove(dest)
+        total = size * len(urls)
+        print(f"{label:10} {chunks:7d} {allocating:10d} {allocated / MIB:12.1f}   "
+              f"{peak / KIB:12.0f} Ki {cpu / (total / (1024 * MIB)):10.3f} {total / MIB / wall:7.0f}")
+    tracemalloc.stop()
+
+    os.rmdir(workdir)
+    for srv in servers:
+        srv.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
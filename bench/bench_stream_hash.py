@@ -0,0 +1,135 @@
+# bench/bench_stream_hash.py
+"""
+SHA-256 au fil du téléchargement vs relecture du .tmp après coup.
+
+    python -m bench.bench_stream_hash [--size-mb 256] [--files 3] [--cold]
+
+Télécharge --files blobs de --size-mb Mio depuis le serveur local
+(bench/standin_server.py) avec DownloadManager.download_file, qui hashe
+désormais les chunks au fil de l'écriture. On mesure ensuite ce que coûtait
+l'ancienne vérification : relecture complète du fichier par blocs de 8 Kio.
+--cold évince le fichier du cache de pages avant la relecture (cas d'une vidéo
+de plusieurs Go qui n'y tient plus) pour faire apparaître les lectures disque.
+
+Octets lus : /proc/self/io (rchar = lectures via read(), read_bytes = disque).
+Un dernier passage coupe un téléchargement à mi-fichier et le reprend : seul
+le préfixe est relu, une fois.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+import hashlib
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bench.standin_server import parse_args as standin_args, start as standin_start  # noqa: E402
+
+MIB = 1024 * 1024
+
+
+def _io() -> dict:
+    try:
+        with open("/proc/self/io", "r") as f:
+            return {k: int(v) for k, v in (line.split(":") for line in f)}
+    except OSError:
+        return {}
+
+
+def _io_delta(before: dict) -> tuple:
+    after = _io()
+    return (after.get("rchar", 0) - before.get("rchar", 0),
+            after.get("read_bytes", 0) - before.get("read_bytes", 0))
+
+
+def _old_verify(path: str) -> str:
+    """Ancienne vérification : sha256_file avec des lectures de 8 Kio."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(8192), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _evict(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--size-mb", type=int, default=256)
+    ap.add_argument("--files", type=int, default=3)
+    ap.add_argument("--cold", action="store_true", help="évincer le fichier du cache avant la relecture")
+    args = ap.parse_args(argv)
+
+    size = args.size_mb * MIB
+    servers, env = standin_start(standin_args(["--port", "0", "--nodes", "1", "--blob-lru", "2",
+                                               "--max-blob-kb", str(size // 1024)]))
+    os.environ.update(env)
+    os.environ["CU_HASH_CACHE"] = "0"  # mesurer le hash lui-même, pas le cache
+    os.environ["CU_SEGMENTED"] = "0"   # mono-flux : c'est le hash au fil du flux qu'on mesure
+    from core.download_manager import DownloadManager  # après CU_BASE_URL
+    from core.endpoints import media_url
+
+    blobs = servers[0].RequestHandlerClass.blobs
+    workdir = tempfile.mkdtemp(prefix="bench_hash_")
+    print(f"{args.files} fichier(s) de {args.size_mb} Mio, cache {'froid' if args.cold else 'chaud'}")
+    print(f"{'':4} {'téléchargement':>15} {'relecture (avant)':>18} {'rchar évité':>12} {'disque évité':>13}")
+
+    tot_dl = tot_re = tot_rchar = tot_disk = 0.0
+    for i in range(args.files):
+        path = blobs.publish(f"/bench/{i:02d}/{i:064x}.mp4", size)
+        dest = os.path.join(workdir, f"{i}.bin")
+
+        t0, io0 = time.perf_counter(), _io()
+        ok, err = DownloadManager.download_file(media_url(path), dest, retry_delay=0.1)
+        dl_t = time.perf_counter() - t0
+        dl_rchar, _ = _io_delta(io0)
+        if not ok:
+            print(f"échec téléchargement : {err}")
+            return 1
+
+        if args.cold:
+            _evict(dest)
+        t0, io0 = time.perf_counter(), _io()
+        assert _old_verify(dest) in path
+        re_t = time.perf_counter() - t0
+        re_rchar, re_disk = _io_delta(io0)
+
+        print(f"#{i:<3} {dl_t:14.2f}s {re_t:17.2f}s {re_rchar / MIB:10.0f}Mi {re_disk / MIB:11.0f}Mi"
+              f"   (rchar pendant le téléchargement : {dl_rchar / MIB:.0f} Mio)")
+        tot_dl += dl_t; tot_re += re_t; tot_rchar += re_rchar; tot_disk += re_disk
+        os.remove(dest)
+
+    print(f"total : {tot_dl:.2f}s de téléchargement, {tot_re:.2f}s de relecture évitée "
+          f"({tot_re / (tot_dl + tot_re) * 100:.0f}% du temps d'avant), "
+          f"{tot_rchar / MIB:.0f} Mio lus évités dont {tot_disk / MIB:.0f} Mio sur disque")
+
+    # reprise : le préfixe déjà écrit est hashé une fois, le reste au fil de l'eau
+    path = blobs.publish("/bench/rs/" + "f" * 64 + ".mp4", size)
+    dest = os.path.join(workdir, "resume.bin")
+    data = blobs.get(os.path.splitext(os.path.basename(path))[0])
+    with open(dest + ".tmp", "wb") as f:
+        f.write(data[: size // 2])
+    t0, io0 = time.perf_counter(), _io()
+    ok, _ = DownloadManager.download_file(media_url(path), dest, retry_delay=0.1)
+    rchar, _ = _io_delta(io0)
+    print(f"reprise à 50% : ok={ok} en {time.perf_counter() - t0:.2f}s, "
+          f"{rchar / MIB:.0f} Mio relus (préfixe : {size // 2 / MIB:.0f} Mio)")
+    os.remove(dest)
+    os.rmdir(workdir)
+    for srv in servers:
+        srv.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,475 @@
+# bench/standin_server.py
+"""
+Serveur local qui imite coomer (API + CDN) pour mesurer sans toucher au vrai site.
+
+    python -m bench.standin_server [--data data] [--port 8765] [--nodes 4] \\
+        [--latency-ms 40] [--jitter-ms 20] [--error-rate 0.02] [--rate-429 0.01] \\
+        [--stall-rate 0.01] [--stall-s 35] [--bandwidth-kbps 4096] [--dead-nodes n3]
+
+puis, dans un autre terminal (les adresses exactes sont affichées au démarrage) :
+
+    CU_BASE_URL=http://127.0.0.1:8765 \\
+    CU_CDN_NODE_URLS=http://127.0.0.1:8766,...,http://127.0.0.1:8769 python main.py
+
+- /api/v1/<service>/user/<u>/posts : pages de 50 posts construites depuis
+  data/<service>/<u>.json (pagination o / before_id / max_id / before / page),
+  ETag + If-None-Match → 304
+- /data/xx/yy/<sha>.ext : contenu pseudo-aléatoire déterministe, taille = size_http
+  du profil (plafonnée par --max-blob-kb), Range / 206 / 416, HEAD
+- les chemins publiés par l'API sont réécrits avec le vrai sha256 du contenu servi
+  (la vérification de hash du client passe) ; --keep-paths garde ceux du profil
+- port principal = site (coomer.st), ports suivants = nœuds n1..nN
+- pannes injectées : latence, 5xx, 429 + Retry-After, blocage en cours de
+  transfert, débit plafonné, nœuds morts ou lents
+
+Enregistrement / rejeu des pages API (fixtures) :
+
+    python -m bench.standin_server --record bench/fixtures --upstream https://coomer.st
+    python -m bench.standin_server --fixtures bench/fixtures
+
+Les types (vidéo/image) ne sont validés par DownloadManager que d'après
+l'extension du fichier de destination : les benchs téléchargent en .bin.
+"""
+from __future__ import annotations
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.http_cache import cache_key  # noqa: E402
+
+PAGE_SIZE = 50
+_API_RE = re.compile(r"^/api/v1/([^/]+)/user/([^/]+)/posts/?$")
+_BLOB_RE = re.compile(r"^(?:/data)?/([0-9a-f]{2})/([0-9a-f]{2})/([0-9a-f]{64})(\.[A-Za-z0-9]+)$")
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+# ---------- Contenu ----------
+class BlobStore:
+    """sha → (graine, taille) ; contenu régénéré à la demande, petit LRU en mémoire."""
+
+    def __init__(self, max_bytes: int, default_size: int, keep_paths: bool = False, lru: int = 16):
+        self.max_bytes = max_bytes
+        self.default_size = default_size
+        self.keep_paths = keep_paths
+        self._specs: Dict[str, Tuple[str, int]] = {}
+        self._lru: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lru_size = lru
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _generate(seed: str, size: int) -> bytes:
+        # randbytes passe par un int de size*8 bits : limité à < 256 Mio d'un coup
+        rng, piece = random.Random(seed), 64 * 1024 * 1024
+        if size <= piece:
+            return rng.randbytes(size)
+        return b"".join(rng.randbytes(min(piece, size - off)) for off in range(0, size, piece))
+
+    def publish(self, path: str, size_hint) -> str:
+        """Chemin CDN d'un média du profil → chemin servi (sha réel du contenu généré)."""
+        m = _BLOB_RE.match(path)
+        seed = m.group(3) if m else path
+        try:
+            size = int(size_hint or 0)
+        except (TypeError, ValueError):
+            size = 0
+        size = min(size or self.default_size, self.max_bytes)
+        if self.keep_paths and m:
+            with self._lock:
+                self._specs.setdefault(seed, (seed, size))
+            return path
+        ext = m.group(4) if m else os.path.splitext(path)[1]
+        data = self._generate(seed, size)
+        sha = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self._specs[sha] = (seed, size)
+            self._remember(sha, data)
+        return f"/{sha[:2]}/{sha[2:4]}/{sha}{ext}"
+
+    def _remember(self, sha: str, data: bytes) -> None:
+        self._lru[sha] = data
+        self._lru.move_to_end(sha)
+        while len(self._lru) > self._lru_size:
+            self._lru.popitem(last=False)
+
+    def get(self, sha: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._lru.get(sha)
+            if data is not None:
+                self._lru.move_to_end(sha)
+                return data
+            spec = self._specs.get(sha)
+        if spec is None:
+            # chemin jamais publié (profil lu directement) : contenu par défaut
+            spec = (sha, self.default_size)
+        data = self._generate(*spec)
+        with self._lock:
+            self._remember(sha, data)
+        return data
+
+
+class ProfilePosts:
+    """data/<service>/<user>.json → posts de l'API (plus récent d'abord)."""
+
+    def __init__(self, data_dir: str, blobs: BlobStore):
+        self.data_dir = data_dir
+        self.blobs = blobs
+        self._cache: Dict[Tuple[str, str], List[dict]] = {}
+        self._lock = threading.Lock()
+
+    def posts(self, service: str, username: str) -> Optional[List[dict]]:
+        key = (service, username)
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+        path = os.path.join(self.data_dir, service, f"{username}.json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except (OSError, ValueError):
+            return None
+        medias = raw.get("medias", []) if isinstance(raw, dict) else raw
+        posts = self._build(medias)
+        with self._lock:
+            self._cache[key] = posts
+        return posts
+
+    def _build(self, medias) -> List[dict]:
+        by_post: "OrderedDict[str, dict]" = OrderedDict()
+        for m in medias:
+            mid = str(m.get("id") or "")
+            if not mid or not m.get("path") or not m.get("name"):
+                continue
+            pid, _, att = mid.partition("_att")
+            post = by_post.get(pid)
+            if post is None:
+                added = m.get("added")
+                post = by_post[pid] = {"id": pid, "user": "", "title": m.get("title", ""),
+                                       "added": added, "published": added, "file": {}, "attachments": []}
+            entry = {"name": m["name"], "path": self.blobs.publish(m["path"], m.get("size_http"))}
+            if att or post["file"]:
+                post["attachments"].append(entry)
+            else:
+                post["file"] = entry
+        posts = list(by_post.values())
+        posts.sort(key=lambda p: (int(p["id"]) if p["id"].isdigit() else 0, p["published"] or ""), reverse=True)
+        return posts
+
+    @staticmethod
+    def page(posts: List[dict], params: Dict[str, str]) -> List[dict]:
+        start = 0
+        if "o" in params:
+            start = int(params["o"] or 0)
+        elif "before_id" in params or "max_id" in params:
+            ref = params.get("before_id") or params.get("max_id")
+            ids = [p["id"] for p in posts]
+            start = ids.index(ref) + 1 if ref in ids else len(posts)
+        elif "before" in params:
+            ts = params["before"]
+            start = next((i for i, p in enumerate(posts) if (p["published"] or "") < ts), len(posts))
+        elif "page" in params:
+            start = max(0, int(params["page"] or 1) - 1) * PAGE_SIZE
+        return posts[start:start + PAGE_SIZE]
+
+
+# ---------- Pannes ----------
+class Faults:
+    def __init__(self, args):
+        self.latency = args.latency_ms / 1000.0
+        self.jitter = args.jitter_ms / 1000.0
+        self.error_rate = args.error_rate
+        self.rate_429 = args.rate_429
+        self.retry_after = args.retry_after
+        self.stall_rate = args.stall_rate
+        self.stall_s = args.stall_s
+        self.bandwidth = args.bandwidth_kbps * 1024
+        self.dead_nodes = {n.strip() for n in (args.dead_nodes or "").split(",") if n.strip()}
+        self.slow_nodes = {n.strip() for n in (args.slow_nodes or "").split(",") if n.strip()}
+        self.slow_bandwidth = args.slow_kbps * 1024
+        self.rng = random.Random(args.seed)
+        self._lock = threading.Lock()
+
+    def roll(self, p: float) -> bool:
+        if p <= 0:
+            return False
+        with self._lock:
+            return self.rng.random() < p
+
+    def delay(self) -> None:
+        if self.latency or self.jitter:
+            with self._lock:
+                extra = self.rng.uniform(0, self.jitter) if self.jitter else 0.0
+            time.sleep(self.latency + extra)
+
+
+# ---------- Rejeu / enregistrement ----------
+class Fixtures:
+    """Pages API enregistrées : <dir>/<sha1(url sans cache-buster)>.json"""
+
+    def __init__(self, directory: str, upstream: Optional[str] = None):
+        self.directory = directory
+        self.upstream = upstream.rstrip("/") if upstream else None
+        os.makedirs(directory, exist_ok=True)
+
+    def _file(self, path_qs: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(cache_key(path_qs).encode()).hexdigest() + ".json")
+
+    def load(self, path_qs: str) -> Optional[dict]:
+        try:
+            with open(self._file(path_qs), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def record(self, path_qs: str, headers: Dict[str, str]) -> Optional[dict]:
+        import requests
+        r = requests.get(self.upstream + path_qs, headers=headers, timeout=20, allow_redirects=False)
+        entry = {"url": cache_key(path_qs), "status": r.status_code, "body": r.text}
+        if r.status_code == 200:
+            with open(self._file(path_qs), "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+        return entry
+
+
+# ---------- HTTP ----------
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "CoomerStandin/1.0"
+    node = "site"               # renseigné par serveur
+    posts: ProfilePosts = None
+    blobs: BlobStore = None
+    faults: Faults = None
+    fixtures: Optional[Fixtures] = None
+    recording = False
+    counters: Dict[str, int] = {}
+    counters_lock = threading.Lock()
+
+    def log_message(self, fmt, *args):  # silencieux : on compte plutôt que logger
+        pass
+
+    def _count(self, key: str) -> None:
+        with self.counters_lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def _send(self, status: int, body: bytes = b"", headers: Optional[Dict[str, str]] = None,
+              send_body: bool = True) -> None:
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body and body:
+            self.wfile.write(body)
+        self._count(str(status))
+
+    def _inject(self) -> bool:
+        """Pannes communes ; True si la réponse a déjà été envoyée."""
+        if self.node in self.faults.dead_nodes:
+            self._count("dead")
+            self.close_connection = True
+            try:
+                self.connection.shutdown(2)
+            except OSError:
+                pass
+            return True
+        self.faults.delay()
+        if self.faults.roll(self.faults.rate_429):
+            self._send(429, b"", {"Retry-After": str(self.faults.retry_after)})
+            return True
+        if self.faults.roll(self.faults.error_rate):
+            self._send(self.faults.rng.choice((500, 502, 503, 504)))
+            return True
+        return False
+
+    def do_HEAD(self):
+        self._handle(send_body=False)
+
+    def do_GET(self):
+        self._handle(send_body=True)
+
+    def _handle(self, send_body: bool) -> None:
+        self._count("requests")
+        if self._inject():
+            return
+        parts = urlsplit(self.path)
+        m = _API_RE.match(parts.path)
+        if m:
+            return self._api(m.group(1), m.group(2), parts, send_body)
+        m = _BLOB_RE.match(parts.path)
+        if m:
+            return self._blob(m.group(3), send_body)
+        self._send(404, b"not found", send_body=send_body)
+
+    # ---- API
+    def _api(self, service: str, username: str, parts, send_body: bool) -> None:
+        path_qs = parts.path + ("?" + parts.query if parts.query else "")
+        if self.fixtures is not None:
+            entry = self.fixtures.load(path_qs)
+            if entry is None and self.recording:
+                entry = self.fixtures.record(path_qs, {"User-Agent": self.headers.get("User-Agent", ""),
+                                                       "Accept": "text/css"})
+            if entry is None:
+                return self._send(404, b"no fixture", send_body=send_body)
+            body = entry["body"].encode("utf-8")
+            status = entry["status"]
+        else:
+            posts = self.posts.posts(service, username)
+            if posts is None:
+                return self._send(404, b"[]", {"Content-Type": "application/json"}, send_body)
+            params = {k: v for k, v in parse_qsl(parts.query) if k != "_"}
+            body = json.dumps(ProfilePosts.page(posts, params), separators=(",", ":")).encode("utf-8")
+            status = 200
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            return self._send(304, b"", {"ETag": etag})
+        self._send(status, body, {"Content-Type": "application/json", "ETag": etag}, send_body)
+
+    # ---- CDN
+    def _blob(self, sha: str, send_body: bool) -> None:
+        data = self.blobs.get(sha)
+        size = len(data)
+        start, end, status = 0, size - 1, 200
+        rng = self.headers.get("Range")
+        if rng:
+            m = _RANGE_RE.match(rng.strip())
+            if m and (m.group(1) or m.group(2)):
+                if m.group(1):
+                    start = int(m.group(1))
+                    end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+                else:  # suffixe : bytes=-N
+                    start = max(0, size - int(m.group(2)))
+                if start >= size or start > end:
+                    return self._send(416, b"", {"Content-Range": f"bytes */{size}"}, send_body)
+                status = 206
+        length = end - start + 1
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(length))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        self._count(str(status))
+        if not send_body:
+            return
+        self._stream(memoryview(data)[start:end + 1])
+
+    def _stream(self, view: memoryview) -> None:
+        chunk = 64 * 1024
+        bandwidth = self.faults.slow_bandwidth if self.node in self.faults.slow_nodes else self.faults.bandwidth
+        stall_at = len(view) // 2 if self.faults.roll(self.faults.stall_rate) else -1
+        t0 = time.monotonic()
+        sent = 0
+        try:
+            while sent < len(view):
+                if 0 <= stall_at <= sent:
+                    self._count("stalls")
+                    time.sleep(self.faults.stall_s)
+                    stall_at = -1
+                n = min(chunk, len(view) - sent)
+                self.wfile.write(view[sent:sent + n])
+                sent += n
+                if bandwidth:
+                    ahead = sent / bandwidth - (time.monotonic() - t0)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+
+def _handler_for(node: str, shared: dict):
+    return type(f"StandinHandler_{node}", (StandinHandler,), {"node": node, **shared})
+
+
+def build_servers(args) -> List[ThreadingHTTPServer]:
+    blobs = BlobStore(args.max_blob_kb * 1024, args.default_blob_kb * 1024, keep_paths=args.keep_paths,
+                      lru=args.blob_lru)
+    shared = {
+        "posts": ProfilePosts(args.data, blobs),
+        "blobs": blobs,
+        "faults": Faults(args),
+        "fixtures": Fixtures(args.record or args.fixtures, args.upstream) if (args.record or args.fixtures) else None,
+        "recording": bool(args.record),
+        "counters": {},
+    }
+    names = ["site"] + [f"n{i}" for i in range(1, args.nodes + 1)]
+    servers = []
+    for i, name in enumerate(names):
+        srv = ThreadingHTTPServer((args.host, args.port + i if args.port else 0), _handler_for(name, shared))
+        srv.daemon_threads = True
+        servers.append(srv)
+    return servers
+
+
+def env_for(servers: List[ThreadingHTTPServer]) -> Dict[str, str]:
+    urls = [f"http://{s.server_address[0]}:{s.server_address[1]}" for s in servers]
+    return {"CU_BASE_URL": urls[0], "CU_CDN_NODE_URLS": ",".join(urls[1:])}
+
+
+def start(args) -> Tuple[List[ThreadingHTTPServer], Dict[str, str]]:
+    """Démarre les serveurs dans des threads daemon (utilisable depuis un bench)."""
+    servers = build_servers(args)
+    for srv in servers:
+        threading.Thread(target=srv.serve_forever, name=f"standin-{srv.server_address[1]}", daemon=True).start()
+    return servers, env_for(servers)
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--data", default="data", help="dossier des profils (data/<service>/<user>.json)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765, help="port du site ; nœuds sur les suivants (0 = au hasard)")
+    ap.add_argument("--nodes", type=int, default=4)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0, help="part de réponses 5xx")
+    ap.add_argument("--rate-429", type=float, default=0.0, help="part de réponses 429")
+    ap.add_argument("--retry-after", type=int, default=1)
+    ap.add_argument("--stall-rate", type=float, default=0.0, help="part des transferts bloqués à mi-chemin")
+    ap.add_argument("--stall-s", type=float, default=35.0)
+    ap.add_argument("--bandwidth-kbps", type=float, default=0.0, help="débit max par connexion (Kio/s, 0 = illimité)")
+    ap.add_argument("--dead-nodes", default="", help="nœuds qui coupent la connexion, ex. n2,n3")
+    ap.add_argument("--slow-nodes", default="", help="nœuds bridés à --slow-kbps, ex. n1")
+    ap.add_argument("--slow-kbps", type=float, default=512.0)
+    ap.add_argument("--max-blob-kb", type=int, default=4096)
+    ap.add_argument("--default-blob-kb", type=int, default=256)
+    ap.add_argument("--blob-lru", type=int, default=16, help="contenus gardés en mémoire")
+    ap.add_argument("--keep-paths", action="store_true", help="garder les chemins du profil (hash non vérifiable)")
+    ap.add_argument("--fixtures", default=None, help="rejouer les pages API enregistrées dans ce dossier")
+    ap.add_argument("--record", default=None, help="enregistrer les pages API de --upstream dans ce dossier")
+    ap.add_argument("--upstream", default="https://coomer.st")
+    ap.add_argument("--seed", type=int, default=1)
+    return ap.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    servers, env = start(args)
+    print("Stand-in coomer prêt. Pour y pointer l'application :")
+    for k, v in env.items():
+        print(f"  export {k}={v}")
+    try:
+        while True:
+            time.sleep(10)
+            counters = dict(servers[0].RequestHandlerClass.counters)
+            if counters:
+                print("  " + " ".join(f"{k}={v}" for k, v in sorted(counters.items())))
+    except KeyboardInterrupt:
+        for srv in servers:
+            srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
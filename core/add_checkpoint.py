@@ -0,0 +1,96 @@
+# core/add_checkpoint.py
+"""
+Point de reprise d'un ajout de profil en cours.
+
+data/<service>/<user>.partial.jsonl : une ligne JSON par média, écrite
+page par page (un seul write + flush par page API) au lieu de réécrire le
+profil complet à chaque média. Le JSON définitif est écrit une seule fois à
+la fin (ProfileManager.save_profile), puis le point de reprise est supprimé.
+
+Si l'ajout est interrompu, le prochain ajout du même profil repart des
+médias déjà enrichis (ils ne sont ni re-stat()és ni re-hashés).
+"""
+from __future__ import annotations
+
+import os
+import json
+import threading
+from typing import List
+
+from core.log import log_info, log_warning
+from core.media_record import json_default
+
+PARTIAL_EXT = ".partial.jsonl"
+
+
+def checkpoint_path_for(json_path: str) -> str:
+    base = json_path[:-5] if json_path.endswith(".json") else json_path
+    return base + PARTIAL_EXT
+
+
+class AddCheckpoint:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.pages = 0
+        self.count = 0
+
+    @classmethod
+    def for_json(cls, json_path: str) -> "AddCheckpoint":
+        return cls(checkpoint_path_for(json_path))
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self) -> List[dict]:
+        """Médias d'un ajout interrompu (dernière ligne tronquée ignorée)."""
+        medias: List[dict] = []
+        try:
+            f = open(self.path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return medias
+        with f:
+            for lineno, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    media = json.loads(line)
+                except ValueError:
+                    log_warning(f"[ADD] Ligne {lineno} illisible ignorée : {self.path}")
+                    continue
+                if isinstance(media, dict):
+                    medias.append(media)
+        if medias:
+            log_info(f"[ADD] Reprise de {len(medias)} média(s) depuis {os.path.basename(self.path)}")
+        return medias
+
+    def resume(self) -> List[dict]:
+        """load() puis réécriture propre du fichier (une ligne tronquée ne doit pas coller à la suivante)."""
+        medias = self.load()
+        self.discard()
+        self.append_page(medias)
+        self.pages = 0
+        return medias
+
+    def append_page(self, medias: List[dict]) -> None:
+        if not medias:
+            return
+        data = "".join(
+            json.dumps(m, ensure_ascii=False, separators=(",", ":"), default=json_default) + "\n"
+            for m in medias
+        )
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+                f.flush()
+            self.pages += 1
+            self.count += len(medias)
+
+    def discard(self) -> None:
+        with self._lock:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,343 @@
+# core/api_client.py
+"""
+Client asynchrone (aiohttp) de l'API coomer.
+
+- une ClientSession (pool de connexions keep-alive) par hôte, partagée par
+  tous les appels du process, sur une boucle asyncio dédiée (thread daemon)
+- budget de requêtes par hôte : limiteur du process (core.rate_limiter),
+  partagé avec les appels requests, au lieu du sleep fixe 0.2–0.45 s
+- page N+1 téléchargée pendant que la page N est extraite / consommée
+  (file bornée de CU_API_PREFETCH pages)
+
+Deux façons de l'utiliser :
+
+    async for medias in get_api_client().iter_media_pages(service, user): ...   # asyncio
+    for medias in fetch_medias_pipelined(service, user): ...                    # threads (App, PM)
+
+Sans aiohttp (ou CU_API_ASYNC=0), les wrappers synchrones retombent sur
+utils.api_utils.fetch_medias_from_api (requests).
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import atexit
+import asyncio
+import threading
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+try:
+    import aiohttp
+except ImportError:  # dépendance optionnelle : repli sur requests
+    aiohttp = None
+
+from core.log import log_info, log_warning, log_error
+from core.pagination_cache import get_pagination_cache, prefer_mode
+from core.http_cache import get_http_cache, is_offline
+from core.rate_limiter import get_rate_limiter, parse_retry_after
+from utils.api_utils import (
+    UA, PageExtractor, api_base_url, api_headers, build_api_url, fetch_medias_from_api,
+    next_page_params, pagination_candidates, parse_posts_payload, post_id,
+)
+
+ASYNC_ENABLED = os.getenv("CU_API_ASYNC", "1") != "0"
+API_CONN_PER_HOST = int(os.getenv("CU_API_CONN_PER_HOST", "4"))
+API_TIMEOUT = float(os.getenv("CU_API_TIMEOUT", "15"))
+API_PREFETCH = int(os.getenv("CU_API_PREFETCH", "2"))       # pages d'avance
+
+_RETRY_STATUSES = (429, 500, 502, 503, 504)
+_END = object()
+
+
+class AsyncApiClient:
+    """À utiliser depuis la boucle du client (voir get_api_client / _LoopThread)."""
+
+    def __init__(self, conn_per_host: int = API_CONN_PER_HOST, timeout: float = API_TIMEOUT,
+                 prefetch: int = API_PREFETCH):
+        self.conn_per_host = conn_per_host
+        self.timeout = timeout
+        self.prefetch = max(1, int(prefetch))
+        self._sessions: Dict[str, "aiohttp.ClientSession"] = {}
+        self.requests = 0
+
+    # ---------- Pool par hôte ----------
+    def _session(self, host: str) -> "aiohttp.ClientSession":
+        session = self._sessions.get(host)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=self.conn_per_host, ttl_dns_cache=300)
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"User-Agent": UA},
+            )
+            self._sessions[host] = session
+        return session
+
+    async def close(self) -> None:
+        for session in self._sessions.values():
+            if not session.closed:
+                await session.close()
+        self._sessions.clear()
+
+    # ---------- HTTP ----------
+    async def get_json(self, url: str, headers: Optional[dict] = None, cookies: Optional[dict] = None,
+                       attempts: int = 4) -> Tuple[Optional[int], object]:
+        """GET no-redirect avec backoff sur 429/5xx. Retourne (status, json|None)."""
+        cache = get_http_cache()
+        cached = cache.lookup(url) if cache else None
+        if is_offline():
+            if cache:
+                cache.offline_hit(cached)
+            if cached is None:
+                return None, None
+            return 200, self._decode(cached.body)
+        if cached:
+            headers = {**(headers or {}), **cached.conditional_headers()}
+        host = urlparse(url).netloc
+        session = self._session(host)
+        limiter = get_rate_limiter()
+        backoff = 2.0
+        status, data = None, None
+        for _ in range(attempts):
+            await limiter.acquire_async(host)
+            self.requests += 1
+            try:
+                async with session.get(url, headers=headers, cookies=cookies, allow_redirects=False) as r:
+                    status = r.status
+                    if status in _RETRY_STATUSES:
+                        # 429 / Retry-After : pause globale de l'hôte, attendue au prochain acquire
+                        if limiter.penalize(host, status, r.headers.get("Retry-After"), backoff):
+                            backoff = min(backoff * 1.5, 30); continue
+                        retry_in = min(parse_retry_after(r.headers.get("Retry-After"), backoff), 30)
+                        log_warning(f"[API] {status} sur {url} → retry dans {retry_in:.1f}s")
+                        await asyncio.sleep(retry_in); backoff = min(backoff * 1.5, 30); continue
+                    if status == 304 and cached:
+                        cache.touch(cached)
+                        return 200, self._decode(cached.body)
+                    if status != 200:
+                        return status, None
+                    body = await r.read()
+                    if cache:
+                        cache.store(url, body, r.headers)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                log_error(f"[API] Exception réseau : {e} → retry {backoff:.1f}s")
+                await asyncio.sleep(backoff); backoff = min(backoff * 1.5, 30); continue
+            return status, self._decode(body)
+        return status, data
+
+    @staticmethod
+    def _decode(body: bytes):
+        try:
+            return json.loads(body)
+        except ValueError:
+            log_error("[API] Réponse invalide (pas un JSON)")
+            return None
+
+    async def _fetch_posts(self, url: str, headers: dict, cookies: Optional[dict]) -> List[dict]:
+        """Page suivante avec retries (équivalent de fetch_page_resilient). [] si vide/échec."""
+        delay = 2.0
+        for i in range(6):
+            status, data = await self.get_json(url, headers, cookies)
+            if status == 200:
+                items = parse_posts_payload(data) if data is not None else None
+                if items is not None:
+                    return items
+                log_warning(f"[API] JSON invalide sur {url} → retry {i + 1}/6 dans {delay:.1f}s")
+            elif status == 429:
+                # get_json a déjà posé la pause globale : le limiteur espace la reprise
+                log_warning(f"[API] 429 sur {url} → retry {i + 1}/6 après la pause")
+                continue
+            elif status in _RETRY_STATUSES:
+                log_warning(f"[API] {status} sur {url} → retry {i + 1}/6 dans {delay:.1f}s")
+            else:
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * 1.6, 20.0)
+        return []
+
+    # ---------- Pagination ----------
+    async def _post_pages(self, service: str, username: str, cookies: Optional[dict]) -> AsyncIterator[List[dict]]:
+        """Pages de posts bruts, même détection de pagination que fetch_medias_from_api."""
+        base = api_base_url(service, username)
+        headers = api_headers(service, username)
+        cursor = PageExtractor()  # côté réseau : curseurs + ids déjà vus, sans extraction
+        seen = cursor.seen_ids
+
+        def advance(items):
+            cursor.track_cursor(items)
+            seen.update(pid for pid in map(post_id, items) if pid)
+
+        status, data = await self.get_json(build_api_url(base), headers, cookies)
+        if status is None:
+            log_error("[API] Échec réseau sur page 1"); return
+        if status in (401, 403):
+            log_error("[API] 401/403 — cookies requis (session/DDG) ou UA/IP différents."); return
+        if status in (301, 302, 303, 307, 308):
+            log_warning(f"[API] Redirection {status} — blocage DDG probable."); return
+        if status != 200:
+            log_error(f"[API] HTTP {status} sur {base}"); return
+        items = parse_posts_payload(data) if data is not None else None
+        if items is None:
+            return
+        if not items:
+            log_info("[API] Aucune donnée (page 1)."); return
+        advance(items)
+        yield items
+
+        page_mode = None
+        modes = get_pagination_cache()
+        candidates = pagination_candidates(cursor.last_id, cursor.last_ts, len(seen))
+        for params, mode in prefer_mode(candidates, modes.get(service, username)):
+            status, data = await self.get_json(build_api_url(base, params), headers, cookies)
+            if status != 200 or data is None:
+                continue
+            items = parse_posts_payload(data)
+            if items and cursor.has_new(items):
+                page_mode = mode
+                log_info(f"[API] Mode candidat OK: {mode} ({len(items)} posts)")
+                break
+        if not page_mode:
+            log_info("[API] Aucune page suivante détectée (before_id/max_id/before/page/offset). Fin normale.")
+            return
+        log_info(f"[API] Pagination détectée : {page_mode}")
+        modes.put(service, username, page_mode)
+
+        page_no = 2
+        while items:
+            advance(items)
+            yield items
+            if page_mode == "page":
+                page_no += 1
+            params = next_page_params(page_mode, cursor.last_id, cursor.last_ts, page_no, len(seen))
+            if params is None:
+                break
+            nxt = await self._fetch_posts(build_api_url(base, params), headers, cookies)
+            if not nxt or not cursor.has_new(nxt):
+                break
+            items = nxt
+
+    async def iter_post_pages(self, service: str, username: str,
+                              cookies: Optional[dict] = None) -> AsyncIterator[List[dict]]:
+        """Pages de posts bruts, la suivante étant déjà en cours de téléchargement."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.prefetch)
+
+        async def producer():
+            try:
+                async for items in self._post_pages(service, username, cookies):
+                    await queue.put(items)
+                await queue.put(_END)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await queue.put(e)
+
+        task = asyncio.ensure_future(producer())
+        try:
+            while True:
+                items = await queue.get()
+                if items is _END:
+                    break
+                if isinstance(items, Exception):
+                    raise items
+                yield items
+        finally:
+            task.cancel()
+
+    async def iter_media_pages(self, service: str, username: str,
+                               cookies: Optional[dict] = None) -> AsyncIterator[List[dict]]:
+        """Pages de médias plats (mêmes dicts que fetch_medias_from_api)."""
+        log_info(f"[API] Fetching medias for {service}/{username} (async)")
+        extractor = PageExtractor()
+        t0 = time.perf_counter()
+        async for items in self.iter_post_pages(service, username, cookies):
+            extractor.page_index += 1
+            log_info(f"[API] Page {extractor.page_index} : {len(items)} posts")
+            # extraction hors boucle : la page suivante continue d'arriver pendant ce temps
+            yield await asyncio.to_thread(extractor.extract, items)
+        log_info(f"[API] {service}/{username} : {extractor.page_index} page(s), "
+                 f"{len(extractor.seen_ids)} posts en {time.perf_counter() - t0:.1f}s")
+
+
+# ---------- Boucle dédiée + wrappers synchrones ----------
+class _LoopThread:
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.client: Optional[AsyncApiClient] = None
+        self._thread = threading.Thread(target=self.loop.run_forever, name="api-client", daemon=True)
+        self._thread.start()
+        self.client = self.run(self._make_client())
+        atexit.register(self.shutdown)
+
+    @staticmethod
+    async def _make_client() -> AsyncApiClient:
+        return AsyncApiClient()
+
+    def run(self, coro, timeout: Optional[float] = None):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def iterate(self, agen) -> Iterator:
+        """Consomme un générateur asynchrone depuis un thread ordinaire."""
+        async def _next():
+            try:
+                return await agen.__anext__()
+            except StopAsyncIteration:
+                return _END
+
+        try:
+            while True:
+                item = self.run(_next())
+                if item is _END:
+                    return
+                yield item
+        finally:
+            try:
+                self.run(agen.aclose(), timeout=5)
+            except Exception:
+                pass
+
+    def shutdown(self) -> None:
+        try:
+            if self.client is not None:
+                self.run(self.client.close(), timeout=5)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+_loop_thread: Optional[_LoopThread] = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop_thread() -> _LoopThread:
+    global _loop_thread
+    with _loop_lock:
+        if _loop_thread is None:
+            _loop_thread = _LoopThread()
+        return _loop_thread
+
+
+def async_available() -> bool:
+    return ASYNC_ENABLED and aiohttp is not None
+
+
+def get_api_client() -> AsyncApiClient:
+    """Client partagé (sa boucle tourne dans le thread "api-client")."""
+    return _get_loop_thread().client
+
+
+def _cookies(session_cookie=None, extra_cookies=None) -> Optional[dict]:
+    cookies = dict(extra_cookies or {})
+    if session_cookie:
+        cookies["session"] = session_cookie
+    return cookies or None
+
+
+def fetch_medias_pipelined(service, username, session_cookie=None, extra_cookies=None) -> Iterator[List[dict]]:
+    """Remplaçant synchrone de fetch_medias_from_api (mêmes pages de médias)."""
+    if not async_available():
+        yield from fetch_medias_from_api(service, username, session_cookie, extra_cookies)
+        return
+    lt = _get_loop_thread()
+    yield from lt.iterate(lt.client.iter_media_pages(service, username, _cookies(session_cookie, extra_cookies)))
@@ -0,0 +1,113 @@
+# core/bulk_refresh.py
+"""
+"Update all" : refresh de tous les profils sur un pool borné.
+
+- ordre : last_update le plus ancien d'abord (profils les plus en retard)
+- CU_BULK_REFRESH_WORKERS profils en parallèle (défaut 3) ; les requêtes API
+  passent par le client partagé (core.api_client), dont le seau à jetons par
+  hôte fait office de budget commun à tous les workers
+- callbacks de progression par profil ; l'appelant ne recharge la liste
+  qu'une fois, dans on_done
+"""
+from __future__ import annotations
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from core.log import log_info, log_error
+from core.profile_manager import ProfileKey
+
+DEFAULT_WORKERS = int(os.getenv("CU_BULK_REFRESH_WORKERS", "3"))
+
+
+@dataclass
+class RefreshResult:
+    key: ProfileKey
+    new: int = 0
+    total: int = 0
+    error: str = ""
+    elapsed: float = 0.0
+
+
+class BulkRefreshJob:
+    def __init__(self, pm, keys: Optional[list] = None, workers: int = DEFAULT_WORKERS, full: bool = False,
+                 on_start: Optional[Callable] = None,
+                 on_progress: Optional[Callable[[int, int, RefreshResult], None]] = None,
+                 on_done: Optional[Callable[[List[RefreshResult]], None]] = None):
+        self.pm = pm
+        self.keys = keys
+        self.workers = max(1, int(workers))
+        self.full = full
+        self.on_start = on_start
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.results: List[RefreshResult] = []
+        self._cancel = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- Ordre ----------
+    def ordered_keys(self) -> list:
+        """Profils triés par last_update croissant (depuis l'index, sans parser les JSON)."""
+        summaries = self.pm.profile_summaries()
+        if self.keys is not None:
+            wanted = {k.as_str() for k in self.keys}
+            summaries = [s for s in summaries if s.key_str in wanted]
+        summaries.sort(key=lambda s: s.last_update or "")
+        return [ProfileKey(s.service, s.username) for s in summaries]
+
+    # ---------- Exécution ----------
+    def start(self) -> "BulkRefreshJob":
+        self._thread = threading.Thread(target=self.run, name="bulk-refresh", daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _refresh_one(self, key) -> RefreshResult:
+        res = RefreshResult(key)
+        if self._cancel.is_set():
+            res.error = "annulé"
+            return res
+        if self.on_start:
+            self.on_start(key)
+        t0 = time.perf_counter()
+        try:
+            res.new, _before, res.total = self.pm.refresh_profile(key, full=self.full)
+        except Exception as e:
+            res.error = str(e)
+            log_error(f"[BULK] {key.as_str()} → {e}")
+        res.elapsed = time.perf_counter() - t0
+        return res
+
+    def run(self) -> List[RefreshResult]:
+        keys = self.ordered_keys()
+        total = len(keys)
+        t0 = time.perf_counter()
+        log_info(f"[BULK] Update all : {total} profil(s), {self.workers} en parallèle")
+        done = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bulk-refresh") as pool:
+                futures = [pool.submit(self._refresh_one, k) for k in keys]
+                for fut in as_completed(futures):
+                    res = fut.result()
+                    done += 1
+                    self.results.append(res)
+                    if self.on_progress:
+                        self.on_progress(done, total, res)
+        finally:
+            new_total = sum(r.new for r in self.results)
+            errors = sum(1 for r in self.results if r.error)
+            log_info(f"[BULK] Terminé en {time.perf_counter() - t0:.1f}s : {done}/{total} profil(s), "
+                     f"+{new_total} média(s), {errors} erreur(s)")
+            if self.on_done:
+                self.on_done(self.results)
+        return self.results
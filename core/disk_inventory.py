@@ -0,0 +1,131 @@
+# core/disk_inventory.py
+"""
+Inventaire disque d'un profil en un seul passage `os.scandir` :
+<profil>/v, <profil>/p et la racine du profil → {nom: FileEntry}.
+
+Les chemins de restore (MediaWindow, RestoreService, enrich_media_status)
+interrogent cette table au lieu de faire 2-3 stat() par média.
+
+    inv = DiskInventory(local_dir).scan()
+    with inv.reconcile():
+        for m in medias:
+            e = inv.stat(os.path.join(video_dir, m["name"]))
+    inv.report("[RESTORE]")
+"""
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from core.log import log_info
+
+TMP_SUFFIX = ".tmp"
+
+
+class FileEntry(NamedTuple):
+    size: int
+    mtime_ns: int
+    is_tmp: bool
+    ino: int
+    dev: int
+
+
+class DiskInventory:
+    def __init__(self, local_dir: str, extra_dirs: Iterable[str] = ()):
+        self.local_dir = os.path.normpath(os.path.abspath(local_dir))
+        self.dirs = [self.local_dir, os.path.join(self.local_dir, "v"), os.path.join(self.local_dir, "p")]
+        for d in extra_dirs:
+            d = os.path.normpath(os.path.abspath(d))
+            if d not in self.dirs:
+                self.dirs.append(d)
+        self._tables: Dict[str, Dict[str, FileEntry]] = {}
+        self.scan_s = 0.0
+        self.reconcile_s = 0.0
+        self.fallback_stats = 0
+
+    # ---------- Scan ----------
+    def scan(self) -> "DiskInventory":
+        t0 = time.perf_counter()
+        self._tables = {d: self._scan_dir(d) for d in self.dirs}
+        self.scan_s = time.perf_counter() - t0
+        return self
+
+    @staticmethod
+    def _scan_dir(path: str) -> Dict[str, FileEntry]:
+        table: Dict[str, FileEntry] = {}
+        try:
+            it = os.scandir(path)
+        except OSError:
+            return table
+        with it:
+            for entry in it:
+                try:
+                    if not entry.is_file(follow_symlinks=True):
+                        continue
+                    st = entry.stat(follow_symlinks=True)
+                except OSError:
+                    continue
+                table[entry.name] = FileEntry(
+                    st.st_size, st.st_mtime_ns, entry.name.endswith(TMP_SUFFIX), st.st_ino, st.st_dev
+                )
+        return table
+
+    @property
+    def file_count(self) -> int:
+        return sum(len(t) for t in self._tables.values())
+
+    # ---------- Lookups ----------
+    def stat(self, path: str) -> Optional[FileEntry]:
+        """Entrée pour un chemin ; stat() réel seulement si le dossier n'a pas été inventorié."""
+        folder, name = os.path.split(os.path.normpath(os.path.abspath(path)))
+        table = self._tables.get(folder)
+        if table is not None:
+            return table.get(name)
+        self.fallback_stats += 1
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return FileEntry(st.st_size, st.st_mtime_ns, name.endswith(TMP_SUFFIX), st.st_ino, st.st_dev)
+
+    def exists(self, path: str) -> bool:
+        return self.stat(path) is not None
+
+    def size(self, path: str) -> int:
+        e = self.stat(path)
+        return e.size if e else 0
+
+    def refresh(self, *paths: str) -> None:
+        """Remet à jour des entrées après une opération (rename .tmp → final, suppression...)."""
+        for path in paths:
+            folder, name = os.path.split(os.path.normpath(os.path.abspath(path)))
+            table = self._tables.get(folder)
+            if table is None:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                table.pop(name, None)
+                continue
+            table[name] = FileEntry(st.st_size, st.st_mtime_ns, name.endswith(TMP_SUFFIX), st.st_ino, st.st_dev)
+
+    # ---------- Mesures ----------
+    @contextmanager
+    def reconcile(self):
+        t0 = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.reconcile_s += time.perf_counter() - t0
+
+    def report(self, tag: str = "[INVENTORY]", medias_count: int | None = None) -> str:
+        msg = (f"{tag} Inventaire {self.local_dir} : {self.file_count} fichier(s) "
+               f"scan={self.scan_s * 1000:.1f} ms reconcile={self.reconcile_s * 1000:.1f} ms")
+        if medias_count is not None:
+            msg += f" ({medias_count} médias)"
+        if self.fallback_stats:
+            msg += f" stat hors inventaire={self.fallback_stats}"
+        log_info(msg)
+        return msg
@@ -2,17 +2,55 @@
 import os
 import time
 import math
+import hashlib
 import random
+import threading
 import requests
+from http.client import HTTPException
+from urllib3.exceptions import HTTPError as Urllib3Error
 from urllib.parse import urlparse
-from requests.adapters import HTTPAdapter
 from log import log_info, log_error, log_warning
 from utils.network_utils import verify_hash_from_cdn_path
+from utils.file_utils import sha256_update_from_file, preallocate, fadvise
+from core.hash_cache import remember_file_hash
+from core.node_health import get_node_health
+from core.http_pool import get_http_pool
+from core.endpoints import CDN_NODES, mirror_urls
+from core import segmented_download as segmented
+from core.segmented_download import SegmentedDownload
 from media_utils import is_valid_video, is_valid_image
 
+KIB = 1024
+# taille de lecture adaptative : ~CHUNK_TARGET_S de flux par itération, bornée
+CHUNK_MIN = int(os.getenv("CU_DL_CHUNK_MIN_KB", "64")) * KIB
+CHUNK_MAX = int(os.getenv("CU_DL_CHUNK_MAX_KB", "4096")) * KIB
+CHUNK_START = max(CHUNK_MIN, min(CHUNK_MAX, 256 * KIB))
+CHUNK_TARGET_S = 0.1
+WRITE_BUFFER = int(os.getenv("CU_DL_WRITE_BUFFER_KB", "1024")) * KIB
+PREALLOCATE = os.getenv("CU_DL_PREALLOCATE", "1") != "0"
+PREALLOCATE_MIN = 4 * 1024 * KIB       # en dessous, la réservation coûte plus qu'elle ne rapporte
+DROP_CACHE_MIN = int(os.getenv("CU_DL_DROP_CACHE_MB", "64")) * 1024 * KIB  # 0 = jamais
+# réception readinto dans un tampon réutilisé par thread (0 = r.raw.read, un bytes par chunk)
+READINTO = os.getenv("CU_DL_READINTO", "1") != "0"
+
+_recv = threading.local()  # .views : {taille de chunk: memoryview sur le bytearray du thread}
+
+
+def _recv_views():
+    views = getattr(_recv, "views", None)
+    if views is None:
+        view = memoryview(bytearray(CHUNK_MAX))
+        views, size = {}, CHUNK_MIN
+        while size < CHUNK_MAX:
+            views[size] = view[:size]
+            size *= 2
+        views[CHUNK_MAX] = view
+        _recv.views = views
+    return views
+
 
 class DownloadManager:
-    CDN_NODES = ["n1", "n2", "n3", "n4"]
+    CDN_NODES = list(CDN_NODES)
     PER_CHUNK_TIMEOUT = 30  # sec sans aucun chunk -> retry
     CONNECT_TIMEOUT = 10
     READ_TIMEOUT = 30
@@ -21,13 +59,8 @@ class DownloadManager:
 
     @staticmethod
     def generate_alternative_urls(original_url: str):
-        parsed = urlparse(original_url)
-        path = parsed.path
-        base = "coomer.st"
-        urls = [f"https://{base}{path}"]
-        for node in DownloadManager.CDN_NODES:
-            urls.append(f"https://{node}.{base}{path}")
-        return urls
+        # site principal puis nœuds (core.endpoints : CU_BASE_URL / CU_CDN_NODE_URLS)
+        return mirror_urls(urlparse(original_url).path)
 
     @staticmethod
     def download_file(
@@ -43,49 +76,75 @@ class DownloadManager:
         tmp_path = final_path if final_path.endswith(".tmp") else final_path + ".tmp"
         os.makedirs(os.path.dirname(final_path) or ".", exist_ok=True)
 
-        all_urls = DownloadManager.generate_alternative_urls(url)
+        # nœuds triés par santé récente ; ceux au disjoncteur ouvert sont sautés
+        health = get_node_health()
+        all_urls = health.order(DownloadManager.generate_alternative_urls(url))
+        all_open = all(health.is_open(u) for u in all_urls)  # tout est HS : on essaie quand même
         log_prefix = f"[DL] [Window {window_id}]" if window_id else "[DL]"
         log_info(f"{log_prefix} ▶️ Début téléchargement pour {final_path} depuis {url}")
 
-        # session HTTP réutilisable + pool raccord
-        session = requests.Session()
-        session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=0))
-        session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0))
+        # sessions keep-alive partagées par hôte : pas de handshake TCP+TLS par fichier
+        pool = get_http_pool()
+
+        # gros fichiers : plusieurs connexions Range (repli mono-flux en cas d'échec)
+        if resume and segmented.wants_segments(url):
+            size = DownloadManager._remote_size(url)
+            if size and size >= segmented.MIN_SIZE:
+                ok, err = DownloadManager._download_segmented(
+                    url, tmp_path, final_path, size, on_progress, should_stop, log_prefix)
+                if ok or err == "Stopped":
+                    return ok, err
+                log_warning(f"{log_prefix} ⚠️ Segmenté en échec ({err}) → repli mono-flux")
+        if os.path.exists(segmented.sidecar_path_for(tmp_path)):
+            SegmentedDownload.collapse_to_prefix(tmp_path)
 
         total_retries = 0
-
-        try:
-            for candidate_url in all_urls:
-                log_info(f"{log_prefix} 🌐 Test CDN : {candidate_url}")
-                per_node_retries = 0
-
-                while per_node_retries < DownloadManager.MAX_RETRIES_PER_NODE:
-                    if should_stop and should_stop():
-                        log_info(f"{log_prefix} ⛔ Téléchargement interrompu")
-                        return False, "Stopped"
-
-                    # Reprise éventuelle
-                    headers, mode = {}, "wb"
-                    downloaded = 0
-                    if resume and os.path.exists(tmp_path):
-                        downloaded = os.path.getsize(tmp_path)
-                        if downloaded > 0:
-                            headers["Range"] = f"bytes={downloaded}-"
-                            mode = "ab"
-                            log_info(f"{log_prefix} 🔄 Reprise à {downloaded} bytes")
-
+        # SHA-256 alimenté par les chunks écrits : (hasher, octets hashés) conservé entre
+        # les tentatives, pour ne hasher le préfixe d'une reprise qu'une seule fois
+        hash_state = None
+
+        for candidate_url in all_urls:
+            if not health.allow(candidate_url) and not all_open:
+                log_info(f"{log_prefix} ⏭️ Circuit ouvert, nœud sauté : {candidate_url}")
+                continue
+            log_info(f"{log_prefix} 🌐 Test CDN : {candidate_url}")
+            per_node_retries = 0
+
+            while per_node_retries < DownloadManager.MAX_RETRIES_PER_NODE:
+                if should_stop and should_stop():
+                    log_info(f"{log_prefix} ⛔ Téléchargement interrompu")
+                    return False, "Stopped"
+                if per_node_retries and health.is_open(candidate_url):
+                    log_warning(f"{log_prefix} ⏭️ Circuit ouvert pendant les retries, bascule CDN")
+                    break
+
+                # Reprise éventuelle
+                headers, mode = {}, "wb"
+                downloaded = 0
+                if resume and os.path.exists(tmp_path):
+                    downloaded = os.path.getsize(tmp_path)
+                    if downloaded > 0:
+                        headers["Range"] = f"bytes={downloaded}-"
+                        mode = "ab"
+                        log_info(f"{log_prefix} 🔄 Reprise à {downloaded} bytes")
+
+                try:
+                    t_req = time.monotonic()
+                    r = pool.session(candidate_url).get(
+                        candidate_url,
+                        headers=headers,
+                        stream=True,
+                        timeout=(DownloadManager.CONNECT_TIMEOUT, DownloadManager.READ_TIMEOUT),
+                    )
                     try:
-                        r = session.get(
-                            candidate_url,
-                            headers=headers,
-                            stream=True,
-                            timeout=(DownloadManager.CONNECT_TIMEOUT, DownloadManager.READ_TIMEOUT),
-                        )
                         status = r.status_code
+                        if status < 400:
+                            health.record_success(candidate_url, time.monotonic() - t_req)
+                        elif status != 416:
+                            health.record_failure(candidate_url, status)
 
                         # Gestion spécifique des codes
                         if status in (403, 404):
-                            r.close()
                             log_warning(f"{log_prefix} ⚠️ {status} sur {candidate_url}, bascule CDN")
                             break  # sort de la boucle per-node -> passe au CDN suivant
 
@@ -125,33 +184,48 @@ class DownloadManager:
                             downloaded = 0
                             mode = "wb"
 
+                        hasher = DownloadManager._resume_hasher(hash_state, tmp_path, downloaded)
+                        hash_state = (hasher, downloaded)
+
                         # Total attendu
                         content_len = r.headers.get("Content-Length")
                         total = int(content_len) + downloaded if content_len else 0
 
                         last_report_t = 0.0
                         min_emit_interval = 0.1
-                        last_chunk_time = time.time()
-                        last_time = time.time()
+                        last_chunk_time = time.monotonic()
+                        last_time = last_chunk_time
                         last_bytes = downloaded
-
-                        with open(tmp_path, mode) as f:
-                            for chunk in r.iter_content(chunk_size=8192):
+                        chunk_size = CHUNK_START
+
+                        # chunks de 64 Kio à 4 Mio (au lieu de 8 Kio) remplis par lectures d'au plus
+                        # CHUNK_MIN : stop et watchdog à chaque lecture, écriture / hash / horloge une fois
+                        # par chunk, écritures dans un tampon de WRITE_BUFFER
+                        read_chunk = DownloadManager._chunk_reader(r, should_stop)
+                        with open(tmp_path, mode, buffering=WRITE_BUFFER) as f:
+                            DownloadManager._prepare_output(f.fileno(), downloaded, total)
+                            while True:
                                 if should_stop and should_stop():
-                                    r.close()
                                     return False, "Stopped"
 
-                                now = time.time()
-                                # watchdog per-chunk
-                                if now - last_chunk_time > DownloadManager.PER_CHUNK_TIMEOUT:
-                                    r.close()
-                                    raise TimeoutError("Aucun chunk reçu pendant 30 secondes")
-
+                                chunk, slowest = read_chunk(chunk_size)
                                 if not chunk:
-                                    continue
+                                    break
 
+                                # chunk reçu = chunk gardé : écrit et hashé avant tout contrôle
                                 f.write(chunk)
+                                hasher.update(chunk)
                                 downloaded += len(chunk)
+                                hash_state = (hasher, downloaded)
+
+                                # watchdog par lecture (≤ CHUNK_MIN) : un débit effondré est coupé après
+                                # PER_CHUNK_TIMEOUT quel que soit le chunk ; le socket coupe les vrais
+                                # blocages via READ_TIMEOUT
+                                if slowest > DownloadManager.PER_CHUNK_TIMEOUT:
+                                    raise TimeoutError(f"Débit effondré : lecture de {CHUNK_MIN} octets en {slowest:.1f}s")
+                                now = time.monotonic()
+                                elapsed = now - last_chunk_time
+                                chunk_size = DownloadManager._next_chunk_size(len(chunk), elapsed)
                                 last_chunk_time = now
 
                                 # vitesse + progress throttlé
@@ -165,10 +239,17 @@ class DownloadManager:
                                         pass
                                     last_report_t = now
 
+                            f.flush()
+                            if DROP_CACHE_MIN and downloaded >= DROP_CACHE_MIN and hasattr(os, "POSIX_FADV_DONTNEED"):
+                                # gros fichier qui ne sera pas relu : libère le cache de pages (pages propres)
+                                fadvise(f.fileno(), os.POSIX_FADV_DONTNEED)
+
+                        DownloadManager._release_conn(r)
                         r.close()
 
-                        # Vérification fichier téléchargé
-                        if not DownloadManager._verify_file(tmp_path, final_path, url, total):
+                        # Vérification fichier téléchargé (digest calculé au fil de l'eau, pas de relecture)
+                        digest = hasher.hexdigest()
+                        if not DownloadManager._verify_file(tmp_path, final_path, url, total, digest=digest):
                             per_node_retries += 1
                             total_retries += 1
                             if total_retries >= DownloadManager.MAX_TOTAL_RETRIES:
@@ -186,6 +267,8 @@ class DownloadManager:
                             total_retries += 1
                             DownloadManager._sleep_with_jitter(retry_delay, per_node_retries)
                             continue
+                        # même inode après le rename : les vérifications suivantes liront le cache
+                        remember_file_hash(final_path, digest, DownloadManager._expected_hash(url))
 
                         # Progress final
                         try:
@@ -196,43 +279,162 @@ class DownloadManager:
                             pass
 
                         return True, None
+                    finally:
+                        # toutes les sorties (retour, retry, exception) : connexion rendue/fermée avant le backoff
+                        r.close()
+
+                except requests.HTTPError as e:
+                    per_node_retries += 1
+                    total_retries += 1
+                    # si code déjà géré plus haut, on n'arrive pas ici
+                    log_warning(f"{log_prefix} ⚠️ HTTPError: {e} → retry {per_node_retries}/{DownloadManager.MAX_RETRIES_PER_NODE}")
+                    if total_retries >= DownloadManager.MAX_TOTAL_RETRIES:
+                        log_error(f"{log_prefix} 💀 Échec (max retries global atteint)")
+                        return False, "Échec complet"
+                    DownloadManager._sleep_with_jitter(retry_delay, per_node_retries)
+
+                except (requests.ReadTimeout, requests.ConnectTimeout, requests.ConnectionError, TimeoutError,
+                        Urllib3Error, HTTPException, ConnectionError) as e:  # exceptions brutes de r.raw / readinto
+                    health.record_failure(candidate_url, None)
+                    per_node_retries += 1
+                    total_retries += 1
+                    log_warning(f"{log_prefix} ⚠️ Erreur réseau : {e} → retry {per_node_retries}/{DownloadManager.MAX_RETRIES_PER_NODE}")
+                    if total_retries >= DownloadManager.MAX_TOTAL_RETRIES:
+                        log_error(f"{log_prefix} 💀 Échec (max retries global atteint)")
+                        return False, "Échec complet"
+                    DownloadManager._sleep_with_jitter(retry_delay, per_node_retries)
+
+                except Exception as e:
+                    per_node_retries += 1
+                    total_retries += 1
+                    log_warning(f"{log_prefix} ⚠️ Erreur : {e} → retry {per_node_retries}/{DownloadManager.MAX_RETRIES_PER_NODE}")
+                    if total_retries >= DownloadManager.MAX_TOTAL_RETRIES:
+                        log_error(f"{log_prefix} 💀 Échec (max retries global atteint)")
+                        return False, "Échec complet"
+                    DownloadManager._sleep_with_jitter(retry_delay, per_node_retries)
+
+        log_error(f"{log_prefix} 💀 Échec complet")
+        return False, "Échec complet"
+
+
+    @staticmethod
+    def _remote_size(url):
+        from core.size_probe import get_size_probe  # import tardif : size_probe importe utils
+        try:
+            return get_size_probe().probe(url)
+        except Exception:
+            return None
 
-                    except requests.HTTPError as e:
-                        per_node_retries += 1
-                        total_retries += 1
-                        # si code déjà géré plus haut, on n'arrive pas ici
-                        log_warning(f"{log_prefix} ⚠️ HTTPError: {e} → retry {per_node_retries}/{DownloadManager.MAX_RETRIES_PER_NODE}")
-                        if total_retries >= DownloadManager.MAX_TOTAL_RETRIES:
-                            log_error(f"{log_prefix} 💀 Échec (max retries global atteint)")
-                            return False, "Échec complet"
-                        DownloadManager._sleep_with_jitter(retry_delay, per_node_retries)
-
-                    except (requests.ReadTimeout, requests.ConnectTimeout, requests.ConnectionError, TimeoutError) as e:
-                        per_node_retries += 1
-                        total_retries += 1
-                        log_warning(f"{log_prefix} ⚠️ Erreur réseau : {e} → retry {per_node_retries}/{DownloadManager.MAX_RETRIES_PER_NODE}")
-                        if total_retries >= DownloadManager.MAX_TOTAL_RETRIES:
-                            log_error(f"{log_prefix} 💀 Échec (max retries global atteint)")
-                            return False, "Échec complet"
-                        DownloadManager._sleep_with_jitter(retry_delay, per_node_retries)
-
-                    except Exception as e:
-                        per_node_retries += 1
-                        total_retries += 1
-                        log_warning(f"{log_prefix} ⚠️ Erreur : {e} → retry {per_node_retries}/{DownloadManager.MAX_RETRIES_PER_NODE}")
-                        if total_retries >= DownloadManager.MAX_TOTAL_RETRIES:
-                            log_error(f"{log_prefix} 💀 Échec (max retries global atteint)")
-                            return False, "Échec complet"
-                        DownloadManager._sleep_with_jitter(retry_delay, per_node_retries)
-
-            log_error(f"{log_prefix} 💀 Échec complet")
-            return False, "Échec complet"
-
-        finally:
+    @staticmethod
+    def _download_segmented(url, tmp_path, final_path, size, on_progress, should_stop, log_prefix):
+        job = SegmentedDownload(url, tmp_path, size, on_progress=on_progress, should_stop=should_stop,
+                                connections=segmented.CONNECTIONS, log_prefix=log_prefix)
+        ok, err = job.run()
+        if not ok:
+            if err != "Stopped":
+                SegmentedDownload.collapse_to_prefix(tmp_path)
+            return ok, err
+        # digest du préfixe hashé au fil des plages ; None → _verify_file relit le fichier
+        if not DownloadManager._verify_file(tmp_path, final_path, url, size, digest=job.digest):
+            SegmentedDownload.discard(tmp_path)
             try:
-                session.close()
-            except Exception:
+                os.remove(tmp_path)
+            except FileNotFoundError:
                 pass
+            return False, "Vérification échouée"
+        try:
+            os.replace(tmp_path, final_path)
+        except OSError as e:
+            return False, f"Échec renommage : {e}"
+        SegmentedDownload.discard(tmp_path)
+        if job.digest:
+            remember_file_hash(final_path, job.digest, DownloadManager._expected_hash(url))
+        return True, None
+
+    @staticmethod
+    def _resume_hasher(hash_state, tmp_path, offset):
+        """Hasher positionné à `offset` : repris de la tentative précédente si possible, sinon préfixe relu une fois."""
+        if offset <= 0:
+            return hashlib.sha256()
+        if hash_state is not None and hash_state[1] == offset:
+            return hash_state[0]
+        hasher = hashlib.sha256()
+        if sha256_update_from_file(hasher, tmp_path, offset) != offset:
+            raise IOError(f"Préfixe .tmp plus court que prévu ({tmp_path})")
+        return hasher
+
+    @staticmethod
+    def _expected_hash(url):
+        return os.path.splitext(os.path.basename(urlparse(url).path))[0]
+
+    @staticmethod
+    def _prepare_output(fd, offset, total):
+        """Hints sur le .tmp : accès séquentiel, blocs réservés pour la suite si la taille est connue."""
+        if hasattr(os, "POSIX_FADV_SEQUENTIAL"):
+            fadvise(fd, os.POSIX_FADV_SEQUENTIAL)
+        if PREALLOCATE and total - offset >= PREALLOCATE_MIN:
+            preallocate(fd, offset, total - offset)  # taille inchangée : la reprise reste fiable
+
+    @staticmethod
+    def _chunk_reader(r, should_stop=None):
+        """read(n) → (chunk d'au plus n octets du corps de `r`, durée de la lecture la plus lente).
+
+        Le chunk est rempli par lectures d'au plus CHUNK_MIN : readinto bloque jusqu'à remplir
+        sa vue, une vue de 4 Mio sur un débit effondré retiendrait stop et watchdog des minutes.
+        Chunk partiel rendu sur stop ou après une lecture de plus de PER_CHUNK_TIMEOUT (à
+        l'appelant de l'écrire puis de couper) ; vide en fin de flux.
+
+        Voie readinto : http.client lit le socket directement dans le bytearray du thread
+        (recv_into), la même memoryview part à f.write et au hasher, aucun bytes alloué par
+        chunk. Valide jusqu'au read suivant : le chunk doit être consommé avant.
+        Repli r.raw.read si le corps est compressé ou si la réponse n'expose pas de readinto.
+        """
+        fp = getattr(r.raw, "_fp", None)
+        encoding = r.headers.get("Content-Encoding", "identity").lower()
+        if not READINTO or encoding not in ("", "identity") or not hasattr(fp, "readinto"):
+            def readinto(view):
+                data = r.raw.read(len(view), decode_content=True)
+                view[:len(data)] = data
+                return len(data)
+        else:
+            readinto = fp.readinto
+        views = _recv_views()
+        full = views[CHUNK_MAX]
+        timeout = DownloadManager.PER_CHUNK_TIMEOUT
+
+        def read(n):
+            view = views.get(n) or full[:n]
+            filled, slowest = 0, 0.0
+            while filled < n:
+                t0 = time.monotonic()
+                got = readinto(view[filled:min(n, filled + CHUNK_MIN)])
+                if not got:
+                    break
+                filled += got
+                slowest = max(slowest, time.monotonic() - t0)
+                if slowest > timeout or (should_stop and should_stop()):
+                    break
+            return (view if filled == n else view[:filled]), slowest
+        return read
+
+    @staticmethod
+    def _release_conn(r):
+        """Corps lu hors urllib3 (readinto) : rend la connexion keep-alive au pool une fois le flux clos."""
+        fp = getattr(r.raw, "_fp", None)
+        isclosed = getattr(fp, "isclosed", None)
+        if isclosed is not None and isclosed():
+            r.raw.release_conn()
+
+    @staticmethod
+    def _next_chunk_size(got, elapsed):
+        """Chunk suivant ≈ CHUNK_TARGET_S au débit mesuré, arrondi à une puissance de 2 (pas d'oscillation)."""
+        if elapsed <= 0:
+            return CHUNK_MAX
+        want = got / elapsed * CHUNK_TARGET_S
+        size = CHUNK_MIN
+        while size < want and size < CHUNK_MAX:
+            size *= 2
+        return min(size, CHUNK_MAX)
 
     @staticmethod
     def _sleep_with_jitter(base_delay, attempt):
@@ -255,7 +457,7 @@ class DownloadManager:
         return f"{speed/(1024*1024):.1f} MB/s"
 
     @staticmethod
-    def _verify_file(tmp_path, final_path, url, total):
+    def _verify_file(tmp_path, final_path, url, total, digest=None):
         if not os.path.exists(tmp_path):
             raise Exception("Fichier .tmp manquant après téléchargement")
 
@@ -266,8 +468,12 @@ class DownloadManager:
             log_warning(f"Incomplet {real_size}/{total}")
             return False
 
-        # Vérif checksum (si applicable à ce CDN)
-        if not verify_hash_from_cdn_path(tmp_path, url):
+        # Vérif checksum (si applicable à ce CDN) : digest du flux si on l'a, sinon relecture
+        if digest is not None:
+            if digest != DownloadManager._expected_hash(url):
+                log_warning("Checksum invalide")
+                return False
+        elif not verify_hash_from_cdn_path(tmp_path, url):
             log_warning("Checksum invalide")
             return False
 
@@ -0,0 +1,61 @@
+# core/endpoints.py
+"""
+Adresses du site / de l'API / des nœuds CDN, configurables pour pointer
+le code réel vers un serveur local (bench/standin_server.py).
+
+- CU_BASE_URL       : site + API + /data (défaut https://coomer.st)
+- CU_CDN_NODE_URLS  : nœuds miroirs, séparés par des virgules
+                      (défaut : https://n1.coomer.st … n4, dérivés de CU_BASE_URL)
+
+    CU_BASE_URL=http://127.0.0.1:8765 \\
+    CU_CDN_NODE_URLS=http://127.0.0.1:8766,http://127.0.0.1:8767 python main.py
+"""
+from __future__ import annotations
+
+import os
+from typing import List
+from urllib.parse import urlsplit
+
+CDN_NODES = ("n1", "n2", "n3", "n4")
+
+BASE_URL = os.getenv("CU_BASE_URL", "https://coomer.st").rstrip("/")
+_parts = urlsplit(BASE_URL)
+BASE_SCHEME = _parts.scheme or "https"
+BASE_NETLOC = _parts.netloc
+BASE_HOST = _parts.hostname or BASE_NETLOC   # domaine des cookies
+
+
+def _node_urls() -> List[str]:
+    raw = os.getenv("CU_CDN_NODE_URLS", "").strip()
+    if raw:
+        return [u.strip().rstrip("/") for u in raw.split(",") if u.strip()]
+    return [f"{BASE_SCHEME}://{node}.{BASE_NETLOC}" for node in CDN_NODES]
+
+
+NODE_BASE_URLS = _node_urls()
+
+
+def site_url(path: str = "") -> str:
+    return BASE_URL + path
+
+
+def api_url(path: str) -> str:
+    """/{service}/user/{username}/posts → URL complète de l'API v1."""
+    return f"{BASE_URL}/api/v1{path}"
+
+
+def media_url(path: str) -> str:
+    """Chemin CDN (/xx/yy/<sha>.ext, avec ou sans /data) → URL sur le site principal."""
+    if path.startswith("/data"):
+        return BASE_URL + path
+    return f"{BASE_URL}/data{path}"
+
+
+def node_urls(path: str) -> List[str]:
+    """Même chemin sur chaque nœud miroir (sans le site principal)."""
+    return [base + path for base in NODE_BASE_URLS]
+
+
+def mirror_urls(path: str) -> List[str]:
+    """Site principal puis nœuds, dans l'ordre historique (coomer.st, n1..n4)."""
+    return [BASE_URL + path] + node_urls(path)
@@ -0,0 +1,241 @@
+# core/hash_cache.py
+"""
+Cache persistant des SHA-256 de fichiers locaux (SQLite, WAL).
+
+Clé = (st_dev, st_ino) ; l'entrée n'est valide que si (taille, mtime_ns)
+n'ont pas bougé : un fichier n'est donc re-hashé qu'après une vraie
+modification. Le st_dev sépare les volumes (SSD externes, NAS...) dans
+la même base.
+
+On garde aussi le dernier verdict (hash attendu + OK/Mismatch) pour les
+vérifications contre le nom CDN.
+
+    digest = sha256_file_cached(path)                 # remplace sha256_file
+    ok = verify_file_hash(path, expected_hash)        # digest == attendu, verdict mémorisé
+
+Base : CU_HASH_CACHE_DB (défaut data/hash_cache.sqlite3). CU_HASH_CACHE=0 désactive.
+"""
+from __future__ import annotations
+
+import os
+import time
+import sqlite3
+import threading
+from typing import Dict, Optional, Tuple
+
+from core.log import log_info, log_warning
+from utils.file_utils import sha256_file
+
+DEFAULT_DB_PATH = os.getenv("CU_HASH_CACHE_DB", os.path.join("data", "hash_cache.sqlite3"))
+ENABLED = os.getenv("CU_HASH_CACHE", "1") != "0"
+# fichier modifié il y a moins de N secondes : peut encore être en cours d'écriture
+# avec le même mtime (granularité du FS) → on hashe sans mémoriser
+RACY_WINDOW_S = float(os.getenv("CU_HASH_CACHE_RACY_S", "2"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_hashes (
+    dev        INTEGER NOT NULL,
+    ino        INTEGER NOT NULL,
+    size       INTEGER NOT NULL,
+    mtime_ns   INTEGER NOT NULL,
+    digest     TEXT NOT NULL,
+    expected   TEXT,
+    verdict    TEXT,
+    path       TEXT,
+    checked_at REAL,
+    PRIMARY KEY (dev, ino)
+);
+"""
+
+_UPSERT = """
+INSERT INTO file_hashes (dev, ino, size, mtime_ns, digest, expected, verdict, path, checked_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(dev, ino) DO UPDATE SET
+    size = excluded.size,
+    mtime_ns = excluded.mtime_ns,
+    digest = excluded.digest,
+    expected = excluded.expected,
+    verdict = excluded.verdict,
+    path = excluded.path,
+    checked_at = excluded.checked_at
+"""
+
+Stamp = Tuple[int, int, int, int]  # (dev, ino, size, mtime_ns)
+
+
+def _stamp(path: str, entry=None) -> Optional[Stamp]:
+    """Empreinte du fichier ; `entry` (FileEntry d'un DiskInventory) évite un stat()."""
+    if entry is not None:
+        return entry.dev, entry.ino, entry.size, entry.mtime_ns
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class HashCache:
+    """Accès thread-safe (une connexion partagée + verrou), même modèle que SqliteProfileStore."""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self.hits = 0
+        self.misses = 0
+        self.hashed_bytes = 0
+
+    # ---------- Lecture ----------
+    def _lookup(self, stamp: Stamp) -> Optional[tuple]:
+        dev, ino, size, mtime_ns = stamp
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, digest, expected, verdict FROM file_hashes WHERE dev = ? AND ino = ?",
+                (dev, ino)
+            ).fetchone()
+        if row is None or row[0] != size or row[1] != mtime_ns:
+            return None
+        return row
+
+    # ---------- Écriture ----------
+    def _store(self, stamp: Stamp, digest: str, path: str,
+               expected: Optional[str] = None, verdict: Optional[str] = None) -> None:
+        dev, ino, size, mtime_ns = stamp
+        if time.time() - mtime_ns / 1e9 < RACY_WINDOW_S:
+            return
+        with self._lock:
+            self._conn.execute(_UPSERT, (dev, ino, size, mtime_ns, digest, expected, verdict, path, time.time()))
+
+    # ---------- API ----------
+    def sha256(self, path: str, entry=None) -> Optional[str]:
+        """SHA-256 du fichier, recalculé seulement si (dev, inode, taille, mtime) a changé."""
+        stamp = _stamp(path, entry)
+        if stamp is None:
+            return None
+        row = self._lookup(stamp)
+        if row is not None:
+            self.hits += 1
+            return row[2]
+        self.misses += 1
+        digest = sha256_file(path)
+        self.hashed_bytes += stamp[2]
+        # le fichier a pu changer pendant la lecture : on ne mémorise que si l'empreinte tient
+        if _stamp(path) == stamp:
+            self._store(stamp, digest, path)
+        return digest
+
+    def verify(self, path: str, expected: str, entry=None) -> bool:
+        """digest == expected ; le verdict est enregistré avec le digest."""
+        stamp = _stamp(path, entry)
+        if stamp is None:
+            return False
+        row = self._lookup(stamp)
+        if row is not None and row[3] == expected and row[4]:
+            self.hits += 1
+            return row[4] == "OK"
+        digest = self.sha256(path, entry)
+        if digest is None:
+            return False
+        ok = digest == expected
+        if _stamp(path) == stamp:
+            self._store(stamp, digest, path, expected, "OK" if ok else "Mismatch")
+        return ok
+
+    def remember(self, path: str, digest: str, expected: Optional[str] = None) -> None:
+        """
+        Digest calculé par l'appelant (hash au fil du téléchargement) : mémorisé sans relire
+        le fichier. Pas de fenêtre « racy » ici : l'appelant vient de finir d'écrire et ne touche plus au fichier.
+        """
+        stamp = _stamp(path)
+        if stamp is None:
+            return
+        verdict = None if expected is None else ("OK" if digest == expected else "Mismatch")
+        dev, ino, size, mtime_ns = stamp
+        with self._lock:
+            self._conn.execute(_UPSERT, (dev, ino, size, mtime_ns, digest, expected, verdict, path, time.time()))
+
+    def forget(self, path: str) -> None:
+        stamp = _stamp(path)
+        if stamp is None:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM file_hashes WHERE dev = ? AND ino = ?", stamp[:2])
+
+    def prune(self) -> int:
+        """Supprime les entrées dont le fichier a disparu ou changé."""
+        with self._lock:
+            rows = self._conn.execute("SELECT dev, ino, size, mtime_ns, path FROM file_hashes").fetchall()
+        stale = [(dev, ino) for dev, ino, size, mtime_ns, path in rows
+                 if _stamp(path or "") != (dev, ino, size, mtime_ns)]
+        if stale:
+            with self._lock:
+                self._conn.executemany("DELETE FROM file_hashes WHERE dev = ? AND ino = ?", stale)
+        return len(stale)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM file_hashes").fetchone()
+        return {"entries": entries, "hits": self.hits, "misses": self.misses, "hashed_bytes": self.hashed_bytes}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# ---------- Instance partagée ----------
+_default: Optional[HashCache] = None
+_default_lock = threading.Lock()
+_default_failed = False
+
+
+def get_hash_cache() -> Optional[HashCache]:
+    global _default, _default_failed
+    if not ENABLED or _default_failed:
+        return None
+    if _default is None:
+        with _default_lock:
+            if _default is None and not _default_failed:
+                try:
+                    _default = HashCache(DEFAULT_DB_PATH)
+                    log_info(f"[HASH] Cache SHA256 ouvert : {DEFAULT_DB_PATH}")
+                except (OSError, sqlite3.Error) as e:
+                    _default_failed = True
+                    log_warning(f"[HASH] Cache SHA256 indisponible ({e}) → hash direct")
+    return _default
+
+
+def sha256_file_cached(path: str, entry=None) -> Optional[str]:
+    """Remplaçant de sha256_file : passe par le cache quand il est disponible."""
+    cache = get_hash_cache()
+    if cache is None:
+        return sha256_file(path)
+    try:
+        return cache.sha256(path, entry)
+    except sqlite3.Error as e:
+        log_warning(f"[HASH] Lecture cache échouée ({e}) → hash direct")
+        return sha256_file(path)
+
+
+def remember_file_hash(path: str, digest: str, expected: Optional[str] = None) -> None:
+    cache = get_hash_cache()
+    if cache is None:
+        return
+    try:
+        cache.remember(path, digest, expected)
+    except sqlite3.Error as e:
+        log_warning(f"[HASH] Écriture cache échouée ({e})")
+
+
+def verify_file_hash(path: str, expected: str, entry=None) -> bool:
+    cache = get_hash_cache()
+    if cache is None:
+        return sha256_file(path) == expected
+    try:
+        return cache.verify(path, expected, entry)
+    except sqlite3.Error as e:
+        log_warning(f"[HASH] Lecture cache échouée ({e}) → hash direct")
+        return sha256_file(path) == expected
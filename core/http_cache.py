@@ -0,0 +1,208 @@
+# core/http_cache.py
+"""
+Cache disque des réponses de l'API (pages de posts), SQLite (WAL).
+
+- clé = URL sans le cache-buster `_=<timestamp>` (le buster reste envoyé)
+- on garde body + ETag + Last-Modified ; la requête suivante part avec
+  If-None-Match / If-Modified-Since, et un 304 resert le body en cache
+- éviction LRU au-delà de CU_HTTP_CACHE_MB (défaut 256 Mo)
+- mode hors-ligne (CU_HTTP_OFFLINE=1 ou settings.json → api_offline) :
+  les pages viennent uniquement du cache, sans toucher coomer
+
+Base : CU_HTTP_CACHE_DB (défaut data/http_cache.sqlite3). CU_HTTP_CACHE=0 désactive.
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from core.log import log_info, log_warning
+
+DEFAULT_DB_PATH = os.getenv("CU_HTTP_CACHE_DB", os.path.join("data", "http_cache.sqlite3"))
+DEFAULT_MAX_BYTES = int(os.getenv("CU_HTTP_CACHE_MB", "256")) * 1024 * 1024
+ENABLED = os.getenv("CU_HTTP_CACHE", "1") != "0"
+BUSTER_PARAM = "_"
+
+_offline = os.getenv("CU_HTTP_OFFLINE", "0") == "1"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url           TEXT PRIMARY KEY,
+    body          BLOB NOT NULL,
+    etag          TEXT,
+    last_modified TEXT,
+    size          INTEGER NOT NULL,
+    stored_at     REAL NOT NULL,
+    last_access   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access);
+"""
+
+
+def cache_key(url: str) -> str:
+    """URL normalisée sans le cache-buster (paramètres triés)."""
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != BUSTER_PARAM)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+def set_offline(enabled: bool) -> None:
+    global _offline
+    _offline = bool(enabled)
+    if _offline:
+        log_info("[HTTP CACHE] Mode hors-ligne : pages API servies depuis le cache uniquement")
+
+
+def is_offline() -> bool:
+    return _offline
+
+
+@dataclass
+class CachedPage:
+    url: str
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def json(self):
+        return json.loads(self.body)
+
+    def as_response(self) -> "CachedResponse":
+        return CachedResponse(self)
+
+
+class CachedResponse:
+    """Réponse 200 reconstituée depuis le cache (interface minimale de requests.Response)."""
+
+    status_code = 200
+
+    def __init__(self, page: CachedPage):
+        self.page = page
+        self.content = page.body
+        self.headers = {"X-Cache": "HIT"}
+        self.from_cache = True
+
+    def json(self):
+        return self.page.json()
+
+
+class HttpCache:
+    """Accès thread-safe (une connexion partagée + verrou), même modèle que HashCache."""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max(0, int(max_bytes))
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self.hits = 0          # 304 revalidés + lectures hors-ligne
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def lookup(self, url: str) -> Optional[CachedPage]:
+        key = cache_key(url)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, stored_at FROM responses WHERE url = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return CachedPage(key, bytes(row[0]), row[1], row[2], row[3])
+
+    def touch(self, page: CachedPage) -> None:
+        """Réponse revalidée (304) : compte comme un hit, remonte dans le LRU."""
+        with self._lock:
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE url = ?", (time.time(), page.url))
+            self.hits += 1
+
+    def offline_hit(self, page: Optional[CachedPage]) -> None:
+        with self._lock:
+            if page is None:
+                self.misses += 1
+            else:
+                self._conn.execute("UPDATE responses SET last_access = ? WHERE url = ?", (time.time(), page.url))
+                self.hits += 1
+
+    def store(self, url: str, body: bytes, headers: Mapping[str, str]) -> None:
+        size = len(body)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (url, body, etag, last_modified, size, stored_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (cache_key(url), sqlite3.Binary(body), headers.get("ETag"), headers.get("Last-Modified"),
+                 size, now, now)
+            )
+            self.stores += 1
+            self.misses += 1
+            self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute("SELECT url, size FROM responses ORDER BY last_access").fetchall()
+        doomed = []
+        for url, size in rows:
+            if total <= target:
+                break
+            doomed.append((url,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE url = ?", doomed)
+        self.evictions += len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"entries": entries, "bytes": total, "max_bytes": self.max_bytes, "hits": self.hits,
+                "misses": self.misses, "stores": self.stores, "evictions": self.evictions}
+
+
+# ---------- Instance partagée ----------
+_default: Optional[HttpCache] = None
+_default_lock = threading.Lock()
+_default_failed = False
+
+
+def get_http_cache() -> Optional[HttpCache]:
+    global _default, _default_failed
+    if not ENABLED or _default_failed:
+        return None
+    if _default is None:
+        with _default_lock:
+            if _default is None and not _default_failed:
+                try:
+                    _default = HttpCache(DEFAULT_DB_PATH)
+                    log_info(f"[HTTP CACHE] Cache des pages API ouvert : {DEFAULT_DB_PATH}")
+                except (OSError, sqlite3.Error) as e:
+                    _default_failed = True
+                    log_warning(f"[HTTP CACHE] Cache indisponible ({e}) → requêtes directes")
+    return _default
@@ -0,0 +1,151 @@
+# core/http_pool.py
+"""
+Sessions HTTP (requests) partagées par tout le process, une par hôte.
+
+- keep-alive : les connexions TCP+TLS vers un nœud CDN servent à tous les
+  fichiers suivants au lieu d'une Session jetable par téléchargement
+- pool de chaque hôte dimensionné sur la limite globale de téléchargements
+  (core.limits.GLOBAL_MAX) : pas de connexion jetée faute de place dans le pool
+- éviction : pools inactifs depuis CU_HTTP_POOL_IDLE_S (défaut 90 s) vidés au
+  passage suivant ; la Session reste utilisable (urllib3 recrée à la demande,
+  les connexions en cours d'usage ne sont fermées qu'à leur libération)
+- compteurs requêtes / connexions ouvertes / réutilisées par hôte (`stats()`)
+
+    session = get_http_pool().session(url)
+    r = session.get(url, stream=True, timeout=(10, 30))
+"""
+from __future__ import annotations
+
+import os
+import time
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core.log import log_info
+from core.limits import GLOBAL_MAX
+
+IDLE_S = float(os.getenv("CU_HTTP_POOL_IDLE_S", "90"))
+POOL_SIZE = int(os.getenv("CU_HTTP_POOL_SIZE", str(GLOBAL_MAX)))
+SWEEP_EVERY_S = 30.0
+
+
+@dataclass
+class _HostPool:
+    host: str
+    session: requests.Session
+    adapter: HTTPAdapter
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    # compteurs des pools urllib3 déjà vidés (les pools vivants sont lus à la volée)
+    past_requests: int = 0
+    past_connections: int = 0
+    evictions: int = 0
+    evicted: bool = False    # déjà vidé depuis le dernier usage
+
+    def _live_counters(self):
+        requests_, connections = 0, 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_ += getattr(pool, "num_requests", 0)
+            connections += getattr(pool, "num_connections", 0)
+        return requests_, connections
+
+    def counters(self):
+        live_req, live_conn = self._live_counters()
+        return self.past_requests + live_req, self.past_connections + live_conn
+
+    def evict(self) -> None:
+        live_req, live_conn = self._live_counters()
+        self.past_requests += live_req
+        self.past_connections += live_conn
+        self.adapter.close()  # vide les pools urllib3 ; l'adaptateur reste utilisable
+        self.evictions += 1
+        self.evicted = True
+
+
+class HttpPool:
+    def __init__(self, pool_size: int = POOL_SIZE, idle_s: float = IDLE_S):
+        self.pool_size = max(1, int(pool_size))
+        self.idle_s = idle_s
+        self._hosts: Dict[str, _HostPool] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def _new_host(self, host: str) -> _HostPool:
+        session = requests.Session()
+        # pool_connections : l'hôte + les éventuelles redirections (site → nœud)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return _HostPool(host, session, adapter)
+
+    def session(self, url: str) -> requests.Session:
+        """Session keep-alive de l'hôte de `url` (créée au premier usage)."""
+        host = urlparse(url).netloc or url
+        now = time.monotonic()
+        with self._lock:
+            entry = self._hosts.get(host)
+            if entry is None:
+                entry = self._hosts[host] = self._new_host(host)
+            entry.last_used = now
+            entry.evicted = False
+            sweep = now - self._last_sweep >= SWEEP_EVERY_S
+            if sweep:
+                self._last_sweep = now
+        if sweep:
+            self.evict_idle()
+        return entry.session
+
+    def evict_idle(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            idle = [e for e in self._hosts.values() if not e.evicted and now - e.last_used >= self.idle_s]
+        for entry in idle:
+            entry.evict()
+        if idle:
+            log_info(f"[POOL] {len(idle)} pool(s) inactif(s) vidé(s) : {', '.join(e.host for e in idle)}")
+        return len(idle)
+
+    def stats(self) -> Dict[str, dict]:
+        now = time.monotonic()
+        with self._lock:
+            entries = list(self._hosts.values())
+        out = {}
+        for e in entries:
+            req, conn = e.counters()
+            out[e.host] = {
+                "requests": req,
+                "connections": conn,
+                "reused": max(0, req - conn),
+                "reuse_ratio": round(max(0, req - conn) / req, 3) if req else 0.0,
+                "idle_s": round(now - e.last_used, 1),
+                "evictions": e.evictions,
+            }
+        return out
+
+    def close(self) -> None:
+        with self._lock:
+            entries = list(self._hosts.values())
+            self._hosts.clear()
+        for e in entries:
+            e.session.close()
+
+
+_default: Optional[HttpPool] = None
+_default_lock = threading.Lock()
+
+
+def get_http_pool() -> HttpPool:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = HttpPool()
+        return _default
@@ -0,0 +1,143 @@
+# core/media_index.py
+"""
+Index O(1) sur les médias d'une fenêtre :
+- nom        → média (le premier rencontré, comme l'ancien next(...))
+- item Tree  → média
+et une file de téléchargement qui maintient l'ensemble des clés en file
+(`media in queue` sans comparaison de dicts).
+"""
+from __future__ import annotations
+
+import threading
+from collections.abc import Mapping
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+class MediaIndex:
+    def __init__(self, medias: List[dict]):
+        self.medias = medias
+        self._lock = threading.RLock()
+        self._by_name: Dict[str, dict] = {}
+        self._by_item: Dict[str, dict] = {}
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        with self._lock:
+            self._by_name.clear()
+            for m in self.medias:
+                self._index_locked(m)
+
+    def _index_locked(self, media: dict) -> None:
+        name = media.get("name")
+        if name:
+            self._by_name.setdefault(name, media)
+
+    # ---------- Mutations ----------
+    def add(self, media: dict) -> None:
+        """À appeler quand un média est ajouté à la liste (self.medias)."""
+        with self._lock:
+            self._index_locked(media)
+
+    def rename(self, media: dict, old_name: str) -> None:
+        with self._lock:
+            if old_name and self._by_name.get(old_name) is media:
+                del self._by_name[old_name]
+                # un homonyme éventuel reprend la place
+                for m in self.medias:
+                    if m is not media and m.get("name") == old_name:
+                        self._by_name[old_name] = m
+                        break
+            name = media.get("name")
+            if name:
+                self._by_name.setdefault(name, media)
+
+    def bind_item(self, item_id: str, media: Optional[dict]) -> None:
+        if item_id and media is not None:
+            with self._lock:
+                self._by_item[item_id] = media
+
+    def unbind_item(self, item_id: str) -> None:
+        with self._lock:
+            self._by_item.pop(item_id, None)
+
+    # ---------- Lookups ----------
+    def by_name(self, name: Optional[str]) -> Optional[dict]:
+        return self._by_name.get(name) if name else None
+
+    def by_item(self, item_id: Optional[str]) -> Optional[dict]:
+        return self._by_item.get(item_id) if item_id else None
+
+
+class MediaQueue(list):
+    """
+    list de médias qui tient à jour un compteur de clés en file :
+    `media in queue` est O(1) et compare les clés, pas les dicts complets.
+    """
+
+    def __init__(self, key_fn: Callable[[dict], str], items: Iterable[dict] = ()):
+        super().__init__()
+        self.key_fn = key_fn
+        self._counts: Dict[str, int] = {}
+        self.extend(items)
+
+    def _inc(self, media) -> None:
+        k = self.key_fn(media)
+        self._counts[k] = self._counts.get(k, 0) + 1
+
+    def _dec(self, media) -> None:
+        k = self.key_fn(media)
+        n = self._counts.get(k, 0) - 1
+        if n > 0:
+            self._counts[k] = n
+        else:
+            self._counts.pop(k, None)
+
+    def _recount(self) -> None:
+        self._counts.clear()
+        for m in self:
+            self._inc(m)
+
+    def __contains__(self, media) -> bool:
+        if not isinstance(media, Mapping):
+            return False
+        return self.key_fn(media) in self._counts
+
+    def has_key(self, key: str) -> bool:
+        return key in self._counts
+
+    def append(self, media) -> None:
+        super().append(media)
+        self._inc(media)
+
+    def insert(self, index, media) -> None:
+        super().insert(index, media)
+        self._inc(media)
+
+    def extend(self, items) -> None:
+        for m in items:
+            self.append(m)
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def pop(self, index=-1):
+        media = super().pop(index)
+        self._dec(media)
+        return media
+
+    def remove(self, media) -> None:
+        super().remove(media)
+        self._dec(media)
+
+    def clear(self) -> None:
+        super().clear()
+        self._counts.clear()
+
+    def __setitem__(self, index, value) -> None:
+        super().__setitem__(index, value)
+        self._recount()
+
+    def __delitem__(self, index) -> None:
+        super().__delitem__(index)
+        self._recount()
@@ -0,0 +1,166 @@
+# core/media_record.py
+"""
+Représentation compacte d'un média (alternative aux dicts de 15+ clés).
+
+- `__slots__` : pas de dict par instance
+- statut / type / vitesse / erreur / hash_check internés (une seule chaîne partagée)
+- `url` dérivée de `path` + préfixe interné ("https://coomer.st/data")
+- interface dict (get, [], in, setdefault, update, pop, items, dict(record)...)
+  pour migrer MediaWindow / RestoreService / ProfileManager progressivement.
+
+Une clé jamais affectée est « absente » (slot non initialisé), comme dans un dict.
+"""
+from __future__ import annotations
+
+import sys
+from collections.abc import Mapping, MutableMapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# ordre des clés = ordre historique des JSON (to_dict reste diffable)
+FIELDS = (
+    "id", "name", "path", "title", "added", "url", "size_http", "cdn_checked",
+    "percent", "downloaded", "retry_count", "error", "status", "type",
+    "hash_check", "local_size", "speed", "last_downloaded", "checksum",
+)
+_SLOT_FIELDS = tuple(f for f in FIELDS if f != "url")
+_FIELD_SET = frozenset(FIELDS)
+
+# valeurs à faible cardinalité : internées
+_INTERN_FIELDS = frozenset(("status", "type", "speed", "error", "hash_check"))
+_INTERN_MAX_LEN = 64
+
+STATUSES = ("Waiting", "Downloading", "Retrying", "Completed", "Paused", "Failed",
+            "Missing", "Incomplete", "Ignored")
+TYPES = ("video", "image")
+for _s in STATUSES + TYPES + ("", "0 B/s", "Mismatch"):
+    sys.intern(_s)
+
+
+def _intern(value: Any) -> Any:
+    if type(value) is str and len(value) <= _INTERN_MAX_LEN:
+        return sys.intern(value)
+    return value
+
+
+class MediaRecord(MutableMapping):
+    __slots__ = _SLOT_FIELDS + ("_url_prefix", "_url_full", "_extra")
+
+    def __init__(self, data: Optional[Mapping] = None, **kwargs):
+        self._url_prefix = None
+        self._url_full = None
+        self._extra = None
+        if data:
+            if "path" in data:
+                self["path"] = data["path"]  # avant url, pour pouvoir la dériver
+            for k, v in data.items():
+                self[k] = v
+        for k, v in kwargs.items():
+            self[k] = v
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> "MediaRecord":
+        return data if isinstance(data, cls) else cls(data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: self[k] for k in self}
+
+    # ---------- url dérivée ----------
+    def _get_url(self):
+        if self._url_full is not None:
+            return self._url_full
+        if self._url_prefix is not None:
+            return self._url_prefix + getattr(self, "path", "")
+        raise KeyError("url")
+
+    def _set_url(self, url) -> None:
+        path = getattr(self, "path", None)
+        if type(url) is str and path and url.endswith(path):
+            self._url_prefix = sys.intern(url[: len(url) - len(path)])
+            self._url_full = None
+        else:
+            self._url_prefix = None
+            self._url_full = url
+
+    # ---------- MutableMapping ----------
+    def __getitem__(self, key: str) -> Any:
+        if key == "url":
+            return self._get_url()
+        if key in _FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key == "url":
+            self._set_url(value)
+        elif key in _FIELD_SET:
+            if key == "path" and self._url_prefix is not None:
+                # garder l'url figée si le chemin change
+                url = self._get_url()
+                object.__setattr__(self, key, value)
+                self._set_url(url)
+                return
+            object.__setattr__(self, key, _intern(value) if key in _INTERN_FIELDS else value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key == "url":
+            if self._url_prefix is None and self._url_full is None:
+                raise KeyError(key)
+            self._url_prefix = self._url_full = None
+        elif key in _FIELD_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        if key == "url":
+            return self._url_prefix is not None or self._url_full is not None
+        if key in _FIELD_SET:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self) -> Iterator[str]:
+        for k in FIELDS:
+            if k in self:
+                yield k
+        if self._extra:
+            yield from list(self._extra)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"MediaRecord({self.to_dict()!r})"
+
+    def copy(self) -> "MediaRecord":
+        return MediaRecord(self)
+
+
+def to_records(medias: Iterable[Mapping]) -> List[MediaRecord]:
+    """Liste de dicts → liste de MediaRecord (idempotent)."""
+    return [MediaRecord.from_dict(m) for m in medias]
+
+
+def to_dicts(medias: Iterable[Mapping]) -> List[dict]:
+    """Inverse de to_records (pour json.dump)."""
+    return [m.to_dict() if isinstance(m, MediaRecord) else dict(m) for m in medias]
+
+
+def json_default(obj: Any) -> Any:
+    """`default=` pour json.dump(s) : sérialise les MediaRecord comme des dicts."""
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
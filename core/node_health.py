@@ -0,0 +1,216 @@
+# core/node_health.py
+"""
+Santé des nœuds CDN (coomer.st, n1..n4) partagée par tout le process.
+
+Par hôte : fenêtre des CU_NODE_WINDOW derniers résultats (taux de succès),
+compteurs 403 / 404 / 5xx / erreurs réseau, latence (moyenne glissante
+du temps jusqu'aux en-têtes) et un disjoncteur :
+
+- fermé  : le nœud est essayé normalement
+- ouvert : CU_NODE_FAIL_STREAK échecs d'affilée, ou taux d'échec ≥ CU_NODE_FAIL_RATE
+           sur une fenêtre pleine à moitié → le nœud est sauté pendant le cool-down
+           (CU_NODE_COOLDOWN s, doublé à chaque rechute, plafonné à 10 min)
+- demi-ouvert : cool-down écoulé, un seul essai ; succès → fermé, échec → ouvert
+
+Un 404 compte dans le taux d'échec mais pas dans la série : un miroir peut
+légitimement ne pas avoir un fichier, pas cent de suite.
+
+    health = get_node_health()
+    for url in health.order(candidate_urls): ...
+    health.record_success(url, latency) / health.record_failure(url, status)
+"""
+from __future__ import annotations
+
+import os
+import time
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+from core.log import log_info, log_warning
+
+WINDOW = int(os.getenv("CU_NODE_WINDOW", "50"))
+FAIL_STREAK = int(os.getenv("CU_NODE_FAIL_STREAK", "5"))
+FAIL_RATE = float(os.getenv("CU_NODE_FAIL_RATE", "0.6"))
+COOLDOWN_S = float(os.getenv("CU_NODE_COOLDOWN", "60"))
+MAX_COOLDOWN_S = 600.0
+LATENCY_ALPHA = 0.2
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+
+def _host(url_or_host: str) -> str:
+    # netloc (hôte:port) comme core.http_pool : des nœuds sur le même hôte, ports différents, restent distincts
+    if "/" in url_or_host:
+        return urlparse(url_or_host).netloc
+    return url_or_host
+
+
+def failure_kind(status: Optional[int]) -> str:
+    if status is None:
+        return "error"
+    if status in (403, 404):
+        return str(status)
+    if status >= 500:
+        return "5xx"
+    return "other"
+
+
+@dataclass
+class NodeStats:
+    host: str
+    outcomes: Deque[bool] = field(default_factory=lambda: deque(maxlen=WINDOW))
+    counts: Dict[str, int] = field(default_factory=lambda: {"ok": 0, "403": 0, "404": 0, "5xx": 0,
+                                                              "error": 0, "other": 0})
+    latency: Optional[float] = None
+    streak: int = 0
+    state: str = CLOSED
+    cooldown: float = COOLDOWN_S
+    open_until: float = 0.0
+    probing: bool = False
+    probe_started: float = 0.0
+
+    @property
+    def success_rate(self) -> float:
+        # lissage de Laplace : un nœud jamais essayé vaut 0.5, pas 0 ni 1
+        return (sum(self.outcomes) + 1) / (len(self.outcomes) + 2)
+
+    def score(self) -> tuple:
+        """Clé de tri : disjoncteur fermé d'abord, puis meilleur taux, puis plus rapide."""
+        return (self.state == OPEN, -round(self.success_rate, 2), self.latency or 0.0)
+
+    def as_dict(self) -> dict:
+        return {"state": self.state, "success_rate": round(self.success_rate, 3),
+                "latency_ms": round(self.latency * 1000) if self.latency is not None else None,
+                "samples": len(self.outcomes), **self.counts,
+                "open_for_s": round(max(0.0, self.open_until - time.monotonic()), 1)}
+
+
+class NodeHealthRegistry:
+    def __init__(self, fail_streak: int = FAIL_STREAK, fail_rate: float = FAIL_RATE,
+                 cooldown: float = COOLDOWN_S):
+        self.fail_streak = max(1, int(fail_streak))
+        self.fail_rate = fail_rate
+        self.base_cooldown = cooldown
+        self._nodes: Dict[str, NodeStats] = {}
+        self._lock = threading.Lock()
+
+    def _node(self, host: str) -> NodeStats:
+        node = self._nodes.get(host)
+        if node is None:
+            node = self._nodes[host] = NodeStats(host, cooldown=self.base_cooldown)
+        return node
+
+    # ---------- Disjoncteur ----------
+    def _available_locked(self, node: NodeStats, now: float) -> bool:
+        if node.state == OPEN and now >= node.open_until:
+            node.state = HALF_OPEN
+            node.probing = False
+        if node.state == OPEN:
+            return False
+        if node.state == HALF_OPEN:
+            # essai abandonné sans résultat (arrêt, crash) : on en autorise un autre après un cool-down
+            return not node.probing or now - node.probe_started >= node.cooldown
+        return True
+
+    def allow(self, url_or_host: str) -> bool:
+        """Le nœud peut-il être essayé maintenant ? (réserve l'essai unique d'un demi-ouvert)"""
+        now = time.monotonic()
+        with self._lock:
+            node = self._node(_host(url_or_host))
+            if not self._available_locked(node, now):
+                return False
+            if node.state == HALF_OPEN:
+                node.probing = True
+                node.probe_started = now
+            return True
+
+    def is_open(self, url_or_host: str) -> bool:
+        """Circuit ouvert (sans toucher à l'essai d'un demi-ouvert) : inutile d'insister sur ce nœud."""
+        with self._lock:
+            node = self._node(_host(url_or_host))
+            return node.state == OPEN and time.monotonic() < node.open_until
+
+    def _open_locked(self, node: NodeStats, now: float, reason: str) -> None:
+        if node.state == HALF_OPEN:
+            node.cooldown = min(node.cooldown * 2, MAX_COOLDOWN_S)
+        node.state = OPEN
+        node.probing = False
+        node.open_until = now + node.cooldown
+        log_warning(f"[HEALTH] ⛔ Circuit ouvert sur {node.host} ({reason}) pour {node.cooldown:.0f}s")
+
+    def order(self, urls: Iterable[str]) -> List[str]:
+        """
+        Candidats triés par santé, nœuds au disjoncteur ouvert retirés.
+        Si tous sont ouverts, on les garde quand même (du plus proche de la réouverture au plus lointain).
+        """
+        urls = list(urls)
+        now = time.monotonic()
+        with self._lock:
+            nodes = {u: self._node(_host(u)) for u in urls}
+            usable = [u for u in urls if self._available_locked(nodes[u], now)]
+            if not usable:
+                return sorted(urls, key=lambda u: nodes[u].open_until)
+            # tri stable : à santé égale, l'ordre d'origine (coomer.st puis n1..n4) est conservé
+            return sorted(usable, key=lambda u: nodes[u].score())
+
+    # ---------- Résultats ----------
+    def record_success(self, url_or_host: str, latency: Optional[float] = None) -> None:
+        with self._lock:
+            node = self._node(_host(url_or_host))
+            node.outcomes.append(True)
+            node.counts["ok"] += 1
+            node.streak = 0
+            if latency is not None:
+                node.latency = latency if node.latency is None else \
+                    (1 - LATENCY_ALPHA) * node.latency + LATENCY_ALPHA * latency
+            if node.state != CLOSED:
+                log_info(f"[HEALTH] ✅ {node.host} rétabli")
+                # la fenêtre d'avant la panne ne doit pas rouvrir le circuit au premier raté
+                node.outcomes.clear()
+                node.outcomes.append(True)
+                node.state = CLOSED
+                node.probing = False
+                node.cooldown = self.base_cooldown
+
+    def record_failure(self, url_or_host: str, status: Optional[int] = None) -> None:
+        """status HTTP (403/404/5xx…) ou None pour une erreur réseau / timeout."""
+        kind = failure_kind(status)
+        now = time.monotonic()
+        with self._lock:
+            node = self._node(_host(url_or_host))
+            node.outcomes.append(False)
+            node.counts[kind] += 1
+            if kind != "404":
+                node.streak += 1
+            if node.state == HALF_OPEN:
+                self._open_locked(node, now, f"échec de l'essai : {kind}")
+            elif node.state == CLOSED:
+                failures = len(node.outcomes) - sum(node.outcomes)
+                if node.streak >= self.fail_streak:
+                    self._open_locked(node, now, f"{node.streak} échecs d'affilée")
+                elif len(node.outcomes) >= WINDOW // 2 and failures / len(node.outcomes) >= self.fail_rate:
+                    self._open_locked(node, now, f"{failures}/{len(node.outcomes)} échecs récents")
+
+    # ---------- Stats ----------
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            return {host: node.as_dict() for host, node in self._nodes.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._nodes.clear()
+
+
+_default: Optional[NodeHealthRegistry] = None
+_default_lock = threading.Lock()
+
+
+def get_node_health() -> NodeHealthRegistry:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = NodeHealthRegistry()
+        return _default
@@ -0,0 +1,119 @@
+# core/pagination_cache.py
+"""
+Mode de pagination de l'API mémorisé : data/pagination_modes.json
+
+    {"version": 1,
+     "services": {"onlyfans": {"mode": "before_id", "ts": 1700000000.0}},
+     "profiles": {"fansly:bob": {"mode": "page", "ts": ...}}}
+
+Un mode par service ; un profil n'a sa propre entrée que s'il diffère du
+mode du service. Les entrées expirent après CU_PAGINATION_TTL_H heures
+(défaut 168 = 7 jours). Le mode mémorisé est essayé en premier : s'il ne
+renvoie plus d'ids nouveaux, on retombe sur le sondage complet.
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from core.log import log_info, log_warning
+
+CACHE_VERSION = 1
+DEFAULT_PATH = os.getenv("CU_PAGINATION_CACHE", os.path.join("data", "pagination_modes.json"))
+DEFAULT_TTL_S = float(os.getenv("CU_PAGINATION_TTL_H", "168")) * 3600
+
+
+class PaginationModeCache:
+    """Lecture / écriture thread-safe, écriture atomique (comme ProfileIndex)."""
+
+    def __init__(self, path: str = DEFAULT_PATH, ttl: float = DEFAULT_TTL_S):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, dict]] | None = None
+
+    def _load_locked(self) -> Dict[str, Dict[str, dict]]:
+        if self._data is not None:
+            return self._data
+        data: Dict[str, Dict[str, dict]] = {"services": {}, "profiles": {}}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            if raw.get("version") == CACHE_VERSION:
+                data["services"] = dict(raw.get("services") or {})
+                data["profiles"] = dict(raw.get("profiles") or {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log_warning(f"[PAGINATION] Cache illisible, ignoré : {self.path} ({e})")
+        self._data = data
+        return data
+
+    def _write_locked(self) -> None:
+        payload = {"version": CACHE_VERSION, **(self._data or {})}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def _fresh(self, entry: Optional[dict]) -> Optional[str]:
+        if not entry:
+            return None
+        if time.time() - float(entry.get("ts") or 0) > self.ttl:
+            return None
+        return entry.get("mode")
+
+    # ---------- API ----------
+    def get(self, service: str, username: str) -> Optional[str]:
+        """Mode à essayer en premier (celui du profil s'il en a un, sinon celui du service)."""
+        with self._lock:
+            data = self._load_locked()
+            return (self._fresh(data["profiles"].get(f"{service}:{username}"))
+                    or self._fresh(data["services"].get(service)))
+
+    def put(self, service: str, username: str, mode: str) -> None:
+        """Enregistre le mode gagnant d'un sondage (ou le confirme)."""
+        key = f"{service}:{username}"
+        now = round(time.time(), 1)
+        with self._lock:
+            data = self._load_locked()
+            service_mode = self._fresh(data["services"].get(service))
+            if service_mode is None or service_mode == mode:
+                data["services"][service] = {"mode": mode, "ts": now}
+                data["profiles"].pop(key, None)
+            else:
+                data["profiles"][key] = {"mode": mode, "ts": now}
+            try:
+                self._write_locked()
+            except OSError as e:
+                log_warning(f"[PAGINATION] Écriture impossible : {self.path} ({e})")
+        if service_mode != mode:
+            log_info(f"[PAGINATION] Mode mémorisé pour {key} : {mode}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data = {"services": {}, "profiles": {}}
+            self._write_locked()
+
+
+def prefer_mode(candidates: List[Tuple[dict, str]], mode: Optional[str]) -> List[Tuple[dict, str]]:
+    """Met en tête les candidats du mode mémorisé (les autres restent en repli, dans l'ordre)."""
+    if not mode:
+        return candidates
+    return [c for c in candidates if c[1] == mode] + [c for c in candidates if c[1] != mode]
+
+
+_default: Optional[PaginationModeCache] = None
+_default_lock = threading.Lock()
+
+
+def get_pagination_cache() -> PaginationModeCache:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = PaginationModeCache()
+        return _default
@@ -0,0 +1,80 @@
+# core/profile_cache.py
+"""
+Cache LRU des profils déjà parsés, validé par l'empreinte disque
+(chemin, mtime_ns, taille [+ taille du journal]).
+
+Le poids d'une entrée est la taille des fichiers source : le plafond
+(`max_bytes`, défaut CU_PROFILE_CACHE_MB=64) borne donc la mémoire
+proportionnellement au JSON parsé.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+DEFAULT_MAX_BYTES = int(os.getenv("CU_PROFILE_CACHE_MB", "64")) * 1024 * 1024
+
+
+class ProfileCache:
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max(0, int(max_bytes))
+        self._lock = threading.Lock()
+        # key -> (stamp, weight, value)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, stamp: Any) -> Optional[Any]:
+        """Valeur en cache si l'empreinte n'a pas changé, sinon None (entrée périmée retirée)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or stamp is None or entry[0] != stamp:
+                if entry is not None:
+                    self._drop_locked(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: Hashable, stamp: Any, value: Any, weight: int) -> None:
+        if stamp is None or weight > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop_locked(key)
+            self._entries[key] = (stamp, weight, value)
+            self._bytes += weight
+            while self._bytes > self.max_bytes and self._entries:
+                old_key = next(iter(self._entries))
+                self._drop_locked(old_key)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._drop_locked(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _drop_locked(self, key: Hashable) -> None:
+        _, weight, _ = self._entries.pop(key)
+        self._bytes -= weight
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
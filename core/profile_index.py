@@ -0,0 +1,221 @@
+# core/profile_index.py
+"""
+Index des profils : data/index.json
+
+Un résumé léger par profil (compteurs par type/statut, octets sur disque,
+last_update, chemin de téléchargement) pour que la fenêtre principale démarre
+sans parser chaque JSON complet. Mis à jour à chaque sauvegarde ; une entrée
+dont le JSON source a changé (stamp différent) est recalculée à la lecture.
+
+Reconstruction complète :
+    python -m core.profile_index rebuild
+"""
+from __future__ import annotations
+
+import os
+import sys
+import json
+import threading
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Iterable, List, Optional
+
+from core.log import log_warning, log_error
+
+INDEX_FILENAME = "index.json"
+INDEX_VERSION = 1
+
+
+def _is_completed(m: dict) -> bool:
+    if (m.get("status") or "").strip() == "Completed":
+        return True
+    try:
+        return float(str(m.get("percent", 0)).replace("%", "")) >= 100
+    except Exception:
+        return False
+
+
+@dataclass
+class ProfileSummary:
+    service: str
+    username: str
+    last_update: str = "1970-01-01T00:00:00+00:00"
+    download_path: str = ""
+    medias_count: int = 0
+    # hors "Ignored", comme l'affichage historique
+    videos_total: int = 0
+    videos_completed: int = 0
+    photos_total: int = 0
+    photos_completed: int = 0
+    video_bytes: int = 0
+    photo_bytes: int = 0
+    by_status: Dict[str, int] = field(default_factory=dict)
+    # (mtime_ns, taille) du JSON + taille du journal au moment du calcul
+    stamp: Optional[List[int]] = None
+
+    @property
+    def key_str(self) -> str:
+        return f"{self.service}:{self.username}"
+
+    @property
+    def percent(self) -> float:
+        total = self.videos_total + self.photos_total
+        if total == 0:
+            return 100.0
+        return round(((self.videos_completed + self.photos_completed) / total) * 100.0, 1)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "ProfileSummary":
+        known = {k: d[k] for k in cls.__dataclass_fields__ if k in d}
+        return cls(**known)
+
+    @classmethod
+    def from_medias(
+        cls,
+        service: str,
+        username: str,
+        medias: Iterable[dict],
+        last_update: str,
+        download_path: str,
+        stamp: Optional[List[int]] = None,
+    ) -> "ProfileSummary":
+        s = cls(service=service, username=username, last_update=last_update or cls.last_update,
+                download_path=download_path, stamp=stamp)
+        for m in medias:
+            s.medias_count += 1
+            status = m.get("status") or "Unknown"
+            s.by_status[status] = s.by_status.get(status, 0) + 1
+            mtype = m.get("type")
+            try:
+                size = int(m.get("local_size") or 0)
+            except (TypeError, ValueError):
+                size = 0
+            if mtype == "video":
+                s.video_bytes += size
+            elif mtype == "image":
+                s.photo_bytes += size
+            else:
+                continue
+            if status == "Ignored":
+                continue
+            done = _is_completed(m)
+            if mtype == "video":
+                s.videos_total += 1
+                s.videos_completed += done
+            else:
+                s.photos_total += 1
+                s.photos_completed += done
+        return s
+
+
+class ProfileIndex:
+    """Lecture / écriture thread-safe de data/index.json (écriture atomique)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, ProfileSummary] | None = None
+
+    def _load_locked(self) -> Dict[str, ProfileSummary]:
+        if self._entries is not None:
+            return self._entries
+        entries: Dict[str, ProfileSummary] = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            if raw.get("version") == INDEX_VERSION:
+                for k, d in (raw.get("profiles") or {}).items():
+                    entries[k] = ProfileSummary.from_dict(d)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log_warning(f"[INDEX] Index illisible, il sera reconstruit : {self.path} ({e})")
+        self._entries = entries
+        return entries
+
+    def _write_locked(self) -> None:
+        payload = {
+            "version": INDEX_VERSION,
+            "profiles": {k: s.to_dict() for k, s in sorted((self._entries or {}).items())},
+        }
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    # ---------- API ----------
+    def get(self, key_str: str) -> Optional[ProfileSummary]:
+        with self._lock:
+            return self._load_locked().get(key_str)
+
+    def all(self) -> Dict[str, ProfileSummary]:
+        with self._lock:
+            return dict(self._load_locked())
+
+    def put(self, summary: ProfileSummary) -> None:
+        self.put_many([summary])
+
+    def put_many(self, summaries: Iterable[ProfileSummary], *, drop: Iterable[str] = ()) -> None:
+        with self._lock:
+            entries = self._load_locked()
+            for s in summaries:
+                entries[s.key_str] = s
+            for k in drop:
+                entries.pop(k, None)
+            try:
+                self._write_locked()
+            except Exception as e:
+                log_warning(f"[INDEX] Écriture échouée : {e}")
+
+    def remove(self, key_str: str) -> None:
+        self.put_many([], drop=[key_str])
+
+    def replace_all(self, summaries: Iterable[ProfileSummary]) -> None:
+        with self._lock:
+            self._entries = {s.key_str: s for s in summaries}
+            self._write_locked()
+
+
+def file_stamp(json_path: str, journal_path: str | None = None) -> Optional[List[int]]:
+    """Empreinte bon marché (un stat) permettant de détecter un JSON modifié hors index."""
+    try:
+        st = os.stat(json_path)
+    except OSError:
+        return None
+    journal_size = 0
+    if journal_path:
+        try:
+            journal_size = os.path.getsize(journal_path)
+        except OSError:
+            pass
+    return [st.st_mtime_ns, st.st_size, journal_size]
+
+
+def _main(argv: List[str]) -> int:
+    if not argv or argv[0] != "rebuild":
+        print("usage: python -m core.profile_index rebuild")
+        return 2
+    from settings import load_settings
+    from core.profile_manager import ProfileManager
+
+    settings = load_settings()
+    pm = ProfileManager(
+        data_dir="data",
+        default_download_dir=settings.get("download_dir", "downloads"),
+        profile_dirs=settings.get("profile_dirs", {}),
+        storage_backend=settings.get("storage_backend", "json"),
+    )
+    try:
+        n = pm.rebuild_index()
+        print(f"rebuild: {n} profil(s) indexé(s)")
+        return 0
+    except Exception as e:
+        log_error(f"[INDEX] Reconstruction échouée : {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,221 @@
+# core/profile_journal.py
+"""
+Journal append-only des transitions d'état des médias d'un profil.
+
+data/<service>/<user>.journal : une ligne JSON par changement
+    {"k": <clé de ligne>, "ts": <epoch>, "m": {"status": ..., "percent": ..., ...}}
+
+La clé de ligne est celle du média dans le snapshot courant (media_row_keys :
+doublons suffixés #n), relevée à l'écriture du snapshot : elle reste valable
+si le chemin du média change ensuite et distingue les doublons.
+
+Le snapshot data/<service>/<user>.json reste la base ; au chargement on rejoue
+le journal par-dessus (rejeu idempotent). La compaction réécrit le snapshot puis
+supprime le journal :
+
+    with journal.snapshot():   # .journal → .journal.old (rotate)
+        write_json(...)         # si OK → .journal.old supprimé (drop_rotated)
+
+Un crash entre les deux laisse .journal.old + .journal, rejoués dans l'ordre.
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from core.log import log_info, log_warning
+from utils.media_utils import media_row_keys
+
+JOURNAL_EXT = ".journal"
+ROTATED_EXT = ".old"
+
+# seuil de compaction (surchargeable via settings.json → journal_compact_bytes)
+DEFAULT_COMPACT_BYTES = int(os.getenv("CU_JOURNAL_COMPACT_BYTES", str(1024 * 1024)))
+
+# champs d'état journalisés (le reste du média ne change pas après l'ajout)
+JOURNAL_FIELDS = (
+    "status", "percent", "downloaded", "error", "retry_count", "path",
+    "local_size", "size_http", "cdn_checked", "hash_check", "checksum", "type",
+)
+
+
+# une instance par chemin (for_json) : un seul verrou pour tous les écrivains du process
+_journals: Dict[str, "ProfileJournal"] = {}
+_journals_lock = threading.Lock()
+
+
+def journal_path_for(json_path: str) -> str:
+    base = json_path[:-5] if json_path.endswith(".json") else json_path
+    return base + JOURNAL_EXT
+
+
+def _read_entries(path: str) -> Iterator[dict]:
+    """Lit un journal en tolérant une dernière ligne tronquée (crash pendant l'append)."""
+    try:
+        f = open(path, "r", encoding="utf-8")
+    except FileNotFoundError:
+        return
+    with f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                log_warning(f"[JOURNAL] Ligne {lineno} illisible ignorée : {path}")
+                continue
+            if isinstance(entry, dict) and "k" in entry:
+                yield entry
+
+
+class ProfileJournal:
+    def __init__(self, path: str):
+        self.path = path
+        self.rotated_path = path + ROTATED_EXT
+        self._lock = threading.Lock()
+        self._tail_checked = False
+
+    @classmethod
+    def for_json(cls, json_path: str) -> "ProfileJournal":
+        """Journal partagé du profil : fenêtre et ProfileManager écrivent sous le même verrou,
+        une rotation ne peut pas s'intercaler au milieu d'un append d'un autre écrivain."""
+        path = os.path.abspath(journal_path_for(json_path))
+        with _journals_lock:
+            journal = _journals.get(path)
+            if journal is None:
+                journal = _journals[path] = cls(path)
+            return journal
+
+    # ---------- Écriture ----------
+    def append(self, media: dict, key: str) -> int:
+        """Ajoute une transition (O(1)) ; `key` = clé de ligne du média dans le snapshot courant.
+        Retourne la taille du journal après écriture."""
+        entry = {
+            "k": key,
+            "ts": round(time.time(), 3),
+            "m": {f: media[f] for f in JOURNAL_FIELDS if f in media},
+        }
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            if not self._tail_checked:
+                line = self._repair_tail() + line
+                self._tail_checked = True
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                return f.tell()
+
+    def _repair_tail(self) -> str:
+        """Si la dernière ligne a été tronquée par un crash, on repart sur une ligne propre."""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                return "" if f.read(1) == b"\n" else "\n"
+        except OSError:
+            return ""
+
+    def size(self) -> int:
+        total = 0
+        for p in (self.path, self.rotated_path):
+            try:
+                total += os.path.getsize(p)
+            except OSError:
+                pass
+        return total
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path) or os.path.exists(self.rotated_path)
+
+    # ---------- Rejeu ----------
+    def entries(self) -> List[dict]:
+        return list(_read_entries(self.rotated_path)) + list(_read_entries(self.path))
+
+    def pending_updates(self) -> Dict[str, dict]:
+        """Champs à appliquer par clé de ligne (entrées fusionnées dans l'ordre du journal)."""
+        updates: Dict[str, dict] = {}
+        for entry in self.entries():
+            updates.setdefault(entry["k"], {}).update(entry.get("m") or {})
+        return updates
+
+    @staticmethod
+    def apply_updates(medias: List[dict], updates: Dict[str, dict], seen: Optional[Dict[str, int]] = None) -> int:
+        """Applique des mises à jour pré-calculées (ex. paquet par paquet au chargement progressif :
+        même `seen` d'un paquet à l'autre pour numéroter les doublons sur toute la liste)."""
+        applied = 0
+        for key, m in zip(media_row_keys(medias, seen), medias):
+            fields = updates.get(key)
+            if fields:
+                m.update(fields)
+                applied += 1
+        return applied
+
+    def replay(self, medias: List[dict]) -> int:
+        """Applique le journal sur la liste (en place). Retourne le nb d'entrées appliquées."""
+        entries = self.entries()
+        if not entries:
+            return 0
+        by_key = dict(zip(media_row_keys(medias), medias))
+        applied = missing = 0
+        for entry in entries:
+            m = by_key.get(entry["k"])
+            if m is None:
+                missing += 1
+                continue
+            m.update(entry.get("m") or {})
+            applied += 1
+        log_info(f"[JOURNAL] Rejeu {os.path.basename(self.path)} : {applied} appliquée(s), {missing} inconnue(s)")
+        return applied
+
+    # ---------- Compaction ----------
+    @contextmanager
+    def snapshot(self):
+        """Encadre l'écriture d'un snapshot complet : le journal n'est supprimé que si elle réussit."""
+        self.rotate()
+        yield
+        self.drop_rotated()
+
+    def rotate(self) -> None:
+        """Début de compaction : .journal → .journal.old, les appends suivants repartent à vide."""
+        with self._lock:
+            if os.path.exists(self.path):
+                if os.path.exists(self.rotated_path):
+                    # compaction précédente interrompue : on concatène pour ne rien perdre
+                    with open(self.path, "r", encoding="utf-8") as src, \
+                            open(self.rotated_path, "a", encoding="utf-8") as dst:
+                        dst.write(src.read())
+                    os.remove(self.path)
+                else:
+                    os.replace(self.path, self.rotated_path)
+            self._tail_checked = False
+
+    def drop_rotated(self) -> None:
+        """Snapshot écrit : les transitions tournées y sont intégrées."""
+        with self._lock:
+            try:
+                os.remove(self.rotated_path)
+            except FileNotFoundError:
+                pass
+
+    def discard(self) -> None:
+        with self._lock:
+            for p in (self.path, self.rotated_path):
+                try:
+                    os.remove(p)
+                except FileNotFoundError:
+                    pass
+
+
+def replay_journal(json_path: str, payload: Optional[dict]) -> int:
+    """Rejoue data/<service>/<user>.journal sur un payload chargé depuis le JSON."""
+    if not payload:
+        return 0
+    journal = ProfileJournal.for_json(json_path)
+    if not journal.exists():
+        return 0
+    return journal.replay(payload.get("medias") or [])
@@ -0,0 +1,147 @@
+# core/profile_loader.py
+"""
+Chargement progressif d'un profil JSON : le tableau "medias" est décodé
+objet par objet (json.JSONDecoder.raw_decode sur un tampon lu par blocs)
+et remis par paquets, sans attendre la fin du fichier.
+
+    loader = ProfileStreamLoader(json_path, first_chunk=300, chunk_size=1000)
+    for chunk in loader.iter_chunks():
+        ...                      # listes de dicts médias
+    loader.header                # {"last_update": ..., "profile_name": ...}
+    loader.stats                 # temps du 1er paquet, total, nb de médias
+"""
+from __future__ import annotations
+
+import json
+import time
+from typing import Dict, Iterator, List
+
+READ_SIZE = 256 * 1024
+_WS = " \t\r\n"
+_NUMBER_CHARS = frozenset("0123456789+-.eE")
+
+
+class ProfileStreamLoader:
+    def __init__(self, json_path: str, first_chunk: int = 300, chunk_size: int = 1000, read_size: int = READ_SIZE):
+        self.json_path = json_path
+        self.first_chunk = max(1, int(first_chunk))
+        self.chunk_size = max(1, int(chunk_size))
+        self.read_size = read_size
+        self.header: Dict = {}
+        self.stats: Dict[str, float] = {"first_chunk_s": 0.0, "total_s": 0.0, "count": 0}
+
+        self._decoder = json.JSONDecoder()
+        self._f = None
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    # ---------- tampon ----------
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        data = self._f.read(self.read_size)
+        if not data:
+            self._eof = True
+            return False
+        # compacte le tampon pour rester O(n) au total
+        self._buf = self._buf[self._pos:] + data
+        self._pos = 0
+        return True
+
+    def _skip_ws(self) -> None:
+        while True:
+            buf, pos = self._buf, self._pos
+            while pos < len(buf) and buf[pos] in _WS:
+                pos += 1
+            self._pos = pos
+            if pos < len(buf) or not self._fill():
+                return
+
+    def _peek(self) -> str:
+        self._skip_ws()
+        if self._pos >= len(self._buf):
+            raise ValueError(f"Fin de fichier inattendue : {self.json_path}")
+        return self._buf[self._pos]
+
+    def _expect(self, ch: str) -> None:
+        if self._peek() != ch:
+            raise ValueError(f"'{ch}' attendu à l'offset {self._pos} : {self.json_path}")
+        self._pos += 1
+
+    def _decode_value(self):
+        self._skip_ws()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # un nombre coupé par un bloc (« 1. », « 1.5e », « 12 » + « 34 ») peut être décodé
+            # en préfixe : on relit tant que le tampon ne contient rien d'autre après lui
+            if (isinstance(value, (int, float)) and not isinstance(value, bool)
+                    and not self._eof and self._number_may_continue(end) and self._fill()):
+                continue
+            self._pos = end
+            return value
+
+    def _number_may_continue(self, end: int) -> bool:
+        buf = self._buf
+        while end < len(buf):
+            if buf[end] not in _NUMBER_CHARS:
+                return False
+            end += 1
+        return True
+
+    # ---------- parcours ----------
+    def iter_chunks(self) -> Iterator[List[dict]]:
+        t0 = time.perf_counter()
+        first_done = False
+        with open(self.json_path, "r", encoding="utf-8") as self._f:
+            self._expect("{")
+            if self._peek() == "}":
+                self._pos += 1
+                return
+            while True:
+                key = self._decode_value()
+                self._expect(":")
+                if key == "medias" and self._peek() == "[":
+                    self._pos += 1
+                    chunk: List[dict] = []
+                    limit = self.first_chunk
+                    if self._peek() == "]":
+                        self._pos += 1
+                    else:
+                        while True:
+                            chunk.append(self._decode_value())
+                            if len(chunk) >= limit:
+                                self.stats["count"] += len(chunk)
+                                if not first_done:
+                                    first_done = True
+                                    self.stats["first_chunk_s"] = time.perf_counter() - t0
+                                yield chunk
+                                chunk, limit = [], self.chunk_size
+                            sep = self._peek()
+                            self._pos += 1
+                            if sep == "]":
+                                break
+                            if sep != ",":
+                                raise ValueError(f"',' ou ']' attendu dans medias : {self.json_path}")
+                    if chunk:
+                        self.stats["count"] += len(chunk)
+                        if not first_done:
+                            first_done = True
+                            self.stats["first_chunk_s"] = time.perf_counter() - t0
+                        yield chunk
+                else:
+                    self.header[key] = self._decode_value()
+
+                sep = self._peek()
+                self._pos += 1
+                if sep == "}":
+                    break
+                if sep != ",":
+                    raise ValueError(f"',' ou '}}' attendu : {self.json_path}")
+        self._f = None
+        self.stats["total_s"] = time.perf_counter() - t0
@@ -4,16 +4,24 @@ from __future__ import annotations
 import os
 import json
 import shutil
+import threading
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 from core.log import log_info, log_error, log_warning, log_debug
-from utils.api_utils import fetch_medias_from_api
-from utils.file_utils import sha256_file
-from utils.media_utils import enrich_media_status
+from core.api_client import fetch_medias_pipelined
+from core.hash_cache import sha256_file_cached
+from utils.media_utils import enrich_media_status, media_row_keys
 from utils.profile_utils import extract_profile_info
 from media_utils import clean_profile_folder
+from core.sqlite_store import SqliteProfileStore, DEFAULT_DB_NAME
+from core.profile_journal import ProfileJournal, replay_journal, journal_path_for
+from core.profile_index import ProfileIndex, ProfileSummary, INDEX_FILENAME, file_stamp
+from core.profile_cache import ProfileCache, DEFAULT_MAX_BYTES
+from core.media_record import to_records, json_default
+from core.size_probe import get_size_probe
+from core.sync_cursor import SyncCursor, cursor_path_for, load_or_rebuild, media_cdn_hash
 
 
 @dataclass(frozen=True)
@@ -45,6 +53,10 @@ class ProfileManager:
         data_dir: str,
         default_download_dir: str,
         profile_dirs: Dict[str, str] | None = None,
+        storage_backend: str = "json",
+        db_path: str | None = None,
+        cache_max_bytes: int = DEFAULT_MAX_BYTES,
+        compact_medias: bool = False,
     ):
         self.data_dir = data_dir
         self.default_download_dir = default_download_dir
@@ -53,6 +65,19 @@ class ProfileManager:
         os.makedirs(self.data_dir, exist_ok=True)
         os.makedirs(self.default_download_dir, exist_ok=True)
 
+        # Backend "sqlite" : les JSON restent la source d'import/export, la base fait foi ensuite
+        self.store: SqliteProfileStore | None = None
+        if storage_backend == "sqlite":
+            self.store = SqliteProfileStore(db_path or os.path.join(self.data_dir, DEFAULT_DB_NAME))
+        # Backend "journal" : snapshot JSON + data/<service>/<user>.journal en append-only
+        self.journal_enabled = storage_backend == "journal"
+        # Résumés par profil (data/index.json) pour la fenêtre principale
+        self.index = ProfileIndex(os.path.join(self.data_dir, INDEX_FILENAME))
+        # JSON déjà parsés, revalidés par (mtime_ns, taille) → seuls les fichiers modifiés sont relus
+        self.cache = ProfileCache(cache_max_bytes)
+        # médias en MediaRecord (slots + valeurs internées) plutôt qu'en dicts
+        self.compact_medias = compact_medias
+
     # ---------- Helpers chemins ----------
     def _profile_json_path(self, key: ProfileKey) -> str:
         return os.path.join(self.data_dir, key.service, f"{key.username}.json")
@@ -66,19 +91,42 @@ class ProfileManager:
         # chemin complet final pour les fichiers (avec /service/username)
         return os.path.join(self._profile_base_dir(key), key.service, key.username)
 
-    # ---------- IO JSON ----------
-    def load_profile(self, key: ProfileKey) -> ProfileRow | None:
+    # ---------- IO JSON / SQLite ----------
+    def _load_payload(self, key: ProfileKey) -> dict | None:
         json_path = self._profile_json_path(key)
-        if not os.path.exists(json_path):
+        if self.store is not None:
+            data = self.store.load_profile(key.service, key.username)
+            if data is None and os.path.exists(json_path) and self.store.import_json(key.service, key.username, json_path):
+                data = self.store.load_profile(key.service, key.username)
+            return data
+
+        stamp = file_stamp(json_path, journal_path_for(json_path))
+        if stamp is None:
             return None
-        try:
-            with open(json_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except Exception as e:
-            log_warning(f"[PM] JSON corrompu: {json_path} ({e})")
+        cached = self.cache.get(json_path, stamp)
+        if cached is None:
+            try:
+                with open(json_path, "r", encoding="utf-8") as f:
+                    cached = json.load(f)
+            except Exception as e:
+                log_warning(f"[PM] JSON corrompu: {json_path} ({e})")
+                return None
+            # transitions journalisées depuis le dernier snapshot
+            replay_journal(json_path, cached)
+            self.cache.put(json_path, stamp, cached, weight=stamp[1] + stamp[2])
+        # copie : les appelants modifient librement les médias sans polluer le cache
+        data = dict(cached)
+        data["medias"] = [dict(m) for m in cached.get("medias") or []]
+        return data
+
+    def load_profile(self, key: ProfileKey) -> ProfileRow | None:
+        data = self._load_payload(key)
+        if data is None:
             return None
 
         medias = data.get("medias", [])
+        if self.compact_medias:
+            medias = to_records(medias)
         last_update = data.get("last_update", "1970-01-01T00:00:00+00:00")
         row = ProfileRow(
             key=key,
@@ -90,20 +138,109 @@ class ProfileManager:
         return row
 
     def save_profile(self, row: ProfileRow) -> None:
-        json_path = self._profile_json_path(row.key)
-        os.makedirs(os.path.dirname(json_path), exist_ok=True)
         payload = {
             "medias": row.medias,
             "last_update": row.last_update,
             "profile_name": row.key.username,
             "custom_dir": os.path.join(self._profile_base_dir(row.key), row.key.service, row.key.username),
         }
-        with open(json_path, "w", encoding="utf-8") as f:
-            json.dump(payload, f, indent=2)
+        if self.store is not None:
+            self.store.save_profile(row.key.service, row.key.username, payload)
+        else:
+            json_path = self._profile_json_path(row.key)
+            os.makedirs(os.path.dirname(json_path), exist_ok=True)
+            # le snapshot complet intègre le journal → il est compacté une fois écrit
+            with ProfileJournal.for_json(json_path).snapshot():
+                with open(json_path, "w", encoding="utf-8") as f:
+                    json.dump(payload, f, indent=2, default=json_default)
+            self.cache.invalidate(json_path)
+        self.update_index(row.key, row.medias, row.last_update)
+
+    def update_media(self, key: ProfileKey, media: dict, store_key: Optional[str] = None) -> bool:
+        """
+        Persiste un seul média (UPSERT en base, ou ligne de journal) si le backend le permet.
+        Retourne False en backend JSON : l'appelant doit alors sauvegarder le profil complet.
+        `store_key` : clé de ligne en base (SqliteProfileStore.media_keys / load_media_keys) ou,
+        en backend journal, dans le snapshot JSON (media_row_keys) ; sans elle, pas de ligne de journal.
+        """
+        if self.store is not None:
+            self.store.upsert_media(key.service, key.username, media, key=store_key)
+            return True
+        if self.journal_enabled and store_key is not None:
+            ProfileJournal.for_json(self._profile_json_path(key)).append(media, store_key)
+            return True
+        return False
+
+    def export_profile_json(self, key: ProfileKey) -> bool:
+        """Réécrit data/<service>/<user>.json depuis la base (backend sqlite)."""
+        if self.store is None:
+            return False
+        return self.store.export_json(key.service, key.username, self._profile_json_path(key))
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Compteurs du cache de profils parsés (hits/misses/evictions/entries/bytes)."""
+        return self.cache.stats()
+
+    # ---------- Index (data/index.json) ----------
+    def _profile_stamp(self, key: ProfileKey) -> List[int] | None:
+        if self.store is not None:
+            return None  # la base fait foi : pas de JSON à surveiller
+        json_path = self._profile_json_path(key)
+        return file_stamp(json_path, journal_path_for(json_path))
+
+    def summarize(self, key: ProfileKey, medias: List[dict], last_update: str) -> ProfileSummary:
+        return ProfileSummary.from_medias(
+            key.service, key.username, medias, last_update,
+            self.profile_download_path(key), stamp=self._profile_stamp(key),
+        )
+
+    def update_index(self, key: ProfileKey, medias: List[dict], last_update: str) -> None:
+        """À appeler après chaque sauvegarde du profil (coût O(n) mémoire, pas de re-parse)."""
+        try:
+            self.index.put(self.summarize(key, medias, last_update))
+        except Exception as e:
+            log_warning(f"[PM] Index non mis à jour pour {key.as_str()} : {e}")
+
+    def profile_summaries(self) -> List[ProfileSummary]:
+        """
+        Résumés de tous les profils depuis l'index ; seuls les profils absents
+        ou modifiés hors application (stamp différent) sont re-parsés.
+        """
+        entries = self.index.all()
+        out: List[ProfileSummary] = []
+        refreshed: List[ProfileSummary] = []
+        keys = self.list_profile_keys()
+        for key in keys:
+            s = entries.get(key.as_str())
+            if s is None or s.stamp != self._profile_stamp(key):
+                row = self.load_profile(key)
+                if row is None:
+                    continue
+                s = self.summarize(key, row.medias, row.last_update)
+                refreshed.append(s)
+            # le dossier custom a pu changer depuis le calcul
+            s.download_path = self.profile_download_path(key)
+            out.append(s)
+        stale = set(entries) - {k.as_str() for k in keys}
+        if refreshed or stale:
+            log_info(f"[PM] Index : {len(refreshed)} profil(s) recalculé(s), {len(stale)} retiré(s)")
+            self.index.put_many(refreshed, drop=stale)
+        return out
+
+    def rebuild_index(self) -> int:
+        """Recalcule entièrement data/index.json (si l'index a dérivé)."""
+        summaries = []
+        for row in self.list_profiles():
+            summaries.append(self.summarize(row.key, row.medias, row.last_update))
+        self.index.replace_all(summaries)
+        log_info(f"[PM] Index reconstruit : {len(summaries)} profil(s)")
+        return len(summaries)
 
     # ---------- Découverte ----------
-    def list_profiles(self) -> Iterable[ProfileRow]:
-        # parcours data_dir/<service>/*.json
+    def list_profile_keys(self) -> List[ProfileKey]:
+        # parcours data_dir/<service>/*.json (+ profils présents uniquement en base)
+        keys: List[ProfileKey] = []
+        seen = set()
         for service in os.listdir(self.data_dir):
             sdir = os.path.join(self.data_dir, service)
             if not os.path.isdir(sdir):
@@ -111,10 +248,21 @@ class ProfileManager:
             for filename in os.listdir(sdir):
                 if not filename.endswith(".json"):
                     continue
-                username = filename[:-5]
-                row = self.load_profile(ProfileKey(service, username))
-                if row:
-                    yield row
+                key = ProfileKey(service, filename[:-5])
+                seen.add(key)
+                keys.append(key)
+        if self.store is not None:
+            for service, username in self.store.list_profiles():
+                key = ProfileKey(service, username)
+                if key not in seen:
+                    keys.append(key)
+        return keys
+
+    def list_profiles(self) -> Iterable[ProfileRow]:
+        for key in self.list_profile_keys():
+            row = self.load_profile(key)
+            if row:
+                yield row
 
     # ---------- Tailles ----------
     @staticmethod
@@ -160,90 +308,128 @@ class ProfileManager:
         self.profile_dirs[key.as_str()] = os.path.abspath(new_base_dir)
 
     # ---------- Refresh via API ----------
-    def refresh_profile(self, key: ProfileKey) -> Tuple[int, int, int]:
+    def refresh_profile(self, key: ProfileKey, full: bool = False) -> Tuple[int, int, int]:
         """
         Récupère les nouveaux médias depuis l'API et met à jour le JSON.
-        Retourne (nb_new, nb_total, nb_total_after_enrich)
+
+        Incrémental : même endpoint que l'ajout, arrêt à la première page dont
+        tous les médias sont connus du curseur (hash CDN), fusion en O(nouveaux).
+        full=True : repasse sur toutes les pages (curseur suspect) et reconstruit le curseur.
+        Retourne (nb_new, nb_total_avant, nb_total_après)
         """
         row = self.load_profile(key) or ProfileRow(
             key=key, medias=[], last_update="1970-01-01T00:00:00+00:00",
             custom_base_dir=self._profile_base_dir(key),
             download_path=self.profile_download_path(key),
         )
+        total_before = len(row.medias)
+        cursor_path = self._sync_cursor_path(key)
+        cursor = SyncCursor.from_medias(row.medias) if full else load_or_rebuild(cursor_path, row.medias)
+        known = cursor.hashes
+        # parcours précédent interrompu : des pages anciennes peuvent manquer derrière le préfixe connu
+        walk_all = full or cursor.incomplete
 
-        try:
-            last_dt = datetime.fromisoformat(row.last_update)
-            if last_dt.tzinfo is None:
-                last_dt = last_dt.replace(tzinfo=timezone.utc)
-        except Exception:
-            last_dt = datetime(1970, 1, 1, tzinfo=timezone.utc)
-
-        seen = {m.get("name") for m in row.medias}
         new_medias: List[dict] = []
-        offset = 0
-
-        while True:
-            try:
-                for post in self._fetch_posts_paginated(key.service, key.username, offset):
-                    pub = post.get("published")
-                    if not pub:
-                        continue
-                    try:
-                        pdt = datetime.fromisoformat(pub)
-                        if pdt.tzinfo is None:
-                            pdt = pdt.replace(tzinfo=timezone.utc)
-                    except Exception:
-                        continue
-
-                    if pdt < last_dt:
-                        # on s'arrête quand on a dépassé la last_update
-                        raise StopIteration
-
-                    files = [post.get("file")] if post.get("file") else []
-                    files += post.get("attachments") or []
-                    for f in files:
-                        if not f:
-                            continue
-                        name = f.get("name")
-                        path = f.get("path")
-                        if not name or not path or name in seen:
-                            continue
-                        seen.add(name)
-                        media = {
-                            "name": name,
-                            "cdn_path": path,
-                            "status": "Missing",
-                            "type": "video" if name.lower().endswith(
-                                (".mp4", ".webm", ".mkv", ".mov", ".m4v", ".avi", ".flv")
-                            ) else "image",
-                            "local_size": 0,
-                            "size_http": 0,
-                            "percent": 0,
-                            "hash_check": "",
-                            "error": "",
-                        }
-                        new_medias.append(media)
-                offset += 50
-            except StopIteration:
-                break
-            except Exception as e:
-                log_error(f"[PM] API error on refresh: {e}")
-                break
+        pages = 0
+        failed = False
+        try:
+            for page in fetch_medias_pipelined(key.service, key.username):
+                pages += 1
+                fresh = [m for m in page if media_cdn_hash(m) not in known]
+                if page and not fresh and not walk_all:
+                    # page entièrement connue : tout ce qui suit l'est aussi
+                    break
+                for m in fresh:
+                    h = media_cdn_hash(m)
+                    if h:
+                        known.add(h)
+                new_medias.extend(fresh)
+        except Exception as e:
+            failed = True
+            log_error(f"[PM] API error on refresh: {e}")
 
+        mode = "complet" if full else ("reprise d'un parcours interrompu" if walk_all else "incrémental")
         if new_medias:
-            log_info(f"[PM] +{len(new_medias)} nouveaux médias pour {key.as_str()}")
+            log_info(f"[PM] +{len(new_medias)} nouveaux médias pour {key.as_str()} ({mode}, {pages} page(s))")
         else:
-            log_info(f"[PM] Aucun nouveau média pour {key.as_str()}")
+            log_info(f"[PM] Aucun nouveau média pour {key.as_str()} ({mode}, {pages} page(s))")
 
-        # enrichit avec le status local
-        all_medias = row.medias + new_medias
-        download_path = self.profile_download_path(key)
-        all_medias = enrich_media_status(all_medias, download_path)
+        # enrichit seulement les nouveaux avec le status local ; l'API renvoie les plus récents d'abord
+        if new_medias:
+            enrich_media_status(new_medias, self.profile_download_path(key))
+            if self.compact_medias:
+                new_medias = to_records(new_medias)
+            row.medias = new_medias + row.medias
 
-        row.medias = all_medias
         row.last_update = datetime.now(timezone.utc).isoformat()
         self.save_profile(row)
-        return len(new_medias), len(row.medias), len(all_medias)
+
+        # nouveaux médias gardés, mais un parcours interrompu ne vaut pas synchro : le curseur le note
+        # pour que le refresh suivant ne s'arrête pas au préfixe qu'on vient d'ajouter
+        if failed:
+            log_warning(f"[SYNC] Parcours interrompu pour {key.as_str()} → prochain refresh sur toutes les pages")
+        else:
+            cursor.synced_at = row.last_update
+        cursor.incomplete = failed
+        self._save_sync_cursor(cursor_path, cursor)
+        return len(new_medias), total_before, len(row.medias)
+
+    # ---------- Curseur de synchro ----------
+    def _sync_cursor_path(self, key: ProfileKey) -> str:
+        return cursor_path_for(self._profile_json_path(key))
+
+    @staticmethod
+    def _save_sync_cursor(path: str, cursor: SyncCursor) -> None:
+        try:
+            cursor.save(path)
+        except OSError as e:
+            log_warning(f"[SYNC] Écriture du curseur impossible : {path} ({e})")
+
+    # ---------- Tailles distantes ----------
+    def fill_remote_sizes(self, key: ProfileKey, should_stop: Optional[Callable[[], bool]] = None) -> int:
+        """
+        Étape de fond après listing : renseigne size_http des médias qui n'en ont pas.
+        Persistance par média (journal / base) si possible, sinon un seul save_profile à la fin.
+        """
+        row = self.load_profile(key)
+        if row is None:
+            return 0
+        changed: List[dict] = []
+        lock = threading.Lock()
+
+        def on_result(media, _size):
+            with lock:
+                changed.append(media)
+
+        found = get_size_probe().fill_sizes(row.medias, on_result=on_result, should_stop=should_stop)
+        if not found:
+            return 0
+        if self.store is not None:
+            # clés réellement stockées (suffixes #n des doublons compris), alignées sur l'ordre chargé
+            stored = self.store.load_media_keys(key.service, key.username)
+            if len(stored) == len(row.medias):
+                by_id = dict(zip(map(id, row.medias), stored))
+                self.store.upsert_medias(key.service, key.username, changed, [by_id[id(m)] for m in changed])
+                self.cache.invalidate(self._profile_json_path(key))
+            else:
+                self.save_profile(row)
+        elif self.journal_enabled and not ProfileJournal.for_json(self._profile_json_path(key)).exists():
+            # sans journal en attente, la liste chargée est le snapshot : ses clés de ligne sont les bonnes
+            by_id = dict(zip(map(id, row.medias), media_row_keys(row.medias)))
+            for media in changed:
+                self.update_media(key, media, by_id[id(media)])
+            self.cache.invalidate(self._profile_json_path(key))
+        else:
+            # JSON seul, ou journal rejoué au chargement (clés du snapshot perdues) : snapshot complet
+            self.save_profile(row)
+        log_info(f"[PM] {found} taille(s) distante(s) renseignée(s) pour {key.as_str()}")
+        return found
+
+    def reset_sync_cursor(self, key: ProfileKey, medias: List[dict]) -> None:
+        """Curseur recalculé depuis une liste complète (fin d'ajout / import)."""
+        cursor = SyncCursor.from_medias(medias)
+        cursor.synced_at = datetime.now(timezone.utc).isoformat()
+        self._save_sync_cursor(self._sync_cursor_path(key), cursor)
 
     def delete_profile(self, key: ProfileKey):
         json_path = os.path.join(self.data_dir, key.service, f"{key.username}.json")
@@ -252,6 +438,12 @@ class ProfileManager:
         try:
             if os.path.exists(json_path):
                 os.remove(json_path)
+            ProfileJournal.for_json(json_path).discard()
+            SyncCursor.discard(cursor_path_for(json_path))
+            self.cache.invalidate(json_path)
+            self.index.remove(key.as_str())
+            if self.store is not None:
+                self.store.delete_profile(key.service, key.username)
             if os.path.exists(dl_path):
                 shutil.rmtree(dl_path)
             # oublie le custom dir enregistré
@@ -261,23 +453,6 @@ class ProfileManager:
         except Exception as e:
             raise RuntimeError(f"Suppression échouée: {e}") from e
 
-    @staticmethod
-    def _fetch_posts_paginated(service: str, username: str, offset: int) -> List[dict]:
-        """
-        Utilise utils.api_utils.fetch_medias_from_api si tu veux,
-        mais ici on renvoie des 'posts' uniformes pour la boucle ci‑dessus.
-        """
-        # On s’aligne sur ton util courant: fetch_medias_from_api renvoie des pages de médias,
-        # mais pour le refresh on a besoin des posts. Si ton util expose aussi un fetch_posts,
-        # remplace cette fonction par l’appel direct.
-        # Par défaut, on fallback en utilisant l’API simple (déplacée ici si besoin).
-        import requests
-        url = f"https://coomer.st/api/v1/{service}/user/{username}?o={offset}"
-        resp = requests.get(url, timeout=30)
-        resp.raise_for_status()
-        data = resp.json()
-        return data.get("posts") if isinstance(data, dict) else data
-
     # ---------- Import d’un dossier déjà téléchargé ----------
     def import_existing(self, selected_dir: str, url: str) -> ProfileKey:
         if not selected_dir:
@@ -288,7 +463,7 @@ class ProfileManager:
 
         # 1) Fetch API AVANT clean (tous médias)
         all_medias: List[dict] = []
-        for page in fetch_medias_from_api(key.service, key.username):
+        for page in fetch_medias_pipelined(key.service, key.username):
             all_medias.extend(page)
 
         # 2) Clean du dossier (service/username + v|p|o)
@@ -307,7 +482,7 @@ class ProfileManager:
                     local_files.append(p)
 
         for fpath in local_files:
-            sha = sha256_file(fpath)
+            sha = sha256_file_cached(fpath)
             matched = False
             for media in all_medias:
                 if sha and sha in media.get("url", ""):
@@ -345,6 +520,7 @@ class ProfileManager:
             download_path=self.profile_download_path(key),
         )
         self.save_profile(row)
+        self.reset_sync_cursor(key, all_medias)
 
         # 5) Enregistre le base_dir choisi pour ce profil
         self.profile_dirs[key.as_str()] = os.path.abspath(selected_dir)
@@ -0,0 +1,107 @@
+# core/profile_saver.py
+"""
+Sauvegarde différée et coalescente d'un profil.
+
+Les appelants se contentent de `mark_dirty()` ; un thread de fond appelle
+`flush_fn()` au plus une fois toutes les `interval` secondes, ou immédiatement
+dès que `max_unsaved` changements sont en attente. `flush()` / `stop(flush=True)`
+forcent une écriture synchrone (fermeture de fenêtre).
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Callable
+
+from core.log import log_info, log_warning
+
+# surchargeables via settings.json (save_interval_seconds / save_max_unsaved)
+DEFAULT_INTERVAL = float(os.getenv("CU_SAVE_INTERVAL", "5"))
+DEFAULT_MAX_UNSAVED = int(os.getenv("CU_SAVE_MAX_UNSAVED", "50"))
+
+
+class DebouncedSaver:
+    def __init__(
+        self,
+        flush_fn: Callable[[], None],
+        interval: float = DEFAULT_INTERVAL,
+        max_unsaved: int = DEFAULT_MAX_UNSAVED,
+        name: str = "saver",
+    ):
+        self.flush_fn = flush_fn
+        self.interval = max(0.1, float(interval))
+        self.max_unsaved = max(1, int(max_unsaved))
+        self.name = name
+
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()  # une seule écriture à la fois
+        self._pending = 0
+        self._last_flush = 0.0
+        self._stopped = False
+        self.flush_count = 0
+
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"saver:{name}")
+        self._thread.start()
+
+    # --- API publique -----------------------------------------------------
+    @property
+    def dirty(self) -> bool:
+        return self._pending > 0
+
+    def mark_dirty(self, count: int = 1) -> None:
+        with self._cond:
+            if self._stopped:
+                return
+            self._pending += max(1, count)
+            self._cond.notify()
+
+    def flush(self) -> bool:
+        """Écrit maintenant si des changements sont en attente. Retourne True si écrit."""
+        return self._do_flush()
+
+    def stop(self, flush: bool = True) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread.is_alive() and threading.current_thread() is not self._thread:
+            self._thread.join(timeout=5.0)
+        if flush:
+            self._do_flush()
+
+    # --- Interne ----------------------------------------------------------
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                if self._pending < self.max_unsaved:
+                    remaining = (self._last_flush + self.interval) - time.monotonic()
+                    if remaining > 0:
+                        # réveillé plus tôt si le seuil max_unsaved est atteint
+                        self._cond.wait(remaining)
+                        continue
+            self._do_flush()
+
+    def _do_flush(self) -> bool:
+        with self._flush_lock:
+            with self._cond:
+                pending = self._pending
+                self._pending = 0
+            if not pending:
+                return False
+            try:
+                self.flush_fn()
+            except Exception as e:
+                log_warning(f"[SAVER] {self.name} flush échoué ({pending} changement(s) gardés) : {e}")
+                with self._cond:
+                    self._pending += pending
+                return False
+            finally:
+                self._last_flush = time.monotonic()
+            self.flush_count += 1
+            if pending > 1:
+                log_info(f"[SAVER] {self.name} : {pending} changement(s) coalescé(s) en 1 écriture")
+            return True
@@ -0,0 +1,219 @@
+# core/rate_limiter.py
+"""
+Limiteur de débit partagé par tout le trafic API coomer (un seau à jetons par hôte).
+
+- CU_API_RATE requêtes/s par hôte (défaut 3), CU_API_BURST d'avance (défaut 2)
+- utilisable depuis des threads (`acquire`) comme depuis asyncio (`acquire_async`) :
+  le jeton est réservé sous verrou, l'attente se fait hors verrou
+- un 429 (ou un 503 avec Retry-After) vu par un appelant met l'hôte en pause
+  pour tout le monde (`penalize`), plafonné à CU_API_MAX_PAUSE secondes
+- stats d'attente (`stats()`), publiées sur l'event_bus ("api:ratelimit")
+  au plus toutes les CU_API_RATE_STATS_S secondes
+
+    limiter = get_rate_limiter()
+    limiter.acquire(url)                       # avant chaque requête
+    limiter.penalize(url, r.status_code, r.headers.get("Retry-After"))
+"""
+from __future__ import annotations
+
+import os
+import time
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from core.log import log_info, log_warning
+
+API_RATE = float(os.getenv("CU_API_RATE", "3"))              # requêtes / s / hôte
+API_BURST = int(os.getenv("CU_API_BURST", "2"))
+MAX_PAUSE_S = float(os.getenv("CU_API_MAX_PAUSE", "60"))
+DEFAULT_PAUSE_S = 2.0                                        # 429 sans Retry-After
+STATS_INTERVAL_S = float(os.getenv("CU_API_RATE_STATS_S", "10"))
+STATS_EVENT = "api:ratelimit"
+
+
+def parse_retry_after(value, default: Optional[float] = None) -> Optional[float]:
+    """Retry-After en secondes (entier ou date HTTP). default si absent/illisible."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return default
+
+
+def _host(url_or_host: str) -> str:
+    # netloc (hôte:port) comme core.http_pool : des nœuds sur le même hôte, ports différents, restent distincts
+    if "/" in url_or_host:
+        return urlparse(url_or_host).netloc
+    return url_or_host
+
+
+@dataclass
+class _Bucket:
+    rate: float
+    capacity: int
+    tokens: float = 0.0
+    updated: float = field(default_factory=time.monotonic)
+    paused_until: float = 0.0
+    # stats
+    requests: int = 0
+    waited: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+    throttled: int = 0
+
+    def __post_init__(self):
+        self.tokens = float(self.capacity)
+
+    def reserve(self, now: float) -> float:
+        """Prend un jeton (éventuellement à crédit) ; retourne l'attente avant de l'utiliser."""
+        start = max(now, self.paused_until)
+        self.tokens = min(self.capacity, self.tokens + max(0.0, start - self.updated) * self.rate)
+        self.updated = start
+        self.tokens -= 1
+        delay = start - now
+        if self.tokens < 0:
+            delay += -self.tokens / self.rate
+        return delay
+
+
+class RateLimiter:
+    def __init__(self, rate: float = API_RATE, burst: int = API_BURST, max_pause: float = MAX_PAUSE_S):
+        self.rate = max(0.01, float(rate))
+        self.burst = max(1, int(burst))
+        self.max_pause = max_pause
+        self._buckets: Dict[str, _Bucket] = {}
+        self._lock = threading.Lock()
+        self._last_publish = 0.0
+
+    def _bucket(self, host: str) -> _Bucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = _Bucket(self.rate, self.burst)
+        return bucket
+
+    def _reserve(self, host: str, count: bool = True) -> float:
+        with self._lock:
+            bucket = self._bucket(host)
+            if count:
+                bucket.requests += 1
+            return bucket.reserve(time.monotonic())
+
+    def _paused(self, host: str) -> bool:
+        with self._lock:
+            return self._bucket(host).paused_until > time.monotonic()
+
+    def _record(self, host: str, waited: float) -> None:
+        with self._lock:
+            bucket = self._bucket(host)
+            if waited > 0:
+                bucket.waited += 1
+                bucket.wait_total += waited
+                bucket.wait_max = max(bucket.wait_max, waited)
+        self._maybe_publish()
+
+    # ---------- Acquisition ----------
+    def acquire(self, url_or_host: str) -> float:
+        """Bloque jusqu'au prochain créneau de l'hôte. Retourne le temps attendu."""
+        host = _host(url_or_host)
+        waited = 0.0
+        delay = self._reserve(host)
+        # une pause (429) posée pendant l'attente : nouveau créneau après la pause, au débit nominal
+        while delay > 0:
+            time.sleep(delay)
+            waited += delay
+            delay = self._reserve(host, count=False) if self._paused(host) else 0.0
+        self._record(host, waited)
+        return waited
+
+    async def acquire_async(self, url_or_host: str) -> float:
+        host = _host(url_or_host)
+        waited = 0.0
+        delay = self._reserve(host)
+        while delay > 0:
+            await asyncio.sleep(delay)
+            waited += delay
+            delay = self._reserve(host, count=False) if self._paused(host) else 0.0
+        self._record(host, waited)
+        return waited
+
+    # ---------- Retour serveur ----------
+    def penalize(self, url_or_host: str, status: Optional[int], retry_after=None,
+                 default: float = DEFAULT_PAUSE_S) -> float:
+        """
+        429 (ou 503 avec Retry-After) : pause de l'hôte pour tous les appelants.
+        `default` = pause d'un 429 sans Retry-After (backoff de l'appelant).
+        Retourne la durée de pause appliquée (0 si le statut n'en demande pas).
+        """
+        pause = parse_retry_after(retry_after)
+        if status == 429 and pause is None:
+            pause = default
+        if status not in (429, 503) or pause is None:
+            return 0.0
+        pause = min(pause, self.max_pause)
+        host = _host(url_or_host)
+        with self._lock:
+            bucket = self._bucket(host)
+            bucket.throttled += 1
+            until = time.monotonic() + pause
+            extended = until > bucket.paused_until
+            if extended:
+                bucket.paused_until = until
+                bucket.updated = until
+                bucket.tokens = 0.0  # reprise au débit nominal, sans rafale
+        if extended:
+            log_warning(f"[RATE] {status} sur {host} → pause globale {pause:.1f}s")
+        return pause
+
+    # ---------- Stats ----------
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                host: {
+                    "requests": b.requests,
+                    "waited": b.waited,
+                    "wait_total_s": round(b.wait_total, 3),
+                    "wait_avg_s": round(b.wait_total / b.waited, 3) if b.waited else 0.0,
+                    "wait_max_s": round(b.wait_max, 3),
+                    "throttled": b.throttled,
+                    "paused_s": round(max(0.0, b.paused_until - time.monotonic()), 1),
+                }
+                for host, b in self._buckets.items()
+            }
+
+    def _maybe_publish(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_publish < STATS_INTERVAL_S:
+                return
+            self._last_publish = now
+        stats = self.stats()
+        for host, s in stats.items():
+            log_info(f"[RATE] {host} : {s['requests']} req, {s['waited']} attente(s) "
+                     f"({s['wait_total_s']:.1f}s, max {s['wait_max_s']:.1f}s), {s['throttled']} 429/503")
+        try:
+            from event_bus import event_bus
+            event_bus.emit(STATS_EVENT, stats)
+        except Exception:
+            pass
+
+
+_default: Optional[RateLimiter] = None
+_default_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Limiteur du process (partagé par requests et aiohttp)."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = RateLimiter()
+        return _default
@@ -6,8 +6,9 @@ import os
 from typing import Dict, List, Tuple, Any
 
 from log import log_info, log_warning, log_error
-from utils.file_utils import sha256_file
+from core.hash_cache import sha256_file_cached
 from utils.media_utils import detect_type_from_name
+from core.disk_inventory import DiskInventory
 
 
 class RestoreService:
@@ -24,6 +25,7 @@ class RestoreService:
         dirs: Dict[str, str],
         *,
         skip_sha: bool = True,
+        inventory: DiskInventory | None = None,
     ) -> None:
         """
         Met à jour chaque media en fonction des fichiers présents.
@@ -35,6 +37,7 @@ class RestoreService:
                 "image": <profil_dir>/p,
             }
             skip_sha: si True, ne calcule pas de SHA (plus rapide).
+            inventory: DiskInventory déjà scanné (sinon un seul scandir ici).
         """
         local_dir = dirs.get("local")
         video_dir = dirs.get("video") or os.path.join(local_dir, "v")
@@ -42,6 +45,13 @@ class RestoreService:
 
         log_info(f"[RESTORE] Scan dirs — local={local_dir}  v={video_dir}  p={image_dir}")
 
+        if inventory is None:
+            inventory = DiskInventory(local_dir, (video_dir, image_dir)).scan()
+        with inventory.reconcile():
+            self._reconcile(medias, local_dir, video_dir, image_dir, skip_sha, inventory)
+        inventory.report("[RESTORE]", len(medias))
+
+    def _reconcile(self, medias, local_dir, video_dir, image_dir, skip_sha, inventory) -> None:
         for media in medias:
             name = media.get("name", "")
             if not name:
@@ -65,9 +75,9 @@ class RestoreService:
             media["percent"] = int((media.get("local_size", 0) / (media.get("size_http") or 1)) * 100) if media.get("size_http") else 0
 
             # .tmp présent => Paused (reprise possible)
-            if os.path.exists(tmp_path) and not os.path.exists(final_path):
+            if inventory.exists(tmp_path) and not inventory.exists(final_path):
                 try:
-                    sz = os.path.getsize(tmp_path)
+                    sz = inventory.size(tmp_path)
                 except Exception as e:
                     log_warning(f"[RESTORE] size(tmp) erreur pour {tmp_path}: {e}")
                     sz = 0
@@ -80,9 +90,9 @@ class RestoreService:
                 continue
 
             # Fichier final présent
-            if os.path.exists(final_path):
+            if inventory.exists(final_path):
                 try:
-                    sz = os.path.getsize(final_path)
+                    sz = inventory.size(final_path)
                 except Exception as e:
                     log_warning(f"[RESTORE] size(final) erreur pour {final_path}: {e}")
                     sz = 0
@@ -104,7 +114,7 @@ class RestoreService:
                 else:
                     # Vérif SHA “light” : on compare le hash au tag du nom (si présent)
                     try:
-                        actual = sha256_file(final_path)
+                        actual = sha256_file_cached(final_path, inventory.stat(final_path))
                         # attendu: dernier segment avant l’extension si c’est un hash tronqué
                         # ex: ..._abcdef123456.mp4 -> "abcdef123456"
                         expected = _extract_expected_hash_from_name(name) or _extract_expected_hash_from_url(media.get("url", ""))
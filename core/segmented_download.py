@@ -0,0 +1,454 @@
+# core/segmented_download.py
+"""
+Téléchargement segmenté (plusieurs connexions Range) des gros fichiers.
+
+- au-delà de CU_SEGMENT_MIN_MB (défaut 64 Mio), le fichier est découpé en plages
+  de CU_SEGMENT_MB (défaut 16 Mio) tirées par CU_SEGMENT_CONNECTIONS connexions
+  (défaut 4), réparties sur les nœuds sains (core.node_health)
+- le .tmp est préalloué à la taille finale, chaque plage est écrite à sa place
+- les plages terminées (fsync fait) sont notées dans un sidecar <tmp>.segments :
+  après un crash, seules les plages manquantes sont retéléchargées
+- plage lente : une connexion libre en reprend la seconde moitié (sur un autre
+  nœud) ; la connexion lente s'arrête au nouveau bout
+- CU_SEGMENTED=0 (ou settings.json → segmented_downloads: false) désactive
+
+SHA-256 : les écritures arrivent dans le désordre, le flux réseau ne peut donc
+pas alimenter le hasher comme en mono-flux. À chaque plage terminée, le préfixe
+contigu nouvellement complet est relu (depuis le cache de pages, fraîchement
+écrit) et hashé dans l'ordre ; `digest` est prêt à la fin, sans relecture
+complète. Compromis : chaque octet est lu une fois de plus qu'en mono-flux,
+mais pendant le téléchargement et à chaud, plutôt qu'en bloc après coup.
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+
+from core.log import log_info, log_warning, log_error
+from core.endpoints import mirror_urls
+from core.node_health import get_node_health
+from core.http_pool import get_http_pool
+from utils.file_utils import sha256_update_from_file
+
+SEGMENT_EXT = ".segments"
+SIDECAR_VERSION = 1
+
+_enabled = os.getenv("CU_SEGMENTED", "1") != "0"
+MIN_SIZE = int(float(os.getenv("CU_SEGMENT_MIN_MB", "64")) * 1024 * 1024)
+SEGMENT_SIZE = int(float(os.getenv("CU_SEGMENT_MB", "16")) * 1024 * 1024)
+CONNECTIONS = int(os.getenv("CU_SEGMENT_CONNECTIONS", "4"))
+MIN_SPLIT = 2 * 1024 * 1024          # on ne vole pas moins de 2 Mio
+CHUNK_SIZE = 256 * 1024
+MAX_ATTEMPTS_PER_RANGE = 6
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 30
+VIDEO_EXTS = (".mp4", ".m4v", ".mov", ".webm", ".avi", ".mkv", ".flv")
+
+
+def configure(enabled: Optional[bool] = None) -> None:
+    global _enabled
+    if enabled is not None:
+        _enabled = bool(enabled)
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def wants_segments(url: str) -> bool:
+    """Candidat au mode segmenté (avant même de connaître la taille) : vidéos seulement."""
+    return _enabled and urlparse(url).path.lower().endswith(VIDEO_EXTS)
+
+
+def sidecar_path_for(tmp_path: str) -> str:
+    return tmp_path + SEGMENT_EXT
+
+
+def _merge(ranges: List[List[int]]) -> List[List[int]]:
+    merged: List[List[int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _missing(done: List[List[int]], size: int) -> List[Tuple[int, int]]:
+    holes, pos = [], 0
+    for start, end in _merge(done):
+        if start > pos:
+            holes.append((pos, start))
+        pos = max(pos, end)
+    if pos < size:
+        holes.append((pos, size))
+    return holes
+
+
+@dataclass
+class _Range:
+    start: int
+    end: int          # exclu ; peut être raccourci par un vol
+    pos: int = 0
+    attempts: int = 0
+    started_at: float = 0.0
+    node: str = ""
+
+    def __post_init__(self):
+        self.pos = self.start
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.end - self.pos)
+
+    def speed(self, now: float) -> float:
+        elapsed = now - self.started_at
+        return (self.pos - self.start) / elapsed if elapsed > 0 else 0.0
+
+
+class SegmentedDownload:
+    def __init__(self, url: str, tmp_path: str, size: int, on_progress: Optional[Callable] = None,
+                 should_stop: Optional[Callable[[], bool]] = None, connections: int = CONNECTIONS,
+                 segment_size: int = SEGMENT_SIZE, log_prefix: str = "[DL]"):
+        self.url = url
+        self.tmp_path = tmp_path
+        self.sidecar = sidecar_path_for(tmp_path)
+        self.size = int(size)
+        self.on_progress = on_progress
+        self.should_stop = should_stop
+        self.connections = max(1, int(connections))
+        self.segment_size = max(MIN_SPLIT, int(segment_size))
+        self.log_prefix = log_prefix
+        self.health = get_node_health()
+
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._pending: List[_Range] = []
+        self._active: List[_Range] = []
+        self._done: List[List[int]] = []
+        self._failed: Optional[str] = None
+        self._stopped = False
+        self._last_report = 0.0
+        self._last_bytes = 0
+        self._last_t = time.time()
+        self.stolen = 0
+        self.pool = get_http_pool()
+        # SHA-256 du préfixe contigu terminé, avancé au fil des plages (cf. _advance_hash)
+        self._hasher = hashlib.sha256()
+        self._hashed = 0
+        self._hash_lock = threading.Lock()
+        self.digest: Optional[str] = None
+
+    # ---------- Sidecar ----------
+    def _load_sidecar(self) -> List[List[int]]:
+        try:
+            with open(self.sidecar, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except FileNotFoundError:
+            return self._adopt_plain_tmp()
+        except Exception as e:
+            log_warning(f"{self.log_prefix} Sidecar illisible, on repart de zéro : {e}")
+            return []
+        if raw.get("version") != SIDECAR_VERSION or raw.get("size") != self.size:
+            return []
+        return _merge([[int(s), int(e)] for s, e in raw.get("done") or []])
+
+    def _adopt_plain_tmp(self) -> List[List[int]]:
+        """.tmp d'un téléchargement mono-flux interrompu : son préfixe est acquis."""
+        try:
+            have = os.path.getsize(self.tmp_path)
+        except OSError:
+            return []
+        have = min(have, self.size)
+        return [[0, have]] if have > 0 else []
+
+    def _save_sidecar_locked(self) -> None:
+        payload = {"version": SIDECAR_VERSION, "size": self.size, "done": self._done}
+        tmp = self.sidecar + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        os.replace(tmp, self.sidecar)
+
+    @staticmethod
+    def discard(tmp_path: str) -> None:
+        try:
+            os.remove(sidecar_path_for(tmp_path))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def collapse_to_prefix(tmp_path: str) -> int:
+        """
+        Repli mono-flux : .tmp préalloué (avec des trous) → tronqué à son préfixe
+        contigu déjà téléchargé, sidecar supprimé. Retourne la taille gardée.
+        """
+        sidecar = sidecar_path_for(tmp_path)
+        try:
+            with open(sidecar, "r", encoding="utf-8") as f:
+                done = _merge(json.load(f).get("done") or [])
+        except FileNotFoundError:
+            return os.path.getsize(tmp_path) if os.path.exists(tmp_path) else 0
+        except Exception:
+            done = []
+        keep = done[0][1] if done and done[0][0] == 0 else 0
+        if os.path.exists(tmp_path):
+            with open(tmp_path, "r+b") as f:
+                f.truncate(keep)
+        SegmentedDownload.discard(tmp_path)
+        return keep
+
+    # ---------- Préparation ----------
+    def _prepare(self) -> None:
+        self._done = self._load_sidecar()
+        # sidecar d'abord : un .tmp préalloué n'existe jamais sans lui (sinon il passerait pour complet)
+        with self._lock:
+            self._save_sidecar_locked()
+        mode = "r+b" if os.path.exists(self.tmp_path) else "w+b"
+        with open(self.tmp_path, mode) as f:
+            if os.fstat(f.fileno()).st_size != self.size:
+                f.truncate(self.size)
+                if hasattr(os, "posix_fallocate"):
+                    try:
+                        os.posix_fallocate(f.fileno(), 0, self.size)
+                    except OSError:
+                        pass  # FS sans fallocate : le fichier creux suffit
+        for start, end in _missing(self._done, self.size):
+            for s in range(start, end, self.segment_size):
+                self._pending.append(_Range(s, min(end, s + self.segment_size)))
+
+    def _downloaded_locked(self) -> int:
+        done = sum(e - s for s, e in self._done)
+        return done + sum(r.pos - r.start for r in self._active)
+
+    # ---------- Planification ----------
+    def _next_range(self) -> Optional[_Range]:
+        """Plage à télécharger : en attente, sinon moitié haute de la plage active la plus lente."""
+        with self._cond:
+            while True:
+                if self._failed or self._stopped:
+                    return None
+                if self._pending:
+                    rng = self._pending.pop(0)
+                    self._activate_locked(rng)
+                    return rng
+                if not self._active:
+                    return None
+                victim = self._slowest_locked()
+                if victim is not None:
+                    split = victim.pos + victim.remaining // 2
+                    rng = _Range(split, victim.end)
+                    victim.end = split
+                    self.stolen += 1
+                    log_info(f"{self.log_prefix} 🪓 Plage lente {victim.start}-{split} ({urlparse(victim.node).netloc}) : "
+                             f"{rng.end - rng.start} octets repris par une autre connexion")
+                    self._activate_locked(rng, avoid=victim.node)
+                    return rng
+                self._cond.wait(0.5)
+
+    def _activate_locked(self, rng: _Range, avoid: str = "") -> None:
+        rng.started_at = time.monotonic()
+        rng.node = self._pick_node(rng, avoid)
+        self._active.append(rng)
+
+    def _slowest_locked(self) -> Optional[_Range]:
+        now = time.monotonic()
+        best, best_eta = None, 0.0
+        for r in self._active:
+            if r.remaining < 2 * MIN_SPLIT or now - r.started_at < 1.0:
+                continue
+            speed = r.speed(now)
+            eta = r.remaining / speed if speed > 0 else float("inf")
+            if eta > best_eta:
+                best, best_eta = r, eta
+        # ça ne vaut le coup que si la moitié restante prend plus de quelques secondes
+        return best if best is not None and best_eta > 4.0 else None
+
+    def _pick_node(self, rng: _Range, avoid: str = "") -> str:
+        path = urlparse(self.url).path
+        candidates = self.health.order(mirror_urls(path))
+        if avoid and len(candidates) > 1:
+            candidates = [u for u in candidates if u != avoid] or candidates
+        # répartir les connexions : plages successives sur des nœuds différents
+        idx = (rng.start // self.segment_size + rng.attempts) % len(candidates)
+        return candidates[idx]
+
+    # ---------- Transfert ----------
+    def _fetch(self, rng: _Range, f) -> None:
+        t0 = time.monotonic()
+        headers = {"Range": f"bytes={rng.pos}-{rng.end - 1}"}
+        with self.pool.session(rng.node).get(rng.node, headers=headers, stream=True,
+                              timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as r:
+            if r.status_code != 206:
+                self.health.record_failure(rng.node, r.status_code)
+                raise requests.HTTPError(f"{r.status_code} (206 attendu) sur {rng.node}")
+            self.health.record_success(rng.node, time.monotonic() - t0)
+            f.seek(rng.pos)
+            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                if self.should_stop and self.should_stop():
+                    with self._cond:
+                        self._stopped = True
+                        self._cond.notify_all()
+                    return
+                if not chunk:
+                    continue
+                with self._lock:
+                    end = rng.end  # peut avoir été raccourci par un vol
+                take = chunk[: max(0, end - rng.pos)]
+                if take:
+                    f.write(take)
+                with self._lock:
+                    rng.pos += len(take)
+                self._report()
+                if rng.pos >= end:
+                    break
+        if rng.pos < rng.end:
+            raise IOError(f"flux terminé à {rng.pos}/{rng.end}")
+
+    def _finish_range(self, rng: _Range, f) -> None:
+        f.flush()
+        os.fsync(f.fileno())  # durable avant d'être noté dans le sidecar
+        with self._cond:
+            self._active.remove(rng)
+            self._done = _merge(self._done + [[rng.start, rng.end]])
+            self._save_sidecar_locked()
+            self._cond.notify_all()
+
+    def _advance_hash(self, blocking: bool = False) -> None:
+        """Hashe le préfixe contigu terminé au-delà de ce qui l'est déjà. Un seul thread à la fois :
+        les autres passent leur tour, le thread en cours (ou l'appel final de run) rattrape."""
+        if not self._hash_lock.acquire(blocking=blocking):
+            return
+        try:
+            while True:
+                with self._lock:
+                    target = self._done[0][1] if self._done and self._done[0][0] == 0 else 0
+                if target <= self._hashed:
+                    return
+                want = target - self._hashed
+                if sha256_update_from_file(self._hasher, self.tmp_path, want, offset=self._hashed) != want:
+                    raise IOError(f".tmp plus court que prévu ({self.tmp_path})")
+                self._hashed = target
+        finally:
+            self._hash_lock.release()
+
+    def _retry_range(self, rng: _Range, err: Exception) -> None:
+        if not isinstance(err, requests.HTTPError):  # les statuts HTTP sont déjà comptés dans _fetch
+            self.health.record_failure(rng.node, None)
+        with self._cond:
+            self._active.remove(rng)
+            if rng.pos > rng.start:
+                # la partie reçue est écrite ; on ne redemande que le reste
+                self._done = _merge(self._done + [[rng.start, rng.pos]])
+            rest = _Range(rng.pos, rng.end)
+            rest.attempts = rng.attempts + 1
+            if rest.remaining == 0:
+                self._save_sidecar_locked()
+            elif rest.attempts >= MAX_ATTEMPTS_PER_RANGE:
+                self._failed = f"plage {rest.start}-{rest.end} : {err}"
+            else:
+                self._pending.append(rest)
+            self._cond.notify_all()
+        log_warning(f"{self.log_prefix} ⚠️ Plage {rng.pos}-{rng.end} sur {urlparse(rng.node).netloc} : {err} "
+                    f"→ retry {rng.attempts + 1}/{MAX_ATTEMPTS_PER_RANGE}")
+
+    def _abort_range(self, rng: Optional[_Range], err: Exception) -> None:
+        """Erreur locale (disque plein, EIO...) : pas de retry, tout le téléchargement échoue."""
+        with self._cond:
+            if rng is not None and rng in self._active:
+                self._active.remove(rng)
+            self._failed = self._failed or f"erreur locale : {err}"
+            self._cond.notify_all()  # les autres workers sortent de _next_range
+        log_error(f"{self.log_prefix} 💀 Segmenté interrompu : {err}")
+
+    def _worker(self) -> None:
+        try:
+            f = open(self.tmp_path, "r+b")
+        except OSError as e:
+            self._abort_range(None, e)
+            return
+        with f:
+            while True:
+                rng = self._next_range()
+                if rng is None:
+                    return
+                try:
+                    try:
+                        self._fetch(rng, f)
+                    except Exception as e:
+                        f.flush()
+                        os.fsync(f.fileno())
+                        self._retry_range(rng, e)
+                        continue
+                    if self._stopped:
+                        return
+                    self._finish_range(rng, f)
+                    self._advance_hash()
+                except Exception as e:
+                    # fsync / sidecar / écriture en échec : la plage resterait active à jamais
+                    self._abort_range(rng, e)
+                    return
+
+    def _report(self) -> None:
+        if not self.on_progress:
+            return
+        now = time.time()
+        with self._lock:
+            if now - self._last_report < 0.1:
+                return
+            self._last_report = now
+            downloaded = self._downloaded_locked()
+            dt = now - self._last_t
+            speed = max(0, downloaded - self._last_bytes) / dt if dt > 0.01 else 0.0
+            self._last_bytes, self._last_t = downloaded, now
+        if speed < 1024 * 1024:
+            speed_str = f"{speed / 1024:.1f} KB/s"
+        else:
+            speed_str = f"{speed / (1024 * 1024):.1f} MB/s"
+        try:
+            self.on_progress(downloaded, speed_str, self.size)
+        except Exception:
+            pass  # ne jamais faire planter un worker à cause du callback UI
+
+    # ---------- Entrée ----------
+    def run(self) -> Tuple[bool, Optional[str]]:
+        t0 = time.perf_counter()
+        try:
+            self._prepare()
+        except OSError as e:
+            log_error(f"{self.log_prefix} Préallocation impossible : {e}")
+            return False, str(e)
+        todo = sum(r.end - r.start for r in self._pending)
+        log_info(f"{self.log_prefix} 🧩 Segmenté : {self.size} octets, {len(self._pending)} plage(s) "
+                 f"({todo} octets à faire), {self.connections} connexion(s)")
+        threads = [threading.Thread(target=self._worker, name=f"segment-{i}", daemon=True)
+                   for i in range(self.connections)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if self._stopped:
+            return False, "Stopped"
+        if self._failed:
+            return False, self._failed
+        if _missing(self._done, self.size):
+            return False, "Plages manquantes"
+        try:
+            self._advance_hash(blocking=True)
+            if self._hashed == self.size:
+                self.digest = self._hasher.hexdigest()
+        except OSError as e:
+            log_warning(f"{self.log_prefix} Hash incrémental interrompu ({e}) → vérification par relecture")
+        elapsed = time.perf_counter() - t0
+        log_info(f"{self.log_prefix} 🧩 Terminé en {elapsed:.1f}s ({todo / max(elapsed, 1e-6) / 1048576:.1f} Mio/s, "
+                 f"{self.stolen} plage(s) reprise(s))")
+        if self.on_progress:
+            self.on_progress(self.size, "0 B/s", self.size)
+        return True, None
@@ -0,0 +1,198 @@
+# core/size_probe.py
+"""
+Sondage des tailles distantes (size_http) par lots.
+
+- HEAD concurrents (CU_SIZE_PROBE_CONCURRENCY, défaut 8) sur les sessions
+  keep-alive partagées (core.http_pool), au lieu de 4 HEAD séquentiels sans session
+- arrêt au premier nœud qui répond ; nœuds triés par santé (core.node_health),
+  ceux au disjoncteur ouvert sont sautés
+- repli `Range: bytes=0-0` si le HEAD ne donne pas de Content-Length
+- cache par hash CDN (data/size_cache.sqlite3) : une taille n'est sondée qu'une fois
+
+    probe = get_size_probe()
+    size = probe.probe(url)                               # un média
+    probe.fill_sizes(medias, on_result=cb)                # étape de fond après listing
+"""
+from __future__ import annotations
+
+import os
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from core.log import log_info, log_warning
+from core.node_health import get_node_health
+from core.endpoints import node_urls
+from core.http_pool import get_http_pool
+from utils.media_utils import extract_cdn_hash
+
+PROBE_CONCURRENCY = int(os.getenv("CU_SIZE_PROBE_CONCURRENCY", "8"))
+PROBE_TIMEOUT = float(os.getenv("CU_SIZE_PROBE_TIMEOUT", "5"))
+DEFAULT_DB_PATH = os.getenv("CU_SIZE_CACHE_DB", os.path.join("data", "size_cache.sqlite3"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS remote_sizes (
+    cdn_hash  TEXT PRIMARY KEY,
+    size      INTEGER NOT NULL,
+    probed_at REAL NOT NULL
+);
+"""
+
+
+def _missing_size(media) -> bool:
+    try:
+        return not int(media.get("size_http") or 0)
+    except (TypeError, ValueError):
+        return True
+
+
+class SizeCache:
+    """hash CDN → taille (un contenu adressé par son hash ne change pas de taille)."""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def get(self, cdn_hash: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM remote_sizes WHERE cdn_hash = ?", (cdn_hash,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, cdn_hash: str, size: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO remote_sizes (cdn_hash, size, probed_at) VALUES (?, ?, ?)",
+                (cdn_hash, int(size), time.time())
+            )
+
+
+class SizeProbe:
+    def __init__(self, concurrency: int = PROBE_CONCURRENCY, timeout: float = PROBE_TIMEOUT,
+                 cache: Optional[SizeCache] = None):
+        self.concurrency = max(1, int(concurrency))
+        self.timeout = timeout
+        self.cache = cache
+        self.pool = get_http_pool()
+        self.health = get_node_health()
+        self.stats: Dict[str, int] = {"cache_hits": 0, "probed": 0, "requests": 0, "failed": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def _node_urls(self, url: str) -> List[str]:
+        path = urlparse(url).path
+        return self.health.order(node_urls(path))
+
+    def _probe_node(self, node_url: str) -> Optional[int]:
+        self._count("requests")
+        t0 = time.monotonic()
+        try:
+            r = self.pool.session(node_url).head(node_url, timeout=self.timeout, allow_redirects=True)
+        except requests.RequestException:
+            self.health.record_failure(node_url, None)
+            raise
+        if r.status_code >= 400 and r.status_code != 405:
+            self.health.record_failure(node_url, r.status_code)
+        else:
+            self.health.record_success(node_url, time.monotonic() - t0)
+        if r.status_code == 200 and r.headers.get("Content-Length"):
+            return int(r.headers["Content-Length"])
+        if r.status_code in (200, 405):
+            # pas de Content-Length sur HEAD : on demande un seul octet
+            self._count("requests")
+            with self.pool.session(node_url).get(node_url, headers={"Range": "bytes=0-0"}, timeout=self.timeout, stream=True) as g:
+                total = (g.headers.get("Content-Range") or "").rpartition("/")[2]
+                if g.status_code == 206 and total.isdigit():
+                    return int(total)
+                if g.status_code == 200 and g.headers.get("Content-Length"):
+                    return int(g.headers["Content-Length"])
+        return None
+
+    def probe(self, url: str) -> Optional[int]:
+        """Taille distante d'une URL CDN (cache par hash, puis nœuds jusqu'au premier qui répond)."""
+        cdn_hash = extract_cdn_hash(url)
+        if self.cache is not None and cdn_hash:
+            size = self.cache.get(cdn_hash)
+            if size:
+                self._count("cache_hits")
+                return size
+        self._count("probed")
+        for node_url in self._node_urls(url):
+            try:
+                size = self._probe_node(node_url)
+            except (requests.RequestException, ValueError):
+                continue
+            if size:
+                if self.cache is not None and cdn_hash:
+                    self.cache.put(cdn_hash, size)
+                return size
+        self._count("failed")
+        return None
+
+    def fill_sizes(self, medias: Iterable, on_result: Optional[Callable] = None,
+                   should_stop: Optional[Callable[[], bool]] = None) -> int:
+        """
+        Renseigne size_http des médias qui n'en ont pas (concurrence bornée).
+        on_result(media, size) est appelé depuis un thread du pool. Retourne le nb de tailles trouvées.
+        """
+        todo = [m for m in medias if m.get("url") and _missing_size(m)]
+        if not todo:
+            return 0
+        t0 = time.perf_counter()
+        found = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="size-probe") as pool:
+            futures = {}
+            for m in todo:
+                if should_stop and should_stop():
+                    break
+                futures[pool.submit(self._probe_unless_stopped, m["url"], should_stop)] = m
+            for fut in as_completed(futures):
+                m = futures[fut]
+                try:
+                    size = fut.result()
+                except Exception as e:
+                    log_warning(f"[SIZE] Sondage échoué pour {m.get('name')} : {e}")
+                    continue
+                if not size:
+                    continue
+                m["size_http"] = size
+                found += 1
+                if on_result:
+                    on_result(m, size)
+        log_info(f"[SIZE] {found}/{len(todo)} taille(s) trouvée(s) en {time.perf_counter() - t0:.1f}s "
+                 f"(cache={self.stats['cache_hits']} requêtes={self.stats['requests']} échecs={self.stats['failed']})")
+        return found
+
+    def _probe_unless_stopped(self, url: str, should_stop) -> Optional[int]:
+        if should_stop and should_stop():
+            return None
+        return self.probe(url)
+
+
+_default: Optional[SizeProbe] = None
+_default_lock = threading.Lock()
+
+
+def get_size_probe() -> SizeProbe:
+    global _default
+    with _default_lock:
+        if _default is None:
+            try:
+                cache = SizeCache(DEFAULT_DB_PATH)
+            except (OSError, sqlite3.Error) as e:
+                log_warning(f"[SIZE] Cache des tailles indisponible ({e})")
+                cache = None
+            _default = SizeProbe(cache=cache)
+        return _default
@@ -0,0 +1,303 @@
+# core/sqlite_store.py
+"""
+Stockage SQLite (WAL) optionnel des profils et de leurs médias.
+
+- table `profiles` : une ligne par profil (service, username) + méta (last_update, custom_dir...)
+- table `medias`   : une ligne par média, clé (service, username, media_key)
+  où media_key = hash CDN du fichier (sinon id, sinon nom).
+
+Un changement de statut devient un simple UPSERT d'une ligne au lieu d'une
+réécriture complète du JSON. Import/export JSON pour garder data/<service>/<user>.json utilisables.
+
+Usage CLI :
+    python -m core.sqlite_store import [data_dir] [db_path]
+    python -m core.sqlite_store export [data_dir] [db_path]
+"""
+from __future__ import annotations
+
+import os
+import sys
+import json
+import sqlite3
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+from core.log import log_info, log_warning, log_error
+from utils.media_utils import media_store_key, media_row_keys
+from core.media_record import json_default
+
+DEFAULT_DB_NAME = "profiles.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    service      TEXT NOT NULL,
+    username     TEXT NOT NULL,
+    last_update  TEXT,
+    profile_name TEXT,
+    custom_dir   TEXT,
+    extra        TEXT,
+    PRIMARY KEY (service, username)
+);
+CREATE TABLE IF NOT EXISTS medias (
+    service   TEXT NOT NULL,
+    username  TEXT NOT NULL,
+    media_key TEXT NOT NULL,
+    position  INTEGER NOT NULL,
+    status    TEXT,
+    type      TEXT,
+    data      TEXT NOT NULL,
+    PRIMARY KEY (service, username, media_key)
+);
+CREATE INDEX IF NOT EXISTS idx_medias_position ON medias(service, username, position);
+CREATE INDEX IF NOT EXISTS idx_medias_status ON medias(service, username, status);
+"""
+
+# champs de tête du payload JSON stockés dans des colonnes dédiées
+_HEADER_FIELDS = ("last_update", "profile_name", "custom_dir")
+
+_UPSERT_MEDIA = """
+INSERT INTO medias (service, username, media_key, position, status, type, data)
+VALUES (?, ?, ?,
+        COALESCE((SELECT MAX(position) + 1 FROM medias WHERE service = ? AND username = ?), 0),
+        ?, ?, ?)
+ON CONFLICT(service, username, media_key) DO UPDATE SET
+    status = excluded.status,
+    type   = excluded.type,
+    data   = excluded.data
+"""
+
+
+class SqliteProfileStore:
+    """Accès thread-safe (une connexion partagée + verrou) à la base des profils."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        log_info(f"[DB] Store SQLite ouvert : {db_path}")
+
+    # ---------- Helpers ----------
+    @staticmethod
+    def _dumps(obj) -> str:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=json_default)
+
+    @staticmethod
+    def _unique_keys(medias: Iterable[dict]) -> List[Tuple[str, dict]]:
+        """(clé, média) en garantissant l'unicité (doublons éventuels suffixés #n)."""
+        medias = list(medias)
+        return list(zip(media_row_keys(medias), medias))
+
+    @classmethod
+    def media_keys(cls, medias: Iterable[dict]) -> List[str]:
+        """Clés de ligne qu'écrit save_profile pour cette liste, dans l'ordre."""
+        return [key for key, _ in cls._unique_keys(medias)]
+
+    # ---------- Lecture ----------
+    def has_profile(self, service: str, username: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM profiles WHERE service = ? AND username = ?", (service, username)
+            ).fetchone()
+        return row is not None
+
+    def list_profiles(self) -> List[Tuple[str, str]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT service, username FROM profiles ORDER BY service, username").fetchall()
+        return [(s, u) for s, u in rows]
+
+    def load_media_keys(self, service: str, username: str) -> List[str]:
+        """Clés des lignes médias stockées, dans l'ordre de load_profile."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT media_key FROM medias WHERE service = ? AND username = ? ORDER BY position",
+                (service, username)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def load_profile(self, service: str, username: str) -> Optional[dict]:
+        """Retourne le payload au format JSON historique ({"medias": [...], "last_update": ...})."""
+        with self._lock:
+            head = self._conn.execute(
+                "SELECT last_update, profile_name, custom_dir, extra FROM profiles "
+                "WHERE service = ? AND username = ?", (service, username)
+            ).fetchone()
+            if head is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT data FROM medias WHERE service = ? AND username = ? ORDER BY position",
+                (service, username)
+            ).fetchall()
+
+        last_update, profile_name, custom_dir, extra = head
+        payload = json.loads(extra) if extra else {}
+        payload["medias"] = [json.loads(r[0]) for r in rows]
+        payload["last_update"] = last_update or "1970-01-01T00:00:00+00:00"
+        payload["profile_name"] = profile_name or username
+        if custom_dir:
+            payload["custom_dir"] = custom_dir
+        return payload
+
+    # ---------- Écriture ----------
+    def save_profile(self, service: str, username: str, payload: dict) -> None:
+        """Remplace entièrement un profil (une seule transaction)."""
+        medias = payload.get("medias") or []
+        extra = {k: v for k, v in payload.items() if k != "medias" and k not in _HEADER_FIELDS}
+        rows = [
+            (service, username, key, pos, m.get("status"), m.get("type"), self._dumps(m))
+            for pos, (key, m) in enumerate(self._unique_keys(medias))
+        ]
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN")
+                self._conn.execute(
+                    "INSERT INTO profiles (service, username, last_update, profile_name, custom_dir, extra) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(service, username) DO UPDATE SET "
+                    "last_update = excluded.last_update, profile_name = excluded.profile_name, "
+                    "custom_dir = excluded.custom_dir, extra = excluded.extra",
+                    (service, username, payload.get("last_update"), payload.get("profile_name") or username,
+                     payload.get("custom_dir"), self._dumps(extra) if extra else None),
+                )
+                self._conn.execute("DELETE FROM medias WHERE service = ? AND username = ?", (service, username))
+                self._conn.executemany(
+                    "INSERT INTO medias (service, username, media_key, position, status, type, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def upsert_media(self, service: str, username: str, media: dict, key: Optional[str] = None) -> None:
+        """UPSERT d'un seul média (changement de statut, taille, hash...)."""
+        self.upsert_medias(service, username, [media], None if key is None else [key])
+
+    def upsert_medias(self, service: str, username: str, medias: Iterable[dict],
+                      keys: Optional[Iterable[str]] = None) -> None:
+        """
+        `keys` : clés de ligne déjà attribuées (media_keys / load_media_keys). Sans elles,
+        la clé est recalculée depuis le média : ni suffixe #n de doublon, ni ancien chemin
+        → une nouvelle ligne plutôt qu'une mise à jour dans ces cas-là.
+        """
+        medias = list(medias)
+        keys = list(keys) if keys is not None else [media_store_key(m) for m in medias]
+        params = [
+            (service, username, key, service, username,
+             m.get("status"), m.get("type"), self._dumps(m))
+            for key, m in zip(keys, medias)
+        ]
+        if not params:
+            return
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN")
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO profiles (service, username, profile_name) VALUES (?, ?, ?)",
+                    (service, username, username),
+                )
+                self._conn.executemany(_UPSERT_MEDIA, params)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def set_last_update(self, service: str, username: str, last_update: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE profiles SET last_update = ? WHERE service = ? AND username = ?",
+                (last_update, service, username),
+            )
+
+    def delete_profile(self, service: str, username: str) -> None:
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN")
+                self._conn.execute("DELETE FROM medias WHERE service = ? AND username = ?", (service, username))
+                self._conn.execute("DELETE FROM profiles WHERE service = ? AND username = ?", (service, username))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+
+    # ---------- Import / export JSON ----------
+    def import_json(self, service: str, username: str, json_path: str) -> bool:
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except Exception as e:
+            log_warning(f"[DB] Import JSON impossible : {json_path} ({e})")
+            return False
+        if not isinstance(payload, dict):
+            log_warning(f"[DB] Import JSON ignoré (format inattendu) : {json_path}")
+            return False
+        self.save_profile(service, username, payload)
+        log_info(f"[DB] Importé {service}:{username} ({len(payload.get('medias') or [])} médias)")
+        return True
+
+    def export_json(self, service: str, username: str, json_path: str) -> bool:
+        payload = self.load_profile(service, username)
+        if payload is None:
+            return False
+        os.makedirs(os.path.dirname(json_path) or ".", exist_ok=True)
+        tmp_path = json_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, json_path)
+        log_info(f"[DB] Exporté {service}:{username} → {json_path}")
+        return True
+
+    def import_data_dir(self, data_dir: str) -> int:
+        count = 0
+        for service in sorted(os.listdir(data_dir)):
+            sdir = os.path.join(data_dir, service)
+            if not os.path.isdir(sdir):
+                continue
+            for filename in sorted(os.listdir(sdir)):
+                if filename.endswith(".json") and self.import_json(service, filename[:-5], os.path.join(sdir, filename)):
+                    count += 1
+        return count
+
+    def export_data_dir(self, data_dir: str) -> int:
+        count = 0
+        for service, username in self.list_profiles():
+            if self.export_json(service, username, os.path.join(data_dir, service, f"{username}.json")):
+                count += 1
+        return count
+
+
+def _main(argv: List[str]) -> int:
+    if not argv or argv[0] not in ("import", "export"):
+        print("usage: python -m core.sqlite_store import|export [data_dir] [db_path]")
+        return 2
+    data_dir = argv[1] if len(argv) > 1 else "data"
+    db_path = argv[2] if len(argv) > 2 else os.path.join(data_dir, DEFAULT_DB_NAME)
+    store = SqliteProfileStore(db_path)
+    try:
+        if argv[0] == "import":
+            n = store.import_data_dir(data_dir)
+        else:
+            n = store.export_data_dir(data_dir)
+        print(f"{argv[0]}: {n} profil(s)")
+        return 0
+    except Exception as e:
+        log_error(f"[DB] {argv[0]} a échoué : {e}")
+        return 1
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,106 @@
+# core/sync_cursor.py
+"""
+Curseur de synchronisation d'un profil : data/<service>/<user>.cursor
+
+    {"version": 1, "synced_at": "...", "incomplete": false, "hashes": ["<sha256 CDN>", ...]}
+
+- hashes : hash CDN de chaque média connu → fusion des nouveaux en O(nouveaux)
+  et marqueur d'arrêt du refresh incrémental
+- incomplete : le dernier parcours s'est interrompu (erreur API) ; des pages plus
+  anciennes peuvent manquer derrière le préfixe connu → le refresh suivant
+  parcourt toutes les pages au lieu de s'arrêter au premier connu
+
+Le refresh incrémental s'arrête à la première page dont tous les posts sont
+connus. Le curseur est jugé suspect (→ reconstruit depuis les médias) s'il
+manque ou si un média du profil n'y figure pas ; le refresh complet
+(`full=True`) l'ignore et repasse sur toutes les pages.
+"""
+from __future__ import annotations
+
+import os
+import json
+from dataclasses import dataclass, field
+from typing import Iterable, Optional, Set
+
+from core.log import log_info, log_warning
+from utils.media_utils import extract_cdn_hash
+
+CURSOR_EXT = ".cursor"  # pas de .json : list_profile_keys le prendrait pour un profil
+CURSOR_VERSION = 1
+
+
+def cursor_path_for(json_path: str) -> str:
+    base = json_path[:-5] if json_path.endswith(".json") else json_path
+    return base + CURSOR_EXT
+
+
+def media_cdn_hash(media) -> Optional[str]:
+    return extract_cdn_hash(media.get("path") or media.get("cdn_path") or media.get("url"))
+
+
+@dataclass
+class SyncCursor:
+    synced_at: Optional[str] = None
+    incomplete: bool = False
+    hashes: Set[str] = field(default_factory=set)
+
+    @classmethod
+    def from_medias(cls, medias: Iterable) -> "SyncCursor":
+        """Curseur reconstruit depuis les médias (sans position : le 1er refresh parcourt jusqu'au connu)."""
+        return cls(hashes={h for h in map(media_cdn_hash, medias) if h})
+
+    def covers(self, medias) -> bool:
+        """Chaque média du profil a son hash dans le curseur (sinon curseur suspect). O(n)."""
+        hashes = self.hashes
+        return all(h in hashes for h in map(media_cdn_hash, medias) if h)
+
+    # ---------- Persistance ----------
+    @classmethod
+    def load(cls, path: str) -> Optional["SyncCursor"]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            log_warning(f"[SYNC] Curseur illisible, ignoré : {path} ({e})")
+            return None
+        if raw.get("version") != CURSOR_VERSION:
+            return None
+        return cls(
+            synced_at=raw.get("synced_at"),
+            incomplete=bool(raw.get("incomplete")),
+            hashes=set(raw.get("hashes") or ()),
+        )
+
+    def save(self, path: str) -> None:
+        payload = {
+            "version": CURSOR_VERSION,
+            "synced_at": self.synced_at,
+            "incomplete": self.incomplete,
+            "hashes": sorted(self.hashes),
+        }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def discard(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def load_or_rebuild(path: str, medias) -> SyncCursor:
+    """Curseur du profil, reconstruit depuis les médias s'il manque ou ne les couvre pas."""
+    cursor = SyncCursor.load(path)
+    if cursor is not None and cursor.covers(medias):
+        return cursor
+    rebuilt = SyncCursor.from_medias(medias)
+    if cursor is not None:
+        log_info(f"[SYNC] Curseur incomplet ({len(cursor.hashes)} hash) → reconstruit ({len(rebuilt.hashes)})")
+        rebuilt.incomplete = cursor.incomplete  # un trou signalé le reste tant qu'un parcours complet n'a pas eu lieu
+    return rebuilt
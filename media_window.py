@@ -17,6 +17,7 @@ RETRY_DELAY_SECONDS = 10
 MAX_FAILED_RETRIES = 10
 
 from collections import defaultdict
+from collections.abc import Mapping
 from contextlib import contextmanager
 
 # === Third-party libraries ===
@@ -30,11 +31,19 @@ from log import log_info, log_error, log_warning
 from media_utils import is_valid_image, is_valid_video
 from ui.media_window import MediaWindowUI
 from core.executor import submit_unique
+from core.profile_saver import DebouncedSaver, DEFAULT_INTERVAL, DEFAULT_MAX_UNSAVED
+from core.profile_journal import ProfileJournal, DEFAULT_COMPACT_BYTES
+from core.profile_manager import ProfileKey
+from core.media_index import MediaIndex, MediaQueue
+from core.media_record import to_records
+from core.profile_loader import ProfileStreamLoader
+from core.disk_inventory import DiskInventory
+from core.size_probe import get_size_probe
 from core.limits import GLOBAL_SEM, window_sem
 from utils.format_utils import format_bytes, render_progress_bar
 from utils.network_utils import get_remote_file_size, verify_hash_from_cdn_path, generate_alternative_urls
-from utils.media_utils import detect_type_from_name, is_video
-from utils.file_utils import sha256_file
+from utils.media_utils import detect_type_from_name, is_video, media_row_keys
+from core.hash_cache import sha256_file_cached
 from queue import Queue
 
 
@@ -90,9 +99,11 @@ queue_lock = threading.Lock()
 
 
 class MediaWindow:
-    def __init__(self, root, service, username, local_dir, json_path, medias_data):
+    def __init__(self, root, service, username, local_dir, json_path, medias_data, profile_manager=None,
+                 stream_load=False, opened_at=None):
+        self._boot_t0 = opened_at or time.perf_counter()  # métrique "time to first row" (depuis le double-clic)
         self.window_id = str(uuid.uuid4())  # Identifiant unique pour la fenêtre
-        self.download_queue = []  # File d'attente spécifique à l'instance
+        self.download_queue = MediaQueue(self._media_key)  # File d'attente spécifique à l'instance (clés en file O(1))
         self.running_downloads = 0  # Compteur spécifique à l'instance
         self.queue_processor_running = True  # Contrôle du queue_processor
         self.ctrl = DownloadConcurrencyController(MAX_CONCURRENT_DOWNLOADS, name=f"pool:{self.window_id[:4]}")
@@ -104,6 +115,21 @@ class MediaWindow:
         self.json_path = json_path
         self.medias_data = medias_data
         self.medias = medias_data.get("medias", [])
+        if getattr(profile_manager, "compact_medias", False):
+            # MediaRecord (__slots__, valeurs internées) au lieu de dicts : ~40% de RAM en moins
+            self.medias = medias_data["medias"] = to_records(self.medias)
+        # Index nom / clé / item Treeview → média (remplace les next(...) linéaires)
+        self.media_index = MediaIndex(self.medias)
+        # ProfileManager partagé (backend sqlite → UPSERT par média au lieu de réécrire tout le JSON)
+        self.pm = profile_manager
+        # Journal append-only : rejoué au boot par-dessus le snapshot JSON
+        self._journal = ProfileJournal.for_json(json_path)
+        self._journal_enabled = bool(getattr(profile_manager, "journal_enabled", False))
+        # Chargement progressif : json_path est lu par paquets en tâche de fond (medias_data vide au départ)
+        self._stream_load = bool(stream_load)
+        self._first_chunk_ready = threading.Event()
+        if self._journal.exists() and getattr(profile_manager, "store", None) is None and not self._stream_load:
+            self._journal.replay(self.medias)
 
         # --- Boot pipeline & guards ---
         self._booting = True  # tant que True, on ne touche pas l’UI
@@ -135,9 +161,27 @@ class MediaWindow:
 
         # Verrou JSON + settings globaux
         self.save_lock = Lock()
+        self._store_keys = None  # id(média) → clé de ligne SQLite (backend sqlite, cf. _store_key_for)
+        self._journal_keys = None  # id(média) → clé de ligne du snapshot JSON courant (backend journal)
         self.load_global_settings()
         self.global_settings = getattr(self, "global_settings", {})
 
+        # Sauvegarde différée : au plus 1 écriture / N s, immédiate au-delà de max_unsaved
+        self._saver = DebouncedSaver(
+            self._write_snapshot,
+            interval=self.global_settings.get("save_interval_seconds", DEFAULT_INTERVAL),
+            max_unsaved=self.global_settings.get("save_max_unsaved", DEFAULT_MAX_UNSAVED),
+            name=self.profile_key,
+        )
+        self._journal_compact_bytes = int(self.global_settings.get("journal_compact_bytes", DEFAULT_COMPACT_BYTES))
+        # Résumé data/index.json : suit les écritures par média (UPSERT / journal) sans snapshot complet
+        self._index_saver = DebouncedSaver(
+            self._flush_index,
+            interval=self.global_settings.get("save_interval_seconds", DEFAULT_INTERVAL),
+            max_unsaved=10 ** 9,
+            name=f"{self.profile_key}:index",
+        )
+
         # Dossiers
         self.download_dir = self.global_settings.get("download_dir", "downloads")
         self.profile_download_dirs = self.global_settings.get("profile_dirs", {})
@@ -226,7 +270,8 @@ class MediaWindow:
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         # ===== Pipeline de boot : d'abord RESTORE (sans UI), puis rendu unique =====
-        threading.Thread(target=self._do_restore_phase, daemon=True).start()
+        boot_phase = self._do_streaming_phase if self._stream_load else self._do_restore_phase
+        threading.Thread(target=boot_phase, daemon=True).start()
         self.schedule_after(0, self._wait_and_render_initial)
 
     def _do_restore_phase(self):
@@ -265,18 +310,96 @@ class MediaWindow:
             except Exception:
                 pass
 
+    def _do_streaming_phase(self):
+        """Charge json_path par paquets : chaque paquet est réconcilié avec le disque puis ajouté au modèle."""
+        loader = ProfileStreamLoader(
+            self.json_path,
+            first_chunk=self.global_settings.get("stream_first_rows", 300),
+            chunk_size=self.global_settings.get("stream_chunk_size", 1000),
+        )
+        updates = self._journal.pending_updates() if self._journal.exists() else {}
+        seen_keys = {}  # numérotation des doublons (#n) sur toute la liste, paquet après paquet
+        compact = getattr(self.pm, "compact_medias", False)
+        inventory = DiskInventory(self.local_dir, (self.video_dir, self.image_dir)).scan()
+        try:
+            for chunk in loader.iter_chunks():
+                if self.is_closing or not self.is_active:
+                    return
+                if compact:
+                    chunk = to_records(chunk)
+                if updates:
+                    ProfileJournal.apply_updates(chunk, updates, seen_keys)
+                with inventory.reconcile():
+                    for media in chunk:
+                        self._restore_media_from_disk(media, skip_sha256_verify=True, inventory=inventory)
+                        if (media.get("status") or "").strip() in ("Downloading", "Retrying", "Waiting"):
+                            media["status"] = "Paused"
+                            media["speed"] = ""
+                            media["error"] = ""
+                with self.save_lock:
+                    self.medias.extend(chunk)
+                for media in chunk:
+                    self.media_index.add(media)
+
+                if not self._first_chunk_ready.is_set():
+                    log_info(f"[STREAM] [Window {self.window_id}] 1er paquet ({len(chunk)} médias) "
+                             f"décodé en {loader.stats['first_chunk_s'] * 1000:.0f} ms")
+                    self._first_chunk_ready.set()
+                else:
+                    self.schedule_after(0, lambda c=chunk: self._render_stream_chunk(c))
+
+            header = {k: v for k, v in loader.header.items() if k != "medias"}
+            self.medias_data.update(header)
+            log_info(f"[STREAM] [Window {self.window_id}] {loader.stats['count']} médias chargés "
+                     f"en {loader.stats['total_s']:.2f}s")
+            inventory.report(f"[STREAM] [Window {self.window_id}]", loader.stats["count"])
+        except Exception as e:
+            log_error(f"[STREAM] [Window {self.window_id}] Chargement de {self.json_path} échoué : {e}")
+            self.schedule_after(0, lambda err=e: messagebox.showerror(
+                "Erreur JSON", f"Le fichier {self.json_path} est corrompu ou incomplet.\n\nDétail :\n{err}"))
+        finally:
+            self._first_chunk_ready.set()
+            self._restore_done.set()
+            self.schedule_after(0, self._on_stream_done)
+
+    def _render_stream_chunk(self, chunk):
+        """Ajoute un paquet chargé aux onglets déjà rendus (sans vider les trees)."""
+        if not self._initial_render_done or self.is_closing:
+            return  # le rendu initial inclura ces médias (déjà dans self.medias)
+        for tree_type in ("video", "image"):
+            for status in ("not_downloaded", "completed", "ignored"):
+                if f"{tree_type}_{status}" in self.loaded_treeviews:
+                    self.insert_media_in_treeview(tree_type=tree_type, status=status, medias=chunk, clear=False)
+
+    def _on_stream_done(self):
+        if self.is_closing:
+            return
+        self.restoring = False
+        try:
+            # sauvegarde unique de l'état réconcilié (différée par le saver)
+            self.save_json()
+        except Exception as e:
+            log_warning(f"[STREAM] Sauvegarde post-chargement échouée : {e}")
+        self.update_status_summary()
+        self.update_media_stats()
+        log_info(f"[STREAM] [Window {self.window_id}] Profil complet en "
+                 f"{(time.perf_counter() - self._boot_t0) * 1000:.0f} ms depuis l'ouverture")
+
     def _wait_and_render_initial(self):
         """Attend la fin du RESTORE, puis fait UN SEUL rendu initial; démarre ensuite les services."""
         # 0) Attente restore (non bloquante : on se replanifie)
-        if not getattr(self, "_restore_done", threading.Event()).is_set():
-            self.schedule_after(50, self._wait_and_render_initial)
+        #    en chargement progressif, le 1er paquet (déjà réconcilié avec le disque) suffit
+        ready = self._first_chunk_ready if self._stream_load else getattr(self, "_restore_done", threading.Event())
+        if not ready.is_set():
+            self.schedule_after(20 if self._stream_load else 50, self._wait_and_render_initial)
             return
 
         # 1) Rendu initial (idempotent) sous garde d'events supprimés
         try:
             self._suppress_events = True  # aucun on_tab_changed ne doit s'exécuter ici
             self._initial_render_once()  # ne doit pas clear/reinsérer agressivement
-            self.restoring = False  # autorise les actions utilisateur (Download All, etc.)
+            if not self._stream_load or self._restore_done.is_set():
+                self.restoring = False  # autorise les actions utilisateur (Download All, etc.)
         except Exception as e:
             log_error(f"[BOOT] initial render failed: {e}")
 
@@ -687,6 +810,21 @@ class MediaWindow:
         except Exception as e:
             log_error(f"[SHA256-ALL] Image not_downloaded: {e}")
 
+    def get_all_sizes_thread(self, media_type=None):
+        """GET SIZES : size_http manquantes sondées en lot (HEAD concurrents, cache par hash CDN)."""
+        medias = [m for m in self.medias if media_type is None or m.get("type") == media_type]
+        submit_unique(f"sizes:{self.window_id}:{media_type}", self._get_all_sizes_worker, medias)
+
+    def _get_all_sizes_worker(self, medias):
+        def on_result(media, _size):
+            self._persist_media(media)
+            self.refresh_media_row(media)
+
+        found = get_size_probe().fill_sizes(
+            medias, on_result=on_result, should_stop=lambda: self.is_closing
+        )
+        log_info(f"[SIZE] [Window {self.window_id}] {found} taille(s) renseignée(s)")
+
     def _size_to_bytes(self, size_str):
         try:
             if not isinstance(size_str, str):
@@ -957,7 +1095,13 @@ class MediaWindow:
         # ========= Sauvegarde FINALE (toujours) =========
         try:
             # même si 'changed' == 0, on persiste l'état (ex: clic 'Ignore all' juste avant close)
-            self.save_json()
+            saver = getattr(self, "_saver", None)
+            if saver is not None:
+                saver.stop(flush=False)
+            index_saver = getattr(self, "_index_saver", None)
+            if index_saver is not None:
+                index_saver.stop(flush=False)
+            self.save_json(immediate=True)
             if changed:
                 log_info(f"[CLOSE] {changed} média(s) converti(s) en Paused et sauvegardé(s)")
             else:
@@ -1092,6 +1236,7 @@ class MediaWindow:
             cache_key = (name, media_type, subtab)
             iid = self.item_id_cache.pop(cache_key, None)
             if iid:
+                self.media_index.unbind_item((media_type, subtab, iid))
                 try:
                     tree = (
                         self.video_not_downloaded_tree if media_type == "video" and subtab == "not_downloaded" else
@@ -1106,105 +1251,118 @@ class MediaWindow:
                 except Exception:
                     pass
 
-    def restore_progress_from_files(self, skip_sha256_verify=True):
-        log_info(f"[RESTORE] [Window {self.window_id}] Using video_dir: {self.video_dir}")
-        log_info(f"[RESTORE] [Window {self.window_id}] Using image_dir: {self.image_dir}")
-        log_info(f"[RESTORE] [Window {self.window_id}] Using local_dir: {self.local_dir}")
-
-        touched_types = set()
-
-        for media in self.medias:
-            name = media.get("name", "")
-            if not name:
-                log_warning(f"[RESTORE] [Window {self.window_id}] Média sans nom, ignoré")
-                continue
-
-            # — type
-            mtype = detect_type_from_name(name)
-            media["type"] = mtype
-            touched_types.add(mtype)
-            log_info(f"[RESTORE] [Window {self.window_id}] {name} → Type détecté : {mtype}")
-
-            if mtype == "video":
-                subdir = os.path.join(self.local_dir, "v")
-            elif mtype == "image":
-                subdir = os.path.join(self.local_dir, "p")
-            else:
-                subdir = self.local_dir
+    def _restore_media_from_disk(self, media, skip_sha256_verify=True, inventory=None):
+        """Réconcilie UN média avec le disque (type, taille, statut). Retourne le type détecté.
+        inventory : DiskInventory déjà scanné (sinon stat() direct, pour un média isolé)."""
+        if inventory is None:
+            inventory = DiskInventory(self.local_dir)
+        name = media.get("name", "")
+        if not name:
+            log_warning(f"[RESTORE] [Window {self.window_id}] Média sans nom, ignoré")
+            return None
 
-            dest_path = os.path.join(subdir, name)
-            tmp_path = dest_path + ".tmp"
+        # — type
+        mtype = detect_type_from_name(name)
+        media["type"] = mtype
+        log_info(f"[RESTORE] [Window {self.window_id}] {name} → Type détecté : {mtype}")
 
-            prev_status = (media.get("status") or "").strip()
+        if mtype == "video":
+            subdir = os.path.join(self.local_dir, "v")
+        elif mtype == "image":
+            subdir = os.path.join(self.local_dir, "p")
+        else:
+            subdir = self.local_dir
 
-            # === Règle d’or : NE JAMAIS ÉCRASER un Ignored pendant le restore ===
-            if prev_status == "Ignored":
-                # Met à jour uniquement des infos passives (taille locale) sans changer le status
-                if os.path.exists(dest_path):
-                    size = os.path.getsize(dest_path)
-                    media["local_size"] = size
-                    media["size_http"] = max(media.get("size_http", 0) or 0, size)
-                else:
-                    media["local_size"] = 0
-                    media["size_http"] = media.get("size_http", 0) or 0
-                # ne pas toucher percent/hash/speed/error ici
-                log_info(f"[RESTORE] {name} → Ignored (préservé)")
-                continue
+        dest_path = os.path.join(subdir, name)
+        tmp_path = dest_path + ".tmp"
 
-            # === Fichier temporaire présent → Paused
-            if os.path.exists(tmp_path):
-                media["local_size"] = os.path.getsize(tmp_path)
-                media["status"] = "Paused"
-                media["percent"] = 0
-                media["hash_check"] = ""
-                media.setdefault("size_http", 0)
+        prev_status = (media.get("status") or "").strip()
 
-            # === Fichier final présent
-            elif os.path.exists(dest_path):
-                size = os.path.getsize(dest_path)
+        # === Règle d’or : NE JAMAIS ÉCRASER un Ignored pendant le restore ===
+        if prev_status == "Ignored":
+            # Met à jour uniquement des infos passives (taille locale) sans changer le status
+            if inventory.exists(dest_path):
+                size = inventory.size(dest_path)
                 media["local_size"] = size
-                expected_size = media.get("size_http", 0) or 0
-                media["size_http"] = max(size, expected_size)
+                media["size_http"] = max(media.get("size_http", 0) or 0, size)
+            else:
+                media["local_size"] = 0
+                media["size_http"] = media.get("size_http", 0) or 0
+            # ne pas toucher percent/hash/speed/error ici
+            log_info(f"[RESTORE] {name} → Ignored (préservé)")
+            return mtype
+
+        # === Fichier temporaire présent → Paused
+        if inventory.exists(tmp_path):
+            media["local_size"] = inventory.size(tmp_path)
+            media["status"] = "Paused"
+            media["percent"] = 0
+            media["hash_check"] = ""
+            media.setdefault("size_http", 0)
 
-                if not skip_sha256_verify:
-                    try:
-                        actual_hash = sha256_file(dest_path)
-                        expected_hash = name.split("_")[-1].split(".")[0]
-                        if expected_hash and actual_hash.startswith(expected_hash):
-                            media["status"] = "Completed"
-                            media["percent"] = 100
-                            media["hash_check"] = ""
-                        elif size > 0:
-                            media["status"] = "Incomplete"
-                            media["percent"] = 0
-                            media["hash_check"] = actual_hash
-                        else:
-                            media["status"] = "Missing"
-                            media["local_size"] = 0
-                            media["percent"] = 0
-                            media["hash_check"] = ""
-                    except Exception as e:
-                        log_warning(f"[RESTORE] {name} → Erreur SHA256 : {e}")
-                        media["status"] = "Incomplete"
-                        media["percent"] = 0
-                        media["hash_check"] = ""
-                else:
-                    if size > 0:
+        # === Fichier final présent
+        elif inventory.exists(dest_path):
+            size = inventory.size(dest_path)
+            media["local_size"] = size
+            expected_size = media.get("size_http", 0) or 0
+            media["size_http"] = max(size, expected_size)
+
+            if not skip_sha256_verify:
+                try:
+                    actual_hash = sha256_file_cached(dest_path, inventory.stat(dest_path))
+                    expected_hash = name.split("_")[-1].split(".")[0]
+                    if expected_hash and actual_hash.startswith(expected_hash):
                         media["status"] = "Completed"
                         media["percent"] = 100
                         media["hash_check"] = ""
+                    elif size > 0:
+                        media["status"] = "Incomplete"
+                        media["percent"] = 0
+                        media["hash_check"] = actual_hash
                     else:
                         media["status"] = "Missing"
                         media["local_size"] = 0
                         media["percent"] = 0
                         media["hash_check"] = ""
-
-            # === Rien trouvé
+                except Exception as e:
+                    log_warning(f"[RESTORE] {name} → Erreur SHA256 : {e}")
+                    media["status"] = "Incomplete"
+                    media["percent"] = 0
+                    media["hash_check"] = ""
             else:
-                media["status"] = "Missing"
-                media["local_size"] = 0
-                media["percent"] = 0
-                media["hash_check"] = ""
+                if size > 0:
+                    media["status"] = "Completed"
+                    media["percent"] = 100
+                    media["hash_check"] = ""
+                else:
+                    media["status"] = "Missing"
+                    media["local_size"] = 0
+                    media["percent"] = 0
+                    media["hash_check"] = ""
+
+        # === Rien trouvé
+        else:
+            media["status"] = "Missing"
+            media["local_size"] = 0
+            media["percent"] = 0
+            media["hash_check"] = ""
+        return mtype
+
+    def restore_progress_from_files(self, skip_sha256_verify=True):
+        log_info(f"[RESTORE] [Window {self.window_id}] Using video_dir: {self.video_dir}")
+        log_info(f"[RESTORE] [Window {self.window_id}] Using image_dir: {self.image_dir}")
+        log_info(f"[RESTORE] [Window {self.window_id}] Using local_dir: {self.local_dir}")
+
+        touched_types = set()
+
+        # un seul passage scandir sur v/, p/ et la racine au lieu de 2-3 stat() par média
+        inventory = DiskInventory(self.local_dir, (self.video_dir, self.image_dir)).scan()
+        with inventory.reconcile():
+            for media in self.medias:
+                mtype = self._restore_media_from_disk(media, skip_sha256_verify, inventory)
+                if mtype:
+                    touched_types.add(mtype)
+        inventory.report(f"[RESTORE] [Window {self.window_id}]", len(self.medias))
 
         # Normaliser les états transitoires (mais pas Ignored)
         for media in self.medias:
@@ -1274,10 +1432,24 @@ class MediaWindow:
             log_warning(f"[UI] Erreur tri treeview: {e}")
 
 
+    def _register_item(self, cache_key, item_id):
+        """Enregistre la ligne Treeview (name, type, subtab) → iid et iid → média."""
+        self.item_id_cache[cache_key] = item_id
+        name, tree_type, subtab = cache_key
+        self.media_index.bind_item((tree_type, subtab, item_id), self.media_index.by_name(name))
+
+    def _media_for_item(self, item_id, tree_type, subtab, media_name):
+        """Média affiché sur une ligne du Treeview (O(1), repli sur l'index par nom)."""
+        media = self.media_index.by_item((tree_type, subtab, item_id))
+        if media is None or media.get("name") != media_name:
+            media = self.media_index.by_name(media_name)
+        return media
+
     def _media_key(self, media: dict) -> str:
         """Construit une clé unique et stable pour un média."""
+        media_id = media.get("id")
         return (
-                str(media.get("id"))
+                (str(media_id) if media_id not in (None, "") else "")
                 or media.get("cdn_path")
                 or media.get("url")
                 or media.get("name")
@@ -1285,7 +1457,7 @@ class MediaWindow:
         )
 
 
-    def insert_media_in_treeview(self, tree_type="video", status="not_downloaded"):
+    def insert_media_in_treeview(self, tree_type="video", status="not_downloaded", medias=None, clear=True):
         start_time = time.time()
         tree_attr = f"{tree_type}_{status}_tree"
 
@@ -1312,20 +1484,22 @@ class MediaWindow:
         log_info(f"[TREEVIEW] [{self.window_id}] {tree_attr} DIAG: total={total} videos={videos} images={images}")
 
         # ---- Clear + reset anti-doublon (seulement à l'initial render) ----
-        try:
-            tree.delete(*tree.get_children())
-            if not hasattr(self, "tree_item_keys"):
-                from collections import defaultdict
-                self.tree_item_keys = defaultdict(set)
-            self.tree_item_keys[tree_attr].clear()
-            log_info(f"[TREEVIEW] [Window {self.window_id}] {tree_attr} vidé + reset anti-doublons")
-        except Exception as e:
-            log_warning(f"[TREEVIEW] [Window {self.window_id}] Erreur vidage {tree_attr} : {e}")
-            return
+        # (clear=False : ajout d'un paquet en chargement progressif, l'anti-doublon est conservé)
+        if clear:
+            try:
+                tree.delete(*tree.get_children())
+                if not hasattr(self, "tree_item_keys"):
+                    from collections import defaultdict
+                    self.tree_item_keys = defaultdict(set)
+                self.tree_item_keys[tree_attr].clear()
+                log_info(f"[TREEVIEW] [Window {self.window_id}] {tree_attr} vidé + reset anti-doublons")
+            except Exception as e:
+                log_warning(f"[TREEVIEW] [Window {self.window_id}] Erreur vidage {tree_attr} : {e}")
+                return
 
-        # ---- Comptage rapides pour vidéos à l'onglet ND ----
-        if tree_type == "video" and status == "not_downloaded":
-            self.stats_videos = self.stats_images = self.stats_autres = 0
+            # ---- Comptage rapides pour vidéos à l'onglet ND ----
+            if tree_type == "video" and status == "not_downloaded":
+                self.stats_videos = self.stats_images = self.stats_autres = 0
 
         VIDEO_EXT = {".mp4", ".m4v", ".mov", ".webm", ".avi", ".flv", ".mkv"}
         IMAGE_EXT = {".jpg", ".jpeg", ".png", ".webp", ".gif"}
@@ -1337,12 +1511,12 @@ class MediaWindow:
         # normalise statut attendu
         wanted = status.strip().lower()
 
-        for media in self.medias:
+        for media in (self.medias if medias is None else medias):
             # gardes de boucle
             if self.is_closing or not self.is_active or not self.check_ui_alive() or not self.restore_progress_running:
                 log_warning(f"[TREEVIEW] [Window {self.window_id}] Arrêt insertion (fenêtre fermée)")
                 return
-            if not isinstance(media, dict):
+            if not isinstance(media, Mapping):
                 continue
 
             name = (media.get("name") or "").strip()
@@ -1402,7 +1576,7 @@ class MediaWindow:
             inserted += 1
 
         # ---- Batch insert non-bloquant UI ----
-        self._bulk_insert_start(f"{tree_type}_{status}", prepared_rows, chunk_size=250, delay_ms=1)
+        self._bulk_insert_start(f"{tree_type}_{status}", prepared_rows, chunk_size=250, delay_ms=1, append=not clear)
 
         # DIAG final
         log_info(f"[TREEVIEW] [Window {self.window_id}] {tree_attr} → candidats={inserted} "
@@ -1424,7 +1598,7 @@ class MediaWindow:
     def insert_single_media(self, media, tree_type, subtab):
         if self.is_closing or not self.is_active or not self.check_ui_alive():
             return
-        if not isinstance(media, dict):
+        if not isinstance(media, Mapping):
             return
 
         try:
@@ -1494,7 +1668,7 @@ class MediaWindow:
                 return
             try:
                 iid = tree.insert("", tk.END, values=values, tags=tags)
-                self.item_id_cache[cache_key] = iid
+                self._register_item(cache_key, iid)
                 try:
                     self.safe_update_tree(iid, tree_type, subtab, tags=(f"{status}.{tree_type}",))
                     self.resort_treeview_if_needed(tree)
@@ -1667,7 +1841,7 @@ class MediaWindow:
                 self.image_not_downloaded_tree if tree_type == "image" and subtab == "not_downloaded" else
                 self.image_completed_tree)
         media_name = tree.item(item_id, "values")[0]
-        media = next((m for m in self.medias if m.get("name") == media_name), None)
+        media = self._media_for_item(item_id, tree_type, subtab, media_name)
         if not media:
             log_warning("[Preview] Média non trouvé")
             return
@@ -1699,7 +1873,7 @@ class MediaWindow:
                 self.image_not_downloaded_tree if tree_type == "image" and subtab == "not_downloaded" else
                 self.image_completed_tree)
         media_name = tree.item(item_id, "values")[0]
-        media = next((m for m in self.medias if m.get("name") == media_name), None)
+        media = self._media_for_item(item_id, tree_type, subtab, media_name)
         if not media:
             log_error(f"[FORCE RETRY] Média non trouvé : {media_name}")
             return
@@ -1721,7 +1895,7 @@ class MediaWindow:
                 self.image_not_downloaded_tree if tree_type == "image" and subtab == "not_downloaded" else
                 self.image_completed_tree)
         media_name = tree.item(item_id, "values")[0]
-        media = next((m for m in self.medias if m.get("name") == media_name), None)
+        media = self._media_for_item(item_id, tree_type, subtab, media_name)
         if not media:
             log_warning("[Open] Média non trouvé")
             return
@@ -1752,7 +1926,7 @@ class MediaWindow:
                 self.image_completed_tree)
 
         media_name = tree.item(item_id, "values")[0]
-        media = next((m for m in self.medias if m.get("name") == media_name), None)
+        media = self._media_for_item(item_id, tree_type, subtab, media_name)
         if not media:
             log_error("[ForceComplete] Média non trouvé")
             return
@@ -1779,7 +1953,7 @@ class MediaWindow:
                 media["speed"] = ""
 
                 self.refresh_media_row(media, move_to_completed=True)
-                self.save_json()
+                self._persist_media(media)
                 return
             else:
                 log_warning(f"[ForceComplete] ❌ Fichier tmp et fichier final absents : {media_name}")
@@ -1798,7 +1972,7 @@ class MediaWindow:
 
             log_info(f"[ForceComplete] Forcé : {media_name} → Completed")
             self.refresh_media_row(media, move_to_completed=True)
-            self.save_json()
+            self._persist_media(media)
 
         except Exception as e:
             log_error(f"[ForceComplete] Rename échoué : {e}")
@@ -1822,7 +1996,7 @@ class MediaWindow:
                 self.image_not_downloaded_tree if tree_type == "image" and subtab == "not_downloaded" else
                 self.image_completed_tree)
 
-        media = next((m for m in self.medias if m.get("name") == tree.item(item_id, "values")[0]), None)
+        media = self._media_for_item(item_id, tree_type, subtab, tree.item(item_id, "values")[0])
         if not media:
             log_error(f"[SHA256] Média non trouvé pour {item_id}")
             return
@@ -1851,7 +2025,9 @@ class MediaWindow:
             if path.endswith(".tmp"):
                 try:
                     os.rename(path, final_path)
+                    old_name = media.get("name")
                     media["name"] = os.path.basename(final_path)
+                    self.media_index.rename(media, old_name)
                 except Exception as e:
                     log_error(f"[SHA256] Rename .tmp échoué : {e}")
             media["status"] = "Completed"
@@ -1871,7 +2047,7 @@ class MediaWindow:
 
         log_info(f"[SHA256] {media['name']} → {media.get('hash_check', '')}")
         self.refresh_media_row(media, move_to_completed=ok)
-        self.save_json()
+        self._persist_media(media)
 
 
     def download_all(self):
@@ -1940,7 +2116,7 @@ class MediaWindow:
                 self.image_not_downloaded_tree if tree_type == "image" and subtab == "not_downloaded" else
                 self.image_completed_tree)
         media_name = tree.item(item_id, "values")[0]
-        media = next((m for m in self.medias if m.get("name") == media_name), None)
+        media = self._media_for_item(item_id, tree_type, subtab, media_name)
         log_info(
             f"[Queue] [Window {self.window_id}] Ajout de {media_name} à la file (queue_size={len(self.download_queue)})")
 
@@ -2032,6 +2208,7 @@ class MediaWindow:
             except Exception:
                 pass
             self.item_id_cache.pop(old_key, None)
+            self.media_index.unbind_item((tree_type, old_subtab, old_item_id))
 
         # Valeurs à afficher
         if subtab == "not_downloaded":
@@ -2072,7 +2249,7 @@ class MediaWindow:
             try:
                 if not item_id or not target_tree.exists(item_id):
                     new_id = target_tree.insert("", "end", values=values, tags=(f"{status.lower()}.{tree_type}",))
-                    self.item_id_cache[tree_key] = new_id
+                    self._register_item(tree_key, new_id)
                 else:
                     self.safe_update_tree(item_id, tree_type, subtab, values=values,
                                           tags=(f"{status.lower()}.{tree_type}",))
@@ -2115,7 +2292,7 @@ class MediaWindow:
 
         # 3) Retrouver le média
         media_name = tree.item(item_id, "values")[0]
-        media = next((m for m in self.medias if m.get("name") == media_name), None)
+        media = self._media_for_item(item_id, tree_type, subtab, media_name)
         if not media:
             log_error(f"[DL] Média non trouvé pour {media_name}")
             return
@@ -2191,7 +2368,7 @@ class MediaWindow:
                 pass
 
         self.refresh_media_row(media)
-        self.save_json()
+        self._persist_media(media)
 
     def ignore_selected_file(self):
         tree, tree_type, subtab = self.get_current_tree_with_context()
@@ -2201,7 +2378,7 @@ class MediaWindow:
             return
 
         media_name = tree.item(item_id, "values")[0]
-        media = next((m for m in self.medias if m.get("name") == media_name), None)
+        media = self._media_for_item(item_id, tree_type, subtab, media_name)
         if not media:
             log_warning("[Ignore] Média non trouvé")
             return
@@ -2229,7 +2406,7 @@ class MediaWindow:
 
         # Refresh minimal (il passera dans l'onglet Ignored)
         self.refresh_media_row(media, move_to_completed=False)
-        self.save_json()
+        self._persist_media(media)
 
         # rafraîchir les 3 onglets du type courant
         self.refresh_tabs_for_type(tree_type)
@@ -2243,7 +2420,7 @@ class MediaWindow:
             return
 
         media_name = tree.item(item_id, "values")[0]
-        media = next((m for m in self.medias if m.get("name") == media_name), None)
+        media = self._media_for_item(item_id, tree_type, subtab, media_name)
         if not media:
             log_warning("[Unignore] Média non trouvé")
             return
@@ -2269,7 +2446,7 @@ class MediaWindow:
             move_to_completed = False
 
         self.refresh_media_row(media, move_to_completed=move_to_completed)
-        self.save_json()
+        self._persist_media(media)
 
         # rafraîchir les 3 onglets du type courant
         self.refresh_tabs_for_type(tree_type)
@@ -2329,7 +2506,7 @@ class MediaWindow:
         item_id = self.get_selected_item_id(tree)
         if item_id:
             media_name = tree.item(item_id, "values")[0]
-            media = next((m for m in self.medias if m.get("name") == media_name), None)
+            media = self.media_index.by_name(media_name)
             if media:
                 media["status"] = "Waiting"
                 media["error"] = ""
@@ -2352,7 +2529,7 @@ class MediaWindow:
                             log_warning(f"[Restart] ⚠️ Erreur suppression {path} : {e}")
 
                 self.refresh_media_row(media, move_to_completed=False)
-                self.save_json()
+                self._persist_media(media)
         else:
             messagebox.showwarning("Aucun fichier", "Veuillez sélectionner un fichier dans la liste.")
 
@@ -2504,7 +2681,7 @@ class MediaWindow:
                             media["percent"] = 100
                             media["speed"] = "0 B/s"
                             self.refresh_media_row(media, move_to_completed=True)
-                            self.save_json()
+                            self._persist_media(media)
                             return
 
                         # ok == False → gestion spéciale range/416 si détecté
@@ -2615,7 +2792,7 @@ class MediaWindow:
                 self.image_not_downloaded_tree if tree_type == "image" and subtab == "not_downloaded" else
                 self.image_completed_tree)
         media_name = tree.item(item_id, "values")[0]
-        media = next((m for m in self.medias if m.get("name") == media_name), None)
+        media = self._media_for_item(item_id, tree_type, subtab, media_name)
         if media and media.get("url"):
             size = get_remote_file_size(media["url"])
             if size:
@@ -2637,7 +2814,7 @@ class MediaWindow:
                 self.image_not_downloaded_tree if tree_type == "image" and subtab == "not_downloaded" else
                 self.image_completed_tree)
         media_name = tree.item(item_id, "values")[0]
-        media = next((m for m in self.medias if m.get("name") == media_name), None)
+        media = self._media_for_item(item_id, tree_type, subtab, media_name)
         if not media:
             log_error(f"[Repair] Média non trouvé : {media_name}")
             return
@@ -2858,47 +3035,144 @@ class MediaWindow:
         return True
 
 
-    def save_json(self):
+    def _persist_media(self, media):
+        """Persiste le changement d'UN média : UPSERT en base / ligne de journal si dispo,
+        sinon sauvegarde complète."""
+        store = getattr(getattr(self, "pm", None), "store", None)
+        if store is None and not self._journal_enabled:
+            self.save_json()
+            return
+        try:
+            if store is not None:
+                with self.save_lock:
+                    row_key = self._store_key_for(store, media)
+                    if row_key is not None:
+                        store.upsert_media(self.service, self.username, media, key=row_key)
+                if row_key is None:
+                    # média absent de la base telle qu'écrite : snapshot complet (recalcule les clés)
+                    self.save_json()
+                    return
+                self._index_saver.mark_dirty()
+                return
+            with self.save_lock:
+                row_key = (self._journal_keys or {}).get(id(media))
+                if row_key is not None:
+                    size = self._journal.append(media, row_key)
+            if row_key is None:
+                # pas encore de snapshot écrit par cette fenêtre (ou média ajouté depuis) : snapshot complet
+                self.save_json()
+                return
+            self._index_saver.mark_dirty()
+            if size >= self._journal_compact_bytes and getattr(self, "_saver", None) is not None:
+                # compaction en arrière-plan : snapshot complet puis purge du journal
+                self._saver.mark_dirty(self._saver.max_unsaved)
+        except Exception as e:
+            log_warning(f"[SAVE] [Window {self.window_id}] Persistance {media.get('name')} échouée ({e}) → sauvegarde complète")
+            self.save_json()
+
+    def _store_key_for(self, store, media):
+        """Clé de ligne SQLite de `media` (sous save_lock) : celle écrite par le dernier save_profile,
+        suffixe #n des doublons compris, et stable si le chemin du média change depuis."""
+        keys = self._store_keys
+        if keys is None:
+            stored = store.load_media_keys(self.service, self.username)
+            # self.medias n'est qu'étendu en fin de liste : même ordre que les positions en base
+            keys = dict(zip(map(id, self.medias), stored)) if len(stored) == len(self.medias) else {}
+            self._store_keys = keys
+        return keys.get(id(media))
+
+    def save_json(self, immediate=False):
+        """Marque le profil comme modifié ; l'écriture réelle est différée et coalescée
+        par le DebouncedSaver (immediate=True → écriture synchrone)."""
+        saver = getattr(self, "_saver", None)
+        if saver is not None and not immediate:
+            saver.mark_dirty()
+            return
+        try:
+            self._write_snapshot()
+        except Exception as e:
+            log_error(f"[SAVE] [Window {self.window_id}] Erreur sauvegarde JSON : {e}")
+
+    def _snapshot_payload_locked(self):
+        """Copie cohérente du profil (appelant sous save_lock, sérialisée hors verrou)."""
+        # 🔒 s'assurer que medias_data pointe bien sur la liste courante
+        try:
+            if self.medias_data.get("medias") is not self.medias:
+                self.medias_data["medias"] = self.medias
+        except Exception:
+            self.medias_data["medias"] = self.medias
+        payload = dict(self.medias_data)
+        payload["medias"] = [dict(m) for m in self.medias]
+        return payload
+
+    def _write_snapshot(self):
+        """Écriture effective (appelée par le saver) ; lève en cas d'échec pour garder le dirty."""
+        if self._stream_load and not self._restore_done.is_set():
+            # jamais de snapshot d'une liste partielle : le saver réessaiera après le chargement
+            raise RuntimeError("chargement progressif en cours")
+        store = getattr(getattr(self, "pm", None), "store", None)
+        if store is not None:
+            with self.save_lock:
+                # sous le verrou : aucun UPSERT ne s'intercale entre la copie et son écriture
+                payload = self._snapshot_payload_locked()
+                store.save_profile(self.service, self.username, payload)
+                self._store_keys = dict(zip(map(id, self.medias), store.media_keys(payload["medias"])))
+            log_info(f"[SAVE] [Window {self.window_id}] Profil sauvegardé en base ({self.profile_key})")
+            self._write_index(payload)
+            self._notify_profile_update()
+            return
+
+        # journal tourné, copie prise et clés de ligne relevées d'un bloc sous save_lock : ce qui arrive
+        # pendant l'écriture reste journalisé, avec les clés de ce snapshot
         with self.save_lock:
+            self._journal.rotate()
+            payload = self._snapshot_payload_locked()
+            self._journal_keys = dict(zip(map(id, self.medias), media_row_keys(payload["medias"])))
+        try:
+            # 💾 écriture avec flush + fsync pour garantir la persistance immédiate
+            tmp_path = self.json_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+
+            # swap atomique
             try:
-                # 🔒 s'assurer que medias_data pointe bien sur la liste courante
-                try:
-                    if self.medias_data.get("medias") is not self.medias:
-                        self.medias_data["medias"] = self.medias
-                except Exception:
-                    self.medias_data["medias"] = self.medias
+                os.replace(tmp_path, self.json_path)
+            except Exception:
+                # fallback mac/win
+                if os.path.exists(self.json_path):
+                    os.remove(self.json_path)
+                os.rename(tmp_path, self.json_path)
+        except Exception:
+            # snapshot non écrit : ses clés ne valent rien sur disque → snapshots complets jusqu'au prochain
+            self._journal_keys = None
+            raise
+        self._journal.drop_rotated()
 
-                # 💾 écriture avec flush + fsync pour garantir la persistance immédiate
-                tmp_path = self.json_path + ".tmp"
-                with open(tmp_path, "w", encoding="utf-8") as f:
-                    json.dump(self.medias_data, f, indent=4)
-                    f.flush()
-                    os.fsync(f.fileno())
+        log_info(f"[SAVE] [Window {self.window_id}] JSON sauvegardé à {self.json_path}")
+        self._write_index(payload)
 
-                # swap atomique
-                try:
-                    os.replace(tmp_path, self.json_path)
-                except Exception:
-                    # fallback mac/win
-                    if os.path.exists(self.json_path):
-                        os.remove(self.json_path)
-                    os.rename(tmp_path, self.json_path)
+        # Notifie (best effort) — une seule fois par écriture réelle
+        self._notify_profile_update()
 
-                log_info(f"[SAVE] [Window {self.window_id}] JSON sauvegardé à {self.json_path}")
 
-                # Notifie (best effort)
-                self._notify_profile_update()
-                try:
-                    event_bus.emit("profile:update", {
-                        "service": self.service,
-                        "username": self.username,
-                        "profile_key": self.profile_key
-                    })
-                except Exception as e:
-                    log_warning(f"[SAVE] emit profile:update failed: {e}")
-            except Exception as e:
-                log_error(f"[SAVE] [Window {self.window_id}] Erreur sauvegarde JSON : {e}")
+    def _flush_index(self):
+        """Écriture différée après des persistances par média (base / journal) : index + une seule
+        notification profile:update pour toute la rafale."""
+        self._write_index()
+        self._notify_profile_update()
 
+    def _write_index(self, payload=None):
+        """Met à jour l'entrée de ce profil dans data/index.json."""
+        pm = getattr(self, "pm", None)
+        if pm is None or not hasattr(pm, "update_index"):
+            return
+        if self._stream_load and not self._restore_done.is_set():
+            return
+        medias = payload["medias"] if payload else list(self.medias)
+        last_update = (payload or self.medias_data).get("last_update", "1970-01-01T00:00:00+00:00")
+        pm.update_index(ProfileKey(self.service, self.username), medias, last_update)
 
     def on_event_update(self, event_data):
         if self._suppress_events or self._booting or self.is_closing:
@@ -2937,13 +3211,17 @@ class MediaWindow:
             )
 
 
-    def _bulk_insert_start(self, tree_key, rows, chunk_size=200, delay_ms=1):
+    def _bulk_insert_start(self, tree_key, rows, chunk_size=200, delay_ms=1, append=False):
         """
         rows: liste de tuples (values, tags, cache_key)
         On insère par paquets en utilisant after() pour ne pas bloquer l’UI.
+        append=True : prolonge une insertion en cours au lieu de la remplacer.
         """
         if not hasattr(self, "_bulk_state"):
             self._bulk_state = {}
+        if append and tree_key in self._bulk_state:
+            self._bulk_state[tree_key]["rows"].extend(rows)
+            return
         self._bulk_state[tree_key] = {
             "rows": rows,
             "index": 0,
@@ -2973,7 +3251,12 @@ class MediaWindow:
             try:
                 item_id = tree.insert("", tk.END, values=values, tags=tags)
                 if cache_key:
-                    self.item_id_cache[cache_key] = item_id
+                    self._register_item(cache_key, item_id)
+                if not getattr(self, "_first_row_logged", False):
+                    self._first_row_logged = True
+                    log_info(f"[BOOT] [Window {self.window_id}] Time to first row : "
+                             f"{(time.perf_counter() - self._boot_t0) * 1000:.0f} ms "
+                             f"({'progressif' if self._stream_load else 'complet'})")
             except Exception as e:
                 log_warning(f"[BULK] insert fail on {tree_key} : {e}")
 
@@ -0,0 +1,32 @@
+# tests/test_profile_loader.py
+import json
+
+import pytest
+
+from core.profile_loader import ProfileStreamLoader
+
+PROFILE = {
+    "last_update": "2025-01-02T03:04:05",
+    "ratio": 1.5e3,
+    "offset": -0.25,
+    "medias": [
+        {"id": 123456789, "size": 1.25e-2, "w": -1e+10, "ok": True, "name": "a.mp4"},
+        {"id": 7, "size": 0.5, "w": 12345.678, "ok": False, "name": None},
+        {"id": -42, "size": 3E5, "w": 0, "ok": True, "name": "b.jpg"},
+    ],
+    "count": 3,
+    "scale": 2.5E-3,
+}
+
+
+@pytest.mark.parametrize("read_size", range(1, 17))
+def test_numbers_cut_at_any_read_boundary(tmp_path, read_size):
+    path = tmp_path / "profile.json"
+    path.write_text(json.dumps(PROFILE), encoding="utf-8")
+
+    loader = ProfileStreamLoader(str(path), first_chunk=1, chunk_size=2, read_size=read_size)
+    medias = [m for chunk in loader.iter_chunks() for m in chunk]
+
+    assert medias == PROFILE["medias"]
+    assert loader.header == {k: v for k, v in PROFILE.items() if k != "medias"}
+    assert loader.stats["count"] == len(PROFILE["medias"])
@@ -55,6 +55,8 @@ class AppUI:
         table_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
         ttk.Button(toolbar, text="🔄 Rafraîchir", command=self.c.load_profiles).pack(side=tk.LEFT, padx=5)
+        ttk.Button(toolbar, text="🧮 Rebuild index", command=self.c.rebuild_profile_index).pack(side=tk.LEFT, padx=5)
+        ttk.Button(toolbar, text="🔁 Update all", command=self.c.update_all_profiles).pack(side=tk.LEFT, padx=5)
         ttk.Button(toolbar, text="⚙️ Settings", command=self.c.change_download_dir).pack(side=tk.LEFT, padx=5)
 
         ttk.Label(toolbar, text="➕ Ajouter profil (URL)").pack(side=tk.LEFT, padx=5)
@@ -1,19 +1,29 @@
 from log import log_info, log_error, log_warning
 import os, time, requests
-import random  # ajout pour jitter
 
-from .network_utils import build_media_url, get_remote_file_size
+from .network_utils import build_media_url
+from core.pagination_cache import get_pagination_cache, prefer_mode
+from core.http_cache import get_http_cache, is_offline
+from core.rate_limiter import get_rate_limiter, parse_retry_after
+from core.endpoints import BASE_HOST, api_url, site_url
 
 def fetch_medias_paginated(service, username, on_media_callback):
     log_info(f"[API] Streaming medias for {service}/{username}")
     seen_ids = set()
     offset = 0
     limit = 50
+    limiter = get_rate_limiter()
+    throttled = 0
     while True:
-        url = f"https://coomer.st/api/v1/{service}/user/{username}?o={offset}"
+        url = api_url(f"/{service}/user/{username}?o={offset}")
         log_info(f"[API] Requête : {url}")
         try:
+            limiter.acquire(url)
             resp = requests.get(url, timeout=10)
+            if limiter.penalize(url, resp.status_code, resp.headers.get("Retry-After")) and throttled < 6:
+                throttled += 1
+                continue
+            throttled = 0
             if resp.status_code != 200:
                 log_error(f"[API] Erreur HTTP {resp.status_code} pour {url}")
                 break
@@ -35,9 +45,7 @@ def fetch_medias_paginated(service, username, on_media_callback):
                     continue
 
                 url_cdn = build_media_url(path)
-                size_http = get_remote_file_size(url_cdn)
                 log_info(f"[MEDIA] URL CDN : {url_cdn}")
-                log_info(f"[MEDIA] Taille HTTP : {size_http} octets")
 
                 media = {
                     "id": media_id,
@@ -46,7 +54,7 @@ def fetch_medias_paginated(service, username, on_media_callback):
                     "title": item.get("title", ""),
                     "added": item.get("added"),
                     "url": url_cdn,
-                    "size_http": size_http,
+                    "size_http": None,  # renseignée après listing (core.size_probe)
                     "percent": "0",
                     "downloaded": False,
                     "retry_count": 0,
@@ -54,56 +62,238 @@ def fetch_medias_paginated(service, username, on_media_callback):
                 }
                 on_media_callback(media)
             offset += limit
-            time.sleep(0.3)
         except Exception as e:
             log_error(f"[API] fetch_medias_paginated error: {e}")
             break
 
 UA = "CoomerUltimate/0.4 (+https://github.com/you/yourapp)"
 
-def fetch_medias_from_api(service, username, session_cookie=None, extra_cookies=None, check_cdn=False):
-    import os, time, requests
+VIDEO_EXTS = (".mp4", ".m4v", ".mov", ".webm", ".avi", ".mkv", ".flv")
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp", ".gif")
+
+
+def api_base_url(service, username):
+    return api_url(f"/{service}/user/{username}/posts")
+
+
+def api_headers(service, username):
+    return {
+        "User-Agent": UA,                       # tu peux mettre ton UA navigateur ici si besoin
+        "Accept": "text/css",                   # <— clé pour Coomer/DDG en ce moment
+        "Referer": site_url(f"/{service}/user/{username}"),
+        "Origin": site_url(),
+    }
+
+
+def build_api_url(url, params=None):
     from urllib.parse import urlencode
+    q = dict(params or {})
+    q["_"] = int(time.time())              # cache-buster
+    return f"{url}?{urlencode(q)}"
+
+
+def parse_posts_payload(data):
+    """JSON décodé → liste de posts (ou None si réponse inattendue)."""
+    if isinstance(data, dict) and "posts" in data:
+        data = data["posts"]
+    if not isinstance(data, list):
+        log_error("[API] Erreur : réponse inattendue (liste attendue)")
+        return None
+    return data
+
+
+def post_id(item):
+    return item.get("id") or item.get("post_id")
+
+
+def extract_cdn_hash(url):
+    try:
+        return os.path.splitext(os.path.basename(url))[0]
+    except Exception:
+        return None
+
+
+def _type_from_name(name):
+    ext = os.path.splitext(name)[1].lower()
+    return "video" if ext in VIDEO_EXTS else "image" if ext in IMAGE_EXTS else "autre"
+
+
+def pagination_candidates(last_id, last_ts, seen_count):
+    """Modes de pagination à essayer après la page 1, du plus robuste au dernier recours."""
+    candidates = []
+    if last_id:
+        candidates.append(({"before_id": last_id}, "before_id"))
+        candidates.append(({"max_id": last_id}, "max_id"))
+    if last_ts:
+        candidates.append(({"before": last_ts}, "before"))
+    # certains profils veulent page=1 pour la 2e page (indexation 0/1 incohérente)
+    candidates.append(({"page": 2}, "page"))
+    candidates.append(({"page": 1}, "page"))
+    # dernier recours : offset
+    candidates.append(({"o": seen_count}, "offset"))
+    return candidates
+
+
+def next_page_params(page_mode, last_id, last_ts, page_no, seen_count):
+    """Paramètres de la page suivante pour un mode déjà détecté (None si mode inconnu)."""
+    if page_mode == "before_id":
+        return {"before_id": last_id}
+    if page_mode == "max_id":
+        return {"max_id": last_id}
+    if page_mode == "before":
+        return {"before": last_ts}
+    if page_mode == "page":
+        return {"page": page_no}
+    if page_mode == "until":
+        return {"until": last_ts}
+    if page_mode == "offset":
+        return {"o": seen_count}
+    return None
+
+
+class PageExtractor:
+    """
+    Pages de posts → médias plats, dédoublonnés sur tout le parcours
+    (id de post + hash CDN), avec les curseurs last_id / last_ts.
+    Partagé par fetch_medias_from_api et le client asynchrone.
+    """
+
+    def __init__(self):
+        self.seen_ids = set()
+        self.seen_hashes = set()
+        self.seen_hashes_map = {}
+        self.last_id = None
+        self.last_ts = None
+        self.page_index = 0
+
+    def track_cursor(self, items):
+        """Met à jour last_id / last_ts sans extraire (permet de lancer la page suivante plus tôt)."""
+        for item in items:
+            media_id = post_id(item)
+            if not media_id:
+                continue
+            self.last_id = str(media_id)
+            self.last_ts = item.get("published") or item.get("added") or item.get("created_at")
+
+    def has_new(self, items):
+        return any(post_id(it) not in self.seen_ids for it in items)
+
+    def _add_media(self, page_medias, media_id, name, path, title, added, log_id):
+        url_cdn = build_media_url(path)
+        cdn_hash = extract_cdn_hash(url_cdn)
+        duplicate_key = cdn_hash or name
+        if duplicate_key in self.seen_hashes:
+            origin_id = self.seen_hashes_map.get(duplicate_key, "inconnu")
+            log_info(f"[DUPLICATE] {duplicate_key} — {name} — Post: {log_id} / Origine: {origin_id}")
+            return False
+        media = {
+            "id": media_id,
+            "name": name,
+            "path": path,
+            "title": title,
+            "added": added,
+            "url": url_cdn,
+            "size_http": None,
+            "cdn_checked": False,
+            "percent": "0",
+            "downloaded": False,
+            "retry_count": 0,
+            "error": "",
+            "status": "",
+            "type": _type_from_name(name)
+        }
+        page_medias.append(media)
+        self.seen_hashes.add(duplicate_key)
+        self.seen_hashes_map[duplicate_key] = media["id"]
+        return True
+
+    def extract(self, items):
+        """Transforme une page de posts en médias plats + maj last_id/last_ts"""
+        page_medias, added_names, skipped_names = [], 0, 0
+        for item in items:
+            media_id = post_id(item)
+            if not media_id:
+                continue
+            # curseurs de pagination
+            self.last_id = str(media_id)
+            self.last_ts = item.get("published") or item.get("added") or item.get("created_at")
+
+            if media_id in self.seen_ids:
+                continue
+            self.seen_ids.add(media_id)
+
+            title = item.get("title", "")
+            added = item.get("added") or item.get("published") or item.get("created_at")
+
+            # 1) fichier principal
+            file = item.get("file")
+            if file and file.get("path") and file.get("name"):
+                if self._add_media(page_medias, str(media_id), file["name"], file["path"], title, added, media_id):
+                    added_names += 1
+                else:
+                    skipped_names += 1
 
+            # 2) attachments
+            for i, att in enumerate(item.get("attachments", [])):
+                name = att.get("name"); path = att.get("path")
+                if not path or not name:
+                    continue
+                att_id = f"{media_id}_att{i}"
+                if self._add_media(page_medias, att_id, name, path, title, added, att_id):
+                    added_names += 1
+                else:
+                    skipped_names += 1
+
+        log_info(f"[PAGE] {added_names} ajoutés, {skipped_names} doublons ignorés (page={self.page_index})")
+        return page_medias
+
+
+def fetch_medias_from_api(service, username, session_cookie=None, extra_cookies=None, check_cdn=False):
     log_info(f"[API] Fetching medias for {service}/{username}")
 
     # --- Session HTTP ---
     s = requests.Session()
-    s.headers.update({
-        "User-Agent": UA,                       # tu peux mettre ton UA navigateur ici si besoin
-        "Accept": "text/css",                   # <— clé pour Coomer/DDG en ce moment
-        "Referer": f"https://coomer.st/{service}/user/{username}",
-        "Origin": "https://coomer.st",
-    })
+    s.headers.update(api_headers(service, username))
     # Cookies d’auth éventuels
     if session_cookie:
-        s.cookies.set("session", session_cookie, domain="coomer.st", path="/")
+        s.cookies.set("session", session_cookie, domain=BASE_HOST, path="/")
     if extra_cookies:
         for k, v in extra_cookies.items():
-            s.cookies.set(k, v, domain="coomer.st", path="/")
+            s.cookies.set(k, v, domain=BASE_HOST, path="/")
 
-    def build_url(url, params: dict | None = None):
-        q = dict(params or {})
-        q["_"] = int(time.time())              # cache-buster
-        return f"{url}?{urlencode(q)}"
+    cache = get_http_cache()
+    limiter = get_rate_limiter()
 
     def http_get(url):
-        """GET no-redirect avec petit backoff sur 429/5xx"""
+        """GET no-redirect via le limiteur partagé, backoff sur 429/5xx (revalidation via le cache disque)"""
+        cached = cache.lookup(url) if cache else None
+        if is_offline():
+            if cache:
+                cache.offline_hit(cached)
+            return cached.as_response() if cached else None
+        cond = cached.conditional_headers() if cached else {}
         backoff = 2.0
+        r = None
         for _ in range(4):
+            limiter.acquire(url)
             try:
-                r = s.get(url, timeout=15, allow_redirects=False)
+                r = s.get(url, timeout=15, allow_redirects=False, headers=cond)
             except Exception as e:
                 log_error(f"[API] Exception réseau : {e} → retry {backoff:.1f}s")
                 time.sleep(backoff); backoff = min(backoff * 1.5, 30); continue
 
             if r.status_code in (429, 502, 503, 504):
-                retry_in = r.headers.get("Retry-After")
-                try: retry_in = float(retry_in) if retry_in else backoff
-                except Exception: retry_in = backoff
-                retry_in = min(retry_in, 30)
+                # 429 / Retry-After : pause globale de l'hôte, attendue au prochain acquire
+                if limiter.penalize(url, r.status_code, r.headers.get("Retry-After"), backoff):
+                    backoff = min(backoff * 1.5, 30); continue
+                retry_in = min(parse_retry_after(r.headers.get("Retry-After"), backoff), 30)
                 log_warning(f"[API] {r.status_code} sur {url} → retry dans {retry_in:.1f}s")
                 time.sleep(retry_in); backoff = min(backoff * 1.5, 30); continue
+            if r.status_code == 304 and cached:
+                cache.touch(cached)
+                return cached.as_response()
+            if r.status_code == 200 and cache:
+                cache.store(url, r.content, r.headers)
             return r
         return r  # dernier essai
 
@@ -113,27 +303,14 @@ def fetch_medias_from_api(service, username, session_cookie=None, extra_cookies=
         except Exception:
             log_error("[API] Réponse invalide (pas un JSON)")
             return None
-        if isinstance(data, dict) and "posts" in data:
-            data = data["posts"]
-        if not isinstance(data, list):
-            log_error("[API] Erreur : réponse inattendue (liste attendue)")
-            return None
-        return data
-
-    seen_ids = set()
-    seen_hashes = set()
-    seen_hashes_map = {}
-
-    def extract_cdn_hash(url):
-        try:
-            return os.path.splitext(os.path.basename(url))[0]
-        except Exception:
-            return None
+        return parse_posts_payload(data)
 
-    base = f"https://coomer.st/api/v1/{service}/user/{username}/posts"
+    extractor = PageExtractor()
+    modes = get_pagination_cache()
+    base = api_base_url(service, username)
 
     # ---- Page 1 (sans ?o=0)
-    url1 = build_url(base)
+    url1 = build_api_url(base)
     r = http_get(url1)
     if r is None:
         log_error("[API] Échec réseau sur page 1"); return
@@ -150,115 +327,11 @@ def fetch_medias_from_api(service, username, session_cookie=None, extra_cookies=
     if not data:
         log_info("[API] Aucune donnée (page 1)."); return
 
-    page_index = 1
-    last_id, last_ts = None, None
-
-    def extract_page_medias(items):
-        """Transforme une page de posts en médias plats + maj last_id/last_ts"""
-        nonlocal last_id, last_ts
-        page_medias, added_names, skipped_names = [], 0, 0
-        for item in items:
-            media_id = item.get("id") or item.get("post_id")
-            if not media_id:
-                continue
-            # curseurs de pagination
-            last_id = str(media_id)
-            last_ts = item.get("published") or item.get("added") or item.get("created_at")
-
-            if media_id in seen_ids:
-                continue
-            seen_ids.add(media_id)
-
-            title = item.get("title", "")
-            added = item.get("added") or item.get("published") or item.get("created_at")
-
-            # 1) fichier principal
-            file = item.get("file")
-            if file and file.get("path") and file.get("name"):
-                name = file["name"]
-                url_cdn = build_media_url(file["path"])
-                cdn_hash = extract_cdn_hash(url_cdn)
-                duplicate_key = cdn_hash or name
-                if duplicate_key in seen_hashes:
-                    origin_id = seen_hashes_map.get(duplicate_key, "inconnu")
-                    skipped_names += 1
-                    log_info(f"[DUPLICATE] {duplicate_key} — {name} — Post: {media_id} / Origine: {origin_id}")
-                else:
-                    ext = os.path.splitext(name)[1].lower()
-                    type_detected = (
-                        "video" if ext in [".mp4", ".m4v", ".mov", ".webm", ".avi", ".mkv", ".flv"]
-                        else "image" if ext in [".jpg", ".jpeg", ".png", ".webp", ".gif"]
-                        else "autre"
-                    )
-                    media = {
-                        "id": str(media_id),
-                        "name": name,
-                        "path": file["path"],
-                        "title": title,
-                        "added": added,
-                        "url": url_cdn,
-                        "size_http": None,
-                        "cdn_checked": False,
-                        "percent": "0",
-                        "downloaded": False,
-                        "retry_count": 0,
-                        "error": "",
-                        "status": "",
-                        "type": type_detected
-                    }
-                    page_medias.append(media)
-                    seen_hashes.add(duplicate_key)
-                    seen_hashes_map[duplicate_key] = media["id"]
-                    added_names += 1
-
-            # 2) attachments
-            for i, att in enumerate(item.get("attachments", [])):
-                name = att.get("name"); path = att.get("path")
-                if not path or not name:
-                    continue
-                url_cdn = build_media_url(path)
-                cdn_hash = extract_cdn_hash(url_cdn)
-                duplicate_key = cdn_hash or name
-                att_id = f"{media_id}_att{i}"
-                if duplicate_key in seen_hashes:
-                    origin_id = seen_hashes_map.get(duplicate_key, "inconnu")
-                    skipped_names += 1
-                    log_info(f"[DUPLICATE] {duplicate_key} — {name} — Post: {att_id} / Origine: {origin_id}")
-                    continue
-
-                ext = os.path.splitext(name)[1].lower()
-                type_detected = (
-                    "video" if ext in [".mp4", ".m4v", ".mov", ".webm", ".avi", ".mkv", ".flv"]
-                    else "image" if ext in [".jpg", ".jpeg", ".png", ".webp", ".gif"]
-                    else "autre"
-                )
-                media = {
-                    "id": att_id,
-                    "name": name,
-                    "path": path,
-                    "title": title,
-                    "added": added,
-                    "url": url_cdn,
-                    "size_http": None,
-                    "cdn_checked": False,
-                    "percent": "0",
-                    "downloaded": False,
-                    "retry_count": 0,
-                    "error": "",
-                    "status": "",
-                    "type": type_detected
-                }
-                page_medias.append(media)
-                seen_hashes.add(duplicate_key)
-                seen_hashes_map[duplicate_key] = media["id"]
-                added_names += 1
-
-        log_info(f"[PAGE] {added_names} ajoutés, {skipped_names} doublons ignorés (page={page_index})")
-        return page_medias
+    extractor.page_index = 1
 
     # Page 1 -> yield
-    log_info(f"[API] Page {page_index} : {len(data)} posts")
-    yield extract_page_medias(data)
+    log_info(f"[API] Page {extractor.page_index} : {len(data)} posts")
+    yield extractor.extract(data)
 
     # ---- Détection de la pagination (sans ?o), avec offset en fallback
     page_mode = None   # 'before_id' | 'max_id' | 'before' | 'page' | 'until' | 'offset'
@@ -266,32 +339,17 @@ def fetch_medias_from_api(service, username, session_cookie=None, extra_cookies=
 
     def try_next():
         """Essaie les modes de pagination connus, choisit le 1er qui renvoie des IDs nouveaux."""
-        nonlocal page_mode, page_no
-        candidates = []
-
-        # ordre le plus robuste
-        if last_id:
-            candidates.append( (build_url(base, {"before_id": last_id}), "before_id") )
-            candidates.append( (build_url(base, {"max_id":    last_id}), "max_id") )
-        if last_ts:
-            candidates.append( (build_url(base, {"before": last_ts}),    "before") )
-
-        # certains profils veulent page=1 pour la 2e page (indexation 0/1 incohérente)
-        candidates.append( (build_url(base, {"page": 2}), "page") )
-        candidates.append( (build_url(base, {"page": 1}), "page") )
-
-        # dernier recours : offset
-        candidates.append( (build_url(base, {"o": len(seen_ids)}), "offset") )
-
-        for url, mode in candidates:
-            r = http_get(url)
+        nonlocal page_mode
+        candidates = pagination_candidates(extractor.last_id, extractor.last_ts, len(extractor.seen_ids))
+        # mode mémorisé en tête : 1 requête au lieu de jusqu'à 6 s'il marche toujours
+        for params, mode in prefer_mode(candidates, modes.get(service, username)):
+            r = http_get(build_api_url(base, params))
             if not r or r.status_code != 200:
                 continue
             items = parse_posts(r)
             if not items:
                 continue
-            ids = [(it.get("id") or it.get("post_id")) for it in items]
-            if any(i not in seen_ids for i in ids):
+            if extractor.has_new(items):
                 page_mode = mode
                 log_info(f"[API] Mode candidat OK: {mode} ({len(items)} posts)")
                 return items
@@ -303,51 +361,46 @@ def fetch_medias_from_api(service, username, session_cookie=None, extra_cookies=
         return
 
     log_info(f"[API] Pagination détectée : {page_mode}")
+    modes.put(service, username, page_mode)
 
     # ---- Boucle des pages suivantes
     while items:
-        page_index += 1
-        log_info(f"[API] Page {page_index} : {len(items)} posts")
-        yield extract_page_medias(items)
+        extractor.page_index += 1
+        log_info(f"[API] Page {extractor.page_index} : {len(items)} posts")
+        yield extractor.extract(items)
 
         # Construire l'URL suivante selon le mode sélectionné
-        if page_mode == "before_id":
-            next_url = build_url(base, {"before_id": last_id})
-        elif page_mode == "max_id":
-            next_url = build_url(base, {"max_id": last_id})
-        elif page_mode == "before":
-            next_url = build_url(base, {"before": last_ts})
-        elif page_mode == "page":
+        if page_mode == "page":
             page_no += 1
-            next_url = build_url(base, {"page": page_no})
-        elif page_mode == "until":
-            next_url = build_url(base, {"until": last_ts})
-        elif page_mode == "offset":
-            next_url = build_url(base, {"o": len(seen_ids)})
-        else:
+        params = next_page_params(page_mode, extractor.last_id, extractor.last_ts, page_no, len(extractor.seen_ids))
+        if params is None:
             break
+        next_url = build_api_url(base, params)
 
         nxt = fetch_page_resilient(http_get, next_url, parse_posts)
 
         if not nxt:
             break
-        if all((it.get("id") or it.get("post_id")) in seen_ids for it in nxt):
+        if not extractor.has_new(nxt):
             break
 
-        items = nxt
-        time.sleep(0.2 + random.random() * 0.25)  # petit jitter anti-DDG
+        items = nxt  # espacement des requêtes : limiteur partagé (core.rate_limiter)
 
 def fetch_page_resilient(get_fn, url, parse_fn, max_retry=6, base_delay=2.0):
     """GET + parse avec retries agressifs sur 5xx/429. Renvoie [] si vide/échec."""
     delay = base_delay
     for i in range(max_retry):
         r = get_fn(url)
-        if r and r.status_code == 200:
+        if r is not None and r.status_code == 200:
             items = parse_fn(r)
             if items is not None:
                 return items
             log_warning(f"[API] JSON invalide sur {url} → retry {i+1}/{max_retry} dans {delay:.1f}s")
-        elif r and r.status_code in (500, 502, 503, 504, 429):
+        elif r is not None and r.status_code == 429:
+            # http_get a déjà posé la pause globale : le limiteur espace la reprise
+            log_warning(f"[API] 429 sur {url} → retry {i+1}/{max_retry} après la pause")
+            continue
+        elif r is not None and r.status_code in (500, 502, 503, 504):
             log_warning(f"[API] {r.status_code} sur {url} → retry {i+1}/{max_retry} dans {delay:.1f}s")
         else:
             break
@@ -1,18 +1,75 @@
-import os, hashlib
+import os, hashlib, ctypes, ctypes.util
 from log import log_info, log_error
 
+HASH_READ_SIZE = 1024 * 1024
+FALLOC_FL_KEEP_SIZE = 0x01
+
+_fallocate = None
+
+
+def _libc_fallocate():
+    global _fallocate
+    if _fallocate is None:
+        try:
+            fn = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True).fallocate
+            fn.argtypes = (ctypes.c_int, ctypes.c_int, ctypes.c_longlong, ctypes.c_longlong)
+            fn.restype = ctypes.c_int
+            _fallocate = fn
+        except (OSError, AttributeError, TypeError):
+            _fallocate = False  # pas Linux / pas de glibc
+    return _fallocate
+
+
+def preallocate(fd, offset, length):
+    """Réserve les blocs [offset, offset+length) sans changer la taille du fichier.
+
+    fallocate(FALLOC_FL_KEEP_SIZE) et non posix_fallocate : la taille du .tmp sert
+    de point de reprise, elle ne doit refléter que les octets réellement écrits.
+    Best-effort : False si le système / le FS ne le permet pas.
+    """
+    fn = _libc_fallocate()
+    if not fn or length <= 0:
+        return False
+    return fn(fd, FALLOC_FL_KEEP_SIZE, offset, length) == 0
+
+
+def fadvise(fd, advice, offset=0, length=0):
+    """posix_fadvise best-effort (no-op hors POSIX)."""
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    try:
+        os.posix_fadvise(fd, offset, length, advice)
+        return True
+    except OSError:
+        return False
+
+
+def sha256_update_from_file(hasher, filepath, limit=None, offset=0):
+    """Alimente `hasher` avec le contenu du fichier (`limit` octets à partir de `offset`). Retourne le nb d'octets lus."""
+    done = 0
+    with open(filepath, "rb") as f:
+        if offset:
+            f.seek(offset)
+        while limit is None or done < limit:
+            chunk = f.read(HASH_READ_SIZE if limit is None else min(HASH_READ_SIZE, limit - done))
+            if not chunk:
+                break
+            hasher.update(chunk)
+            done += len(chunk)
+    return done
+
+
 def sha256_file(filepath):
     hash_sha256 = hashlib.sha256()
-    with open(filepath, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            hash_sha256.update(chunk)
+    sha256_update_from_file(hash_sha256, filepath)
     return hash_sha256.hexdigest()
 
 def rename_if_tmp_match(tmp_path, final_path, cdn_url):
     try:
         if not os.path.exists(tmp_path):
             return False
-        local_sha = sha256_file(tmp_path)
+        from core.hash_cache import sha256_file_cached  # import tardif : core.hash_cache importe ce module
+        local_sha = sha256_file_cached(tmp_path)
         if local_sha and local_sha in cdn_url:
             os.rename(tmp_path, final_path)
             log_info(f"[Fix] Renommé {os.path.basename(tmp_path)} → {os.path.basename(final_path)} (SHA OK)")
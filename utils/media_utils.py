@@ -1,5 +1,7 @@
 import os
-from utils.file_utils import sha256_file, rename_if_tmp_match
+from utils.file_utils import rename_if_tmp_match
+from core.disk_inventory import DiskInventory
+from core.hash_cache import sha256_file_cached
 
 def detect_type_from_name(name):
     ext = os.path.splitext(name.lower())[1]
@@ -13,27 +15,65 @@ def detect_type_from_name(name):
 def is_video(media):
     return media.get("type") == "video"
 
-def enrich_media_status(medias, download_path):
+def enrich_media_status(medias, download_path, inventory=None):
     subdir_v = os.path.join(download_path, "v")
     subdir_p = os.path.join(download_path, "p")
-    for media in medias:
-        media_name = media.get("name")
-        url = media.get("url", "")
-        if not media_name or not url:
-            continue
-
-        ext = os.path.splitext(media_name)[1].lower()
-        subdir = subdir_v if ext in [".mp4", ".m4v", ".mov", ".webm", ".avi", ".mkv", ".flv"] else subdir_p
-        final_path = os.path.join(subdir, media_name)
-
-        tmp_path = final_path + ".tmp"
-        if os.path.exists(tmp_path) and not os.path.exists(final_path):
-            rename_if_tmp_match(tmp_path, final_path, url)
-
-        if os.path.exists(final_path):
-            local_sha = sha256_file(final_path)
-            if local_sha and local_sha in url:
-                media["percent"] = "100"
-                media["status"] = "Completed"
-                media["hash_check"] = ""
+    # un seul scandir de v/ et p/ au lieu de plusieurs stat() par média
+    if inventory is None:
+        inventory = DiskInventory(download_path).scan()
+    with inventory.reconcile():
+        for media in medias:
+            media_name = media.get("name")
+            url = media.get("url", "")
+            if not media_name or not url:
+                continue
+
+            ext = os.path.splitext(media_name)[1].lower()
+            subdir = subdir_v if ext in [".mp4", ".m4v", ".mov", ".webm", ".avi", ".mkv", ".flv"] else subdir_p
+            final_path = os.path.join(subdir, media_name)
+
+            tmp_path = final_path + ".tmp"
+            if inventory.exists(tmp_path) and not inventory.exists(final_path):
+                rename_if_tmp_match(tmp_path, final_path, url)
+                inventory.refresh(tmp_path, final_path)
+
+            entry = inventory.stat(final_path)
+            if entry is not None:
+                # hash mémorisé par (dev, inode, taille, mtime) : relancer enrich ne re-hashe rien
+                local_sha = sha256_file_cached(final_path, entry)
+                if local_sha and local_sha in url:
+                    media["percent"] = "100"
+                    media["status"] = "Completed"
+                    media["hash_check"] = ""
     return medias
+
+def extract_cdn_hash(path_or_url):
+    """Hash CDN (sha256) porté par le nom de fichier d'un path/URL coomer, sinon None."""
+    if not path_or_url:
+        return None
+    try:
+        stem = os.path.splitext(os.path.basename(str(path_or_url).split("?")[0]))[0]
+        return stem or None
+    except Exception:
+        return None
+
+def media_store_key(media):
+    """Clé stable d'un média pour le stockage : hash CDN, sinon id, sinon nom."""
+    return (
+        extract_cdn_hash(media.get("path") or media.get("cdn_path") or media.get("url"))
+        or (str(media["id"]) if media.get("id") is not None else None)
+        or media.get("name")
+        or ""
+    )
+
+def media_row_keys(medias, seen=None):
+    """Clés de ligne d'une liste ordonnée : media_store_key, doublons suffixés #n.
+    `seen` (clé → occurrences) enchaîne les paquets successifs d'une même liste."""
+    seen = {} if seen is None else seen
+    keys = []
+    for m in medias:
+        key = media_store_key(m)
+        n = seen.get(key, 0)
+        seen[key] = n + 1
+        keys.append(key if n == 0 else f"{key}#{n}")
+    return keys
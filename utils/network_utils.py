@@ -1,11 +1,8 @@
 # utils.py
-import requests
 import os
-from urllib.parse import urlparse
-from utils.file_utils import sha256_file
+from core.hash_cache import verify_file_hash
 from core.log import log_error
-
-CDN_NODES = ["n1", "n2", "n3", "n4"]
+from core.endpoints import media_url
 
 def generate_alternative_urls(url):
     """Génère des URLs alternatives à partir d'une URL CDN.
@@ -32,20 +29,13 @@ def generate_alternative_urls(url):
 
 
 def build_media_url(path):
-    if path.startswith("/data"):
-        return f"https://coomer.st{path}"
-    return f"https://coomer.st/data{path}"
+    return media_url(path)
 
 def get_remote_file_size(url):
+    """Taille distante via le SizeProbe partagé (session poolée + cache par hash CDN)."""
+    from core.size_probe import get_size_probe  # import tardif : core.size_probe importe utils
     try:
-        parsed = urlparse(url)
-        cdn_path = parsed.path
-        for node in CDN_NODES:
-            test_url = f"https://{node}.coomer.st{cdn_path}"
-            response = requests.head(test_url, timeout=5)
-            if response.status_code == 200 and "Content-Length" in response.headers:
-                return int(response.headers["Content-Length"])
-        return None
+        return get_size_probe().probe(url)
     except Exception:
         return None
 
@@ -55,8 +45,7 @@ def verify_hash_from_cdn_path(local_path, cdn_path):
     """
     try:
         expected_hash = os.path.splitext(os.path.basename(cdn_path))[0]
-        actual_hash = sha256_file(local_path)
-        return actual_hash == expected_hash
+        return verify_file_hash(local_path, expected_hash)
     except Exception as e:
         log_error(f"[verify_hash_from_cdn_path] Erreur : {e}")
         return False
@@ -1,5 +1,6 @@
 import os
-from .file_utils import sha256_file, rename_if_tmp_match
+from .file_utils import rename_if_tmp_match
+from core.hash_cache import sha256_file_cached
 
 def enrich_media_status(medias, download_path):
     subdir_v = os.path.join(download_path, "v")
@@ -19,7 +20,7 @@ def enrich_media_status(medias, download_path):
             rename_if_tmp_match(tmp_path, final_path, url)
 
         if os.path.exists(final_path):
-            local_sha = sha256_file(final_path)
+            local_sha = sha256_file_cached(final_path)
             if local_sha and local_sha in url:
                 media["percent"] = "100"
                 media["status"] = "Completed"